@@ -1,8 +1,7 @@
 # EDFApp.py
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
-from EDFProcessor import EDFProcessor
-from EDFVisualizer import EDFVisualizer
+from edf_gui_worker import OperationRunner
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -11,7 +10,7 @@ class EDFApp:
     def __init__(self, root):
         self.root = root
         self.root.title("EDF File Manager")
-        self.root.geometry("800x500")
+        self.root.geometry("800x580")
         self.directory = ""
         self.processor = None
         self.visualizer = None
@@ -25,7 +24,8 @@ class EDFApp:
         buttons = [
             ("Open Folder", self.select_directory, "Select a folder containing EDF files"),
             ("Rename EDF", self.rename_files, "Rename EDF files based on metadata"),
-            ("Delete Corrupted", self.check_corrupted, "Delete corrupted EDF files"),
+            ("Check Corrupted", self.check_corrupted, "Verify EDF files and write a corruption report"),
+            ("Repair Truncated", self.repair_truncated, "Cut partial records and fix the record count (reversible)"),
             ("Delete Duplicates", self.find_duplicates, "Find and delete duplicate EDF files"),
             ("Find Similar", self.find_similar_time, "Find EDF files with similar start times"),
             ("Generate Statistics", self.generate_stats, "Generate statistics for EDF files"),
@@ -42,6 +42,8 @@ class EDFApp:
             self._create_tooltip(btn, tooltip)
 
         self.text_output = scrolledtext.ScrolledText(self.root, wrap=tk.WORD, width=90, height=20)
+        self.runner = OperationRunner(self.root, self.text_output)
+        self.runner.frame.pack(pady=5)
         self.text_output.pack(pady=10)
 
     def _create_tooltip(self, widget, text):
@@ -71,15 +73,15 @@ class EDFApp:
         self.directory = filedialog.askdirectory()
         if self.directory:
             self.text_output.insert(tk.END, f"Selected directory: {self.directory}\n")
-            self.processor = EDFProcessor(self.directory)
-            self.visualizer = EDFVisualizer(self.directory)
+            self.processor = None
+            self.visualizer = None
             for btn in self.button_frame.winfo_children():
                 if isinstance(btn, tk.Button) and btn["text"] != "Open Folder":
                     btn.config(state=tk.NORMAL)
 
     def rename_files(self):
         """Renames EDF files."""
-        self._execute_operation("file renaming process", self.processor.rename_edf_files)
+        self._execute_operation("file renaming process", self._processor_operation("rename_edf_files"))
 
     def find_duplicates(self):
         """Finds and deletes duplicates."""
@@ -87,7 +89,13 @@ class EDFApp:
 
     def check_corrupted(self):
         """Checks for corrupted files."""
-        self._execute_operation("corrupted file check process", self.processor.find_and_delete_corrupted_edf)
+        self._execute_operation("corrupted file check process",
+                                self._processor_operation("find_and_delete_corrupted_edf"))
+
+    def repair_truncated(self):
+        """Repairs truncated files."""
+        self._execute_operation("truncated file repair process",
+                                self._processor_operation("repair_truncated_edf_files"))
 
     def generate_stats(self):
         """Generates statistics."""
@@ -95,11 +103,12 @@ class EDFApp:
 
     def find_similar_time(self):
         """Finds files with similar start times."""
-        self._execute_operation("similar time search process", self.processor.find_edf_with_similar_start_time)
+        self._execute_operation("similar time search process",
+                                self._processor_operation("find_edf_with_similar_start_time"))
 
     def generate_patient_table(self):
         """Generates a patient table."""
-        self._execute_operation("patient table creation process", self.processor.generate_patient_table)
+        self._execute_operation("patient table creation process", self._processor_operation("generate_patient_table"))
 
     def randomize_filenames(self):
         """Randomizes file names."""
@@ -107,76 +116,87 @@ class EDFApp:
 
     def remove_patient_info(self):
         """Removes patient information."""
-        self._execute_operation("patient information removal process", self.processor.remove_patient_info)
+        self._execute_operation("patient information removal process", self._processor_operation("remove_patient_info"))
 
     def read_edf_info(self):
         """Reads EDF file information."""
-        self._execute_operation("EDF file information reading process", self.processor.read_edf_info)
+        self._execute_operation("EDF file information reading process", self._processor_operation("read_edf_info"))
+
+    def _get_processor(self):
+        """Creates the processor on first use; EDFProcessor and its dependencies are imported on the worker thread."""
+        if self.processor is None:
+            from EDFProcessor import EDFProcessor
+            self.processor = EDFProcessor(self.directory)
+        return self.processor
+
+    def _get_visualizer(self):
+        """Creates the visualizer on first use."""
+        if self.visualizer is None:
+            from EDFVisualizer import EDFVisualizer
+            self.visualizer = EDFVisualizer(self.directory)
+        return self.visualizer
+
+    def _processor_operation(self, method_name):
+        """Returns an operation that calls an EDFProcessor method on the worker thread."""
+        return lambda: getattr(self._get_processor(), method_name)()
 
     def _execute_operation(self, operation_name, operation_func):
-        """Executes an operation with error handling."""
+        """Executes an operation on the worker thread."""
         if not self.directory:
             messagebox.showwarning("Error", "Directory not selected.")
             return
-
-        self.text_output.insert(tk.END, f"Started {operation_name}...\n")
-        self.text_output.update_idletasks()
-
-        try:
-            result = operation_func()
-            self.text_output.insert(tk.END, f"{operation_name.capitalize()} completed.\n")
-            if result:
-                self.text_output.insert(tk.END, f"Result: {result}\n")
-        except Exception as e:
-            logging.error(f"Error during {operation_name}: {e}")
-            self.text_output.insert(tk.END, f"Error: {e}\n")
-            messagebox.showerror("Error", f"An error occurred: {e}")
+        self.runner.run(operation_name, operation_func)
 
     def _find_and_delete_duplicates(self):
         """Finds and deletes duplicate files."""
-        duplicates = self.processor.find_duplicate_files()
+        processor = self._get_processor()
+        duplicates = processor.find_duplicate_files()
         if duplicates:
-            self.text_output.insert(tk.END, "Duplicate files found:\n")
+            self.runner.write("Duplicate files found:\n")
             for hash_val, paths in duplicates.items():
-                self.text_output.insert(tk.END, f"Hash: {hash_val}\n")
+                self.runner.write(f"Hash: {hash_val}\n")
                 for path in paths:
-                    self.text_output.insert(tk.END, f"  {path}\n")
-            self.processor.delete_duplicates(duplicates)
+                    self.runner.write(f"  {path}\n")
+            processor.delete_duplicates(duplicates)
             return "Duplicates deleted."
         return "No duplicates found."
 
     def _generate_statistics_wrapper(self):
         """Generates and displays statistics."""
-        metadata_list = self.processor.analyze_directory()
-        df, stats = self.processor.generate_statistics(metadata_list)
+        processor = self._get_processor()
+        metadata_list = processor.analyze_directory()
+        df, _ = processor.generate_statistics(metadata_list)
+        metadata_path = processor.export_metadata(df)
+        _, stats = processor.load_statistics()
         self._display_statistics(stats)
-        self.visualizer.visualize_statistics(df)
-        return "Statistics generated and visualized."
+        self._get_visualizer().visualize_statistics(df)
+        channel_path = processor.export_channel_statistics(processor.generate_channel_statistics())
+        return f"Statistics saved to {metadata_path} and visualized. Channel statistics saved to {channel_path}"
 
     def _randomize_filenames_wrapper(self):
         """Randomizes file names."""
-        return self.processor.randomize_filenames()
+        return self._get_processor().randomize_filenames()
 
     def _display_statistics(self, stats):
         """Displays statistics in the text field."""
-        self.text_output.insert(tk.END, "Descriptive statistics:\n")
+        self.runner.write("Descriptive statistics:\n")
         if 'sex_distribution' in stats and stats['sex_distribution'] is not None:
-            self.text_output.insert(tk.END, "Sex distribution:\n")
+            self.runner.write("Sex distribution:\n")
             for sex, count in stats['sex_distribution'].items():
-                self.text_output.insert(tk.END, f"  {sex}: {count}\n")
-        if 'age_distribution' in stats and stats['age_distribution'] is not None:
-            self.text_output.insert(tk.END, "\nAge distribution:\n")
-            age_stats = stats['age_distribution']
-            self.text_output.insert(tk.END, f"  Count: {int(age_stats['count'])}\n")
-            self.text_output.insert(tk.END, f"  Mean age: {age_stats['mean']:.2f} years\n")
-            self.text_output.insert(tk.END, f"  Minimum age: {age_stats['min']} years\n")
-            self.text_output.insert(tk.END, f"  Maximum age: {age_stats['max']} years\n")
+                self.runner.write(f"  {sex}: {count}\n")
+        age_stats = stats.get('age_distribution')
+        if age_stats is not None and 'mean' in age_stats and age_stats['count'] > 0:
+            self.runner.write("\nAge distribution:\n")
+            self.runner.write(f"  Count: {int(age_stats['count'])}\n")
+            self.runner.write(f"  Mean age: {age_stats['mean']:.2f} years\n")
+            self.runner.write(f"  Minimum age: {age_stats['min']} years\n")
+            self.runner.write(f"  Maximum age: {age_stats['max']} years\n")
         if 'duration_stats' in stats and stats['duration_stats'] is not None:
-            self.text_output.insert(tk.END, "\nRecording duration statistics (minutes):\n")
+            self.runner.write("\nRecording duration statistics (minutes):\n")
             duration_stats = stats['duration_stats']
-            self.text_output.insert(tk.END, f"  Mean duration: {duration_stats['mean']:.2f} min\n")
-            self.text_output.insert(tk.END, f"  Minimum duration: {duration_stats['min']:.2f} min\n")
-            self.text_output.insert(tk.END, f"  Maximum duration: {duration_stats['max']:.2f} min\n")
+            self.runner.write(f"  Mean duration: {duration_stats['mean']:.2f} min\n")
+            self.runner.write(f"  Minimum duration: {duration_stats['min']:.2f} min\n")
+            self.runner.write(f"  Maximum duration: {duration_stats['max']:.2f} min\n")
 
 if __name__ == "__main__":
     root = tk.Tk()
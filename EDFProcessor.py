@@ -1,24 +1,42 @@
 # EDFProcessor.py
 import os
-import hashlib
 import csv
 from collections import defaultdict
 from datetime import timedelta
-from dateutil.parser import parse
-from tqdm import tqdm
-from mne.io import read_raw_edf
-from mne import find_events
-from pandas import DataFrame
-from transliterate import translit
+from functools import partial
+from edf_catalog import EDFCatalog
+from edf_dubl_seek import DEFAULT_HASH_ALGORITHM, calculate_file_hash, find_duplicate_files, find_duplicate_recordings
+from edf_executor import DEFAULT_BACKEND, DEFAULT_CHUNKSIZE, check_cancelled, run_tasks
+from edf_journal import RENAME_JOURNAL_DIR_NAME, RenameJournal, plan_renames
+from edf_metrics import ENV_OPTIONS, instrumented, stage
+from edf_rename import resume_renames, rollback_renames, target_names
+from edf_rnd_name import CODE_WIDTH, randomize_filenames
+from edf_time import cluster_start_times, find_overlaps, pair_start_times, recording_interval
+from edfinfo_chg import anonymize_edf, format_diff
 import logging
 
+# numpy, pandas, tqdm and the modules built on them are imported by the methods that use them,
+# so importing EDFProcessor stays cheap (see startup_check.py)
+METADATA_NAME = "edf_metadata"
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 class EDFProcessor:
-    def __init__(self, directory):
+    def __init__(self, directory, validate_headers=False, force_refresh=False,
+                 backend=DEFAULT_BACKEND, max_workers=None, chunksize=DEFAULT_CHUNKSIZE,
+                 metrics=False, profile=False, trace_memory=False):
         self.directory = directory
+        self.validate_headers = validate_headers
+        self.force_refresh = force_refresh
+        self.executor_options = {'backend': backend, 'max_workers': max_workers, 'chunksize': chunksize}
+        # Operations write output/metrics/<operation>-<time>.json when enabled here or through EDF_METRICS
+        if metrics or profile or trace_memory:
+            self.metrics = {'profile': profile, 'trace_memory': trace_memory}
+        else:
+            self.metrics = ENV_OPTIONS
         self.output_dir = os.path.join(self.directory, "output")
         os.makedirs(self.output_dir, exist_ok=True)
+        self.catalog = EDFCatalog.for_directory(self.directory)
 
     def check_directory(self):
         """Checks if the directory exists."""
@@ -26,19 +44,35 @@ class EDFProcessor:
             raise FileNotFoundError(f"Directory {self.directory} does not exist.")
         return True
 
-    def get_edf_metadata(self, file_path):
+    def list_edf_files(self, recursive=False):
+        """Paths of the EDF files in the directory, or under it with recursive."""
+        with stage("walk"):
+            if recursive:
+                return [os.path.join(root, file) for root, _, files in os.walk(self.directory) for file in files
+                        if file.lower().endswith('.edf')]
+            return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.lower().endswith('.edf')]
+
+    def read_header(self, file_path):
+        """Returns the EDF header of a file from the catalog, rereading it only when it changed."""
+        return self.catalog.get_header(file_path, force_refresh=self.force_refresh, validate=self.validate_headers)
+
+    def read_headers(self, file_paths, desc="Reading headers"):
+        """Returns ({path: header}, {path: error}) for many files, parsing stale headers in parallel."""
+        return self.catalog.get_headers(file_paths, force_refresh=self.force_refresh, validate=self.validate_headers,
+                                        desc=desc, **self.executor_options)
+
+    def get_edf_metadata(self, file_path, header=None):
         """Extracts metadata from an EDF file."""
         try:
-            raw = read_raw_edf(file_path, preload=False)
-            info = raw.info
-            subject_info = info.get('subject_info', {})
+            header = header or self.read_header(file_path)
+            subject_info = header.subject_info
             first_name = subject_info.get('first_name', '').strip().capitalize()
             middle_name = subject_info.get('middle_name', '').strip().capitalize()
             last_name = subject_info.get('last_name', '').strip().capitalize()
             patient_name = f"{first_name}_{middle_name}_{last_name}".strip()
             if not patient_name:
                 patient_name = 'Unknown'
-            recording_date = info.get('meas_date', None)
+            recording_date = header.meas_date
             if recording_date:
                 recording_date = recording_date.strftime('%Y-%m-%d_%H-%M-%S')
             else:
@@ -55,94 +89,211 @@ class EDFProcessor:
         formatted_parts = [part.capitalize() if part.isalpha() else part for part in parts]
         return '_'.join(formatted_parts)
 
+    @instrumented("rename_edf_files")
     def rename_edf_files(self):
-        """Renames EDF files in the directory."""
-        edf_files = [f for f in os.listdir(self.directory) if f.endswith('.edf')]
-        renamed_count = 0
-
-        for file_name in tqdm(edf_files, desc="Renaming files", unit="file"):
+        """
+        Renames EDF files in the directory from a rename plan applied through a journal
+        in output/rename_journal; an interrupted earlier rename is finished first.
+        """
+        resumed = resume_renames(self.directory, self.catalog.move)
+        if resumed:
+            logging.info(f"Finished an interrupted rename: {resumed} files")
+
+        names = os.listdir(self.directory)
+        edf_files = [f for f in names if f.endswith('.edf')]
+        headers, errors = self.read_headers([os.path.join(self.directory, f) for f in edf_files])
+        metadata = {}
+        for file_name in edf_files:
             file_path = os.path.join(self.directory, file_name)
-            patient_name, recording_date = self.get_edf_metadata(file_path)
-
+            if file_path in errors:
+                logging.error(f"Error reading file {file_path}: {errors[file_path]}")
+                patient_name, recording_date = None, None
+            else:
+                patient_name, recording_date = self.get_edf_metadata(file_path, headers.get(file_path))
             if patient_name and recording_date:
-                formatted_patient_name = self.format_filename(patient_name)
-                new_name = f"{formatted_patient_name}_{recording_date}.edf"
-                new_file_path = os.path.join(self.directory, new_name)
-
-                counter = 1
-                while os.path.exists(new_file_path):
-                    new_name = f"{formatted_patient_name}_{recording_date}_{counter}.edf"
-                    new_file_path = os.path.join(self.directory, new_name)
-                    counter += 1
-
-                os.rename(file_path, new_file_path)
-                renamed_count += 1
+                metadata[file_name] = (patient_name, recording_date)
             else:
                 logging.warning(f"Failed to extract metadata for file {file_name}")
 
-        return renamed_count
+        mapping = target_names(names, metadata)
+        steps = plan_renames(mapping, names)
+        if steps:
+            journal = RenameJournal.create(os.path.join(self.output_dir, RENAME_JOURNAL_DIR_NAME), self.directory, steps)
+            journal.apply(self.catalog.move)
+        self.catalog.commit()
+        return sum(old != new for old, new in mapping.items())
+
+    @instrumented("rollback_renames")
+    def rollback_renames(self):
+        """Restores the file names from before the last rename."""
+        restored = rollback_renames(self.directory, self.catalog.move)
+        self.catalog.commit()
+        return restored
+
+    @instrumented("generate_patient_table")
+    def generate_patient_table(self, output_file="patient_table.csv"):
+        """Writes a patient -> recordings table; spelling variants of one patient are merged."""
+        from generate_patient_table import cluster_patients, patient_record, patient_rows, write_patient_table
+
+        edf_files = self.list_edf_files()
+        headers, errors = self.read_headers(edf_files)
+        for file_path, error in errors.items():
+            logging.error(f"Error reading file {file_path}: {error}")
+        records = [patient_record(file_path, headers[file_path]) for file_path in edf_files if file_path in headers]
+        output_path = os.path.join(self.output_dir, output_file)
+        write_patient_table(patient_rows(cluster_patients(records)), output_path)
+        return f"Patient table saved to {output_path}"
+
+    @instrumented("randomize_filenames")
+    def randomize_filenames(self, width=CODE_WIDTH):
+        """Renames all files to random numeric codes; the mapping is saved to name_mapping.csv."""
+        mapping_path = randomize_filenames(self.directory, width, self.catalog.move)
+        self.catalog.commit()
+        return f"File names randomized. Correspondence table saved to {mapping_path}"
+
+    def read_edf_metadata(self, file_path, header=None, with_events=False):
+        """Reads metadata from an EDF file; stim events are extracted only if with_events."""
+        from edf_events import stim_channels
 
-    def read_edf_metadata(self, file_path):
-        """Reads metadata from an EDF file."""
         try:
-            raw = read_raw_edf(file_path, preload=False)
-            info = raw.info
+            header = header or self.read_header(file_path)
             metadata = {
                 'file_name': os.path.basename(file_path),
-                'subject_info': info.get('subject_info', {}),
-                'duration': raw.times[-1],
-                'channels': info['ch_names'],
-                'sfreq': info['sfreq'],
-                'events': find_events(raw) if 'stim' in info['ch_names'] else None,
-                'meas_date': info.get('meas_date', None)
+                'subject_info': header.subject_info,
+                'duration': header.duration,
+                'channels': header.ch_names,
+                'sfreq': header.sfreq,
+                'events': self.read_events(file_path) if with_events and stim_channels(header) else None,
+                'meas_date': header.meas_date
             }
             return metadata
         except Exception as e:
             logging.error(f"Error reading file {file_path}: {e}")
             return None
 
-    def analyze_directory(self):
-        """Analyzes all EDF files in the specified directory."""
+    def read_edf_info(self):
+        """Returns the header summary of every EDF file (see edf_info), from the cached headers."""
+        from edf_info import format_edf_file_info
+
+        edf_files = self.list_edf_files()
+        headers, errors = self.read_headers(edf_files)
+        summaries = [format_edf_file_info(file_path, headers[file_path]) if file_path in headers
+                     else f"Error reading file {file_path}: {errors[file_path]}" for file_path in edf_files]
+        return "\n\n".join(summaries)
+
+    def read_events(self, file_path):
+        """Returns stim events of a file, cached in the catalog after the first extraction."""
+        from numpy import asarray
+        from edf_events import extract_stim_events
+
+        cached, events = self.catalog.get_events(file_path)
+        if not cached:
+            events = extract_stim_events(file_path)
+            self.catalog.store_events(file_path, events)
+        return asarray(events)
+
+    @instrumented("analyze_directory")
+    def analyze_directory(self, with_events=False):
+        """Analyzes all EDF files in the specified directory; stim events are opt-in."""
+        from edf_events import extract_stim_events, stim_channels
+
         metadata_list = []
-        for file_name in os.listdir(self.directory):
-            if file_name.endswith('.edf'):
-                file_path = os.path.join(self.directory, file_name)
-                metadata = self.read_edf_metadata(file_path)
+        edf_files = self.list_edf_files()
+        headers, errors = self.read_headers(edf_files)
+        for file_path, error in errors.items():
+            logging.error(f"Error reading file {file_path}: {error}")
+
+        # Event extraction is the only step that reads signal data
+        if with_events:
+            stim_files = [path for path, header in headers.items()
+                          if stim_channels(header) and not self.catalog.get_events(path)[0]]
+            for file_path, events in run_tasks(extract_stim_events, stim_files, desc="Extracting events", **self.executor_options):
+                self.catalog.store_events(file_path, events)
+
+        for file_path in edf_files:
+            if file_path in headers:
+                metadata = self.read_edf_metadata(file_path, headers[file_path], with_events)
                 if metadata:
                     metadata_list.append(metadata)
+        self.catalog.commit()
         return metadata_list
 
     def is_edf_corrupted(self, file_path):
         """Checks if an EDF file is corrupted."""
         try:
-            raw = read_raw_edf(file_path, preload=False, verbose=False)
+            self.read_header(file_path)
             return False
         except Exception as e:
             logging.error(f"Error reading file {file_path}: {e}")
             return True
 
-    def find_and_delete_corrupted_edf(self):
-        """Finds and deletes corrupted EDF files in the specified folder."""
-        deleted_files = 0
-        edf_files = [os.path.join(root, file) for root, _, files in os.walk(self.directory) for file in files if file.endswith(".edf")]
-
-        for file_path in tqdm(edf_files, desc="Checking files", unit="file"):
-            if self.is_edf_corrupted(file_path):
-                logging.warning(f"Corrupted file: {file_path}")
-                try:
-                    os.remove(file_path)
-                    logging.info(f"File deleted: {file_path}")
-                    deleted_files += 1
-                except Exception as e:
-                    logging.error(f"Error deleting file {file_path}: {e}")
-
-        return deleted_files
+    @instrumented("find_and_delete_corrupted_edf")
+    def find_and_delete_corrupted_edf(self, level="size", delete=False):
+        """Verifies EDF files, writes output/corruption_report.json and deletes corrupted files only if asked."""
+        from edf_cur import REPORT_NAME, delete_corrupted, verify_edf, write_report
+
+        edf_files = self.list_edf_files(recursive=True)
+        if level == "full":
+            reports = [report for _, report in run_tasks(partial(verify_edf, level=level), edf_files,
+                                                         desc="Checking files", **self.executor_options)]
+        else:
+            # Header and size checks need nothing beyond the cached headers
+            headers, errors = self.read_headers(edf_files, desc="Checking files")
+            reports = [verify_edf(file_path, level, headers[file_path]) if file_path in headers
+                       else {"file": file_path, "level": level, "ok": False,
+                             "problems": [{"check": "header", "severity": "error", "message": errors[file_path]}]}
+                       for file_path in edf_files]
+
+        corrupted = [report for report in reports if not report["ok"]]
+        for report in corrupted:
+            logging.warning(f"Corrupted file: {report['file']}: {'; '.join(p['message'] for p in report['problems'])}")
+        report_path = write_report(reports, os.path.join(self.output_dir, REPORT_NAME), level)
+        logging.info(f"Verification report saved to {report_path}")
+
+        if delete:
+            for file_path in delete_corrupted(corrupted):
+                self.catalog.forget(file_path)
+        self.catalog.commit()
+        return len(corrupted)
+
+    @instrumented("repair_truncated_edf_files")
+    def repair_truncated_edf_files(self):
+        """Repairs truncated EDF files in place; originals are journaled in output/repair_journal."""
+        from edf_cur import JOURNAL_DIR_NAME, repair_truncated_edf
+
+        edf_files = self.list_edf_files(recursive=True)
+        journal_dir = os.path.join(self.output_dir, JOURNAL_DIR_NAME)
+        repaired = 0
+        for file_path, entry_path in run_tasks(partial(repair_truncated_edf, journal_dir=journal_dir), edf_files,
+                                               desc="Repairing files", **self.executor_options):
+            if entry_path:
+                logging.info(f"File repaired: {file_path} (journal: {entry_path})")
+                repaired += 1
+        return repaired
+
+    @instrumented("undo_repairs")
+    def undo_repairs(self):
+        """Restores all repaired files from the repair journal."""
+        from edf_cur import undo_repairs
+
+        return undo_repairs(self.directory)
+
+    @instrumented("remove_patient_info")
+    def remove_patient_info(self, birthdate='year', dry_run=False):
+        """Anonymizes the patient and recording fields of all EDF files; returns a summary."""
+        edf_files = self.list_edf_files()
+        task = partial(anonymize_edf, birthdate=birthdate, dry_run=dry_run)
+        changed = 0
+        for file_path, result in run_tasks(task, edf_files, desc="Anonymizing files", **self.executor_options):
+            if result['changed']:
+                logging.info(format_diff(result))
+                changed += 1
+        return f"{'Files to change' if dry_run else 'Files anonymized'}: {changed} of {len(edf_files)}"
 
     def get_edf_start_time(self, file_path):
         """Extracts the recording start time from an EDF file."""
         try:
-            raw = read_raw_edf(file_path, preload=False, verbose=False)
-            start_datetime = raw.info['meas_date']
+            start_datetime = self.read_header(file_path).meas_date
             if start_datetime:
                 return start_datetime
             return None
@@ -150,68 +301,65 @@ class EDFProcessor:
             logging.error(f"Error reading file {file_path}: {e}")
             return None
 
-    def find_edf_with_similar_start_time(self, time_delta=timedelta(minutes=10)):
-        """Finds EDF files with similar start times."""
-        time_dict = defaultdict(list)
-        edf_files = [os.path.join(root, file) for root, _, files in os.walk(self.directory) for file in files if file.lower().endswith('.edf')]
-
-        for file_path in tqdm(edf_files, desc="Processing files", unit="file"):
-            start_datetime = self.get_edf_start_time(file_path)
-            if start_datetime:
-                rounded_time = start_datetime - timedelta(minutes=start_datetime.minute % 10)
-                time_dict[rounded_time].append((start_datetime, file_path))
-
-        similar_time_groups = []
-        for rounded_time, files in time_dict.items():
-            if len(files) > 1:
-                files.sort()
-                for i in range(1, len(files)):
-                    if files[i][0] - files[i - 1][0] <= time_delta:
-                        similar_time_groups.append(files)
-                        break
+    def read_intervals(self, desc="Processing files"):
+        """Returns (start, end, patient, file_path) for all EDF files with a valid start time."""
+        edf_files = self.list_edf_files(recursive=True)
+        headers, errors = self.read_headers(edf_files, desc=desc)
+        for file_path, error in errors.items():
+            logging.error(f"Error reading file {file_path}: {error}")
+
+        intervals = []
+        for file_path, header in headers.items():
+            interval = recording_interval(header)
+            if interval:
+                intervals.append((*interval, file_path))
+        return intervals
+
+    @instrumented("find_edf_with_similar_start_time")
+    def find_edf_with_similar_start_time(self, time_delta=timedelta(minutes=10), pairs=False):
+        """Finds EDF files with similar start times (groups, or individual pairs if pairs is true)."""
+        start_times = [(start, file_path) for start, _, _, file_path in self.read_intervals()]
+        if pairs:
+            return pair_start_times(start_times, time_delta)
+        return cluster_start_times(start_times, time_delta)
+
+    @instrumented("find_overlapping_recordings")
+    def find_overlapping_recordings(self, tolerance=timedelta(0), same_patient=False):
+        """Finds recordings whose time spans overlap, optionally only for the same patient."""
+        return find_overlaps(self.read_intervals(), tolerance, same_patient)
+
+    def calculate_file_hash(self, file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """Calculates the file hash for content verification."""
+        return calculate_file_hash(file_path, hash_algorithm)
 
-        return similar_time_groups
+    @instrumented("find_duplicate_files")
+    def find_duplicate_files(self, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """Finds duplicate files in the specified directory (size, block hash, then cached full hash)."""
+        return find_duplicate_files(self.directory, hash_algorithm, catalog=self.catalog, **self.executor_options)
 
-    def calculate_file_hash(self, file_path, hash_algorithm="md5", chunk_size=8192):
-        """Calculates the file hash for content verification."""
-        hash_func = hashlib.new(hash_algorithm)
-        with open(file_path, "rb") as f:
-            while chunk := f.read(chunk_size):
-                hash_func.update(chunk)
-        return hash_func.hexdigest()
-
-    def find_duplicate_files(self):
-        """Finds duplicate files in the specified directory."""
-        size_dict = defaultdict(list)
-
-        for root, _, files in os.walk(self.directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                size_dict[file_size].append(file_path)
-
-        hash_dict = defaultdict(list)
-        for size, paths in tqdm(size_dict.items(), desc="Checking files", unit="group"):
-            if len(paths) > 1:
-                for path in paths:
-                    file_hash = self.calculate_file_hash(path)
-                    hash_dict[file_hash].append(path)
-
-        duplicates = {hash_val: paths for hash_val, paths in hash_dict.items() if len(paths) > 1}
-        return duplicates
+    @instrumented("find_duplicate_recordings")
+    def find_duplicate_recordings(self, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """Finds EDF files with identical signal data, ignoring patient and recording header fields."""
+        return find_duplicate_recordings(self.directory, hash_algorithm, catalog=self.catalog, **self.executor_options)
 
     def delete_duplicates(self, duplicates):
         """Deletes all duplicates except one."""
+        from tqdm import tqdm
+
         for hash_val, paths in duplicates.items():
             for path in tqdm(paths[1:], desc="Deleting duplicates", unit="file"):
+                check_cancelled()
                 try:
                     os.remove(path)
+                    self.catalog.forget(path)
                     logging.info(f"Deleted file: {path}")
                 except OSError as e:
                     logging.error(f"Error deleting file {path}: {e}")
 
     def calculate_age(self, birthdate, recording_date):
         """Calculates the age at the time of recording."""
+        from dateutil.parser import parse
+
         try:
             if isinstance(birthdate, str):
                 birthdate = parse(birthdate)
@@ -227,8 +375,11 @@ class EDFProcessor:
             logging.error(f"Error calculating age: {e}")
             return None
 
+    @instrumented("generate_statistics")
     def generate_statistics(self, metadata_list):
         """Generates descriptive statistics from metadata."""
+        from pandas import DataFrame, to_numeric
+
         stats = defaultdict(list)
         for metadata in metadata_list:
             subject_info = metadata.get('subject_info', {})
@@ -238,51 +389,89 @@ class EDFProcessor:
 
             birthdate = subject_info.get('birthday')
             recording_date = metadata.get('meas_date')
-            if birthdate and recording_date:
-                age = self.calculate_age(birthdate, recording_date)
-                if age is not None:
-                    stats['age'].append(min(age, 60))  # Limit age to 60 years
+            age = self.calculate_age(birthdate, recording_date) if birthdate and recording_date else None
+            stats['age'].append(min(age, 60) if age is not None else None)  # Limit age to 60 years
 
             stats['duration_minutes'].append(metadata['duration'] / 60)
 
         df = DataFrame(stats)
-        descriptive_stats = {
+        if 'age' in df.columns:
+            df['age'] = to_numeric(df['age'], errors='coerce').astype('float64')  # Not untyped if no birthdates
+        return df, self.describe_statistics(df)
+
+    def describe_statistics(self, df):
+        """Descriptive statistics of a metadata table."""
+        return {
             'sex_distribution': df['sex'].value_counts(),
             'age_distribution': df['age'].describe() if 'age' in df.columns else None,
             'duration_stats': df['duration_minutes'].describe()
         }
-        return df, descriptive_stats
 
+    def load_statistics(self, columns=('sex', 'age', 'duration_minutes')):
+        """Reads the exported metadata table back (only the given columns) with its descriptive statistics."""
+        from edf_columnar import load_table
+
+        df = load_table(os.path.join(self.output_dir, METADATA_NAME), columns)
+        return df, self.describe_statistics(df)
+
+    @instrumented("generate_channel_statistics")
+    def generate_channel_statistics(self, file_paths=None):
+        """Computes per-channel signal quality statistics, cached by signal content; one row per file and channel."""
+        from eeg_statistics import generate_channel_statistics
+
+        if file_paths is None:
+            file_paths = self.list_edf_files()
+        headers, _ = self.read_headers(file_paths)
+        return generate_channel_statistics(list(headers), catalog=self.catalog, **self.executor_options)
+
+    @instrumented("generate_band_power")
+    def generate_band_power(self, file_paths=None):
+        """Computes absolute and relative band power per channel, cached by signal content."""
+        from eeg_features import generate_band_power
+
+        if file_paths is None:
+            file_paths = self.list_edf_files()
+        return generate_band_power(file_paths, catalog=self.catalog, **self.executor_options)
+
+    def export_channel_statistics(self, channel_df):
+        """Writes the per-channel statistics next to the metadata table and returns the path."""
+        from edf_columnar import export_table
+        from edf_quality import CHANNEL_STATS_NAME
+
+        return export_table(channel_df, os.path.join(self.output_dir, os.path.splitext(CHANNEL_STATS_NAME)[0]))
+
+    @instrumented("visualize_statistics")
     def visualize_statistics(self, df):
-        """Visualizes the statistics."""
-        if 'sex' in df.columns:
-            figure(figsize=(8, 6))
-            countplot(data=df, x='sex')
-            title('Sex Distribution')
-            savefig(os.path.join(self.output_dir, 'sex_distribution.png'))
-            close()
+        """Visualizes the statistics; figures whose data did not change are not redrawn."""
+        from edf_plots import visualize_statistics
+
+        return visualize_statistics(df, self.output_dir)
+
+    def export_metadata(self, df):
+        """Writes the metadata table and returns the path."""
+        from edf_columnar import export_table
+
+        return export_table(df, os.path.join(self.output_dir, METADATA_NAME))
+
+    @instrumented("export_statistics")
+    def export_statistics(self, df, descriptive_stats, channel_df=None, band_power_df=None, excel=False):
+        """
+        Exports the statistics as Parquet tables (CSV without pyarrow) and a text summary.
+
+        The Excel copy of the metadata is written only with excel=True, and is capped at
+        edf_columnar.EXCEL_MAX_ROWS rows.
+        """
+        from edf_columnar import export_excel, export_table
+        from eeg_features import BAND_POWER_NAME
 
-        if 'age' in df.columns:
-            age_data = df[df['age'].apply(lambda x: isinstance(x, (int, float)))]
-            if not age_data.empty:
-                figure(figsize=(8, 6))
-                histplot(data=age_data, x='age', bins=20, kde=True)
-                title('Age Distribution')
-                savefig(os.path.join(self.output_dir, 'age_distribution.png'))
-                close()
-
-        if 'duration_minutes' in df.columns:
-            figure(figsize=(8, 6))
-            histplot(data=df, x='duration_minutes', bins=20, kde=True)
-            title('Recording Duration (minutes)')
-            savefig(os.path.join(self.output_dir, 'duration_distribution.png'))
-            close()
-
-    def export_statistics(self, df, descriptive_stats):
-        """Exports the statistics to CSV and Excel files."""
         os.makedirs(self.output_dir, exist_ok=True)
-        df.to_csv(os.path.join(self.output_dir, 'edf_metadata.csv'), index=False)
-        df.to_excel(os.path.join(self.output_dir, 'edf_metadata.xlsx'), index=False)
+        self.export_metadata(df)
+        if channel_df is not None:
+            self.export_channel_statistics(channel_df)
+        if band_power_df is not None:
+            export_table(band_power_df, os.path.join(self.output_dir, os.path.splitext(BAND_POWER_NAME)[0]))
+        if excel:
+            export_excel(df, os.path.join(self.output_dir, f'{METADATA_NAME}.xlsx'))
 
         with open(os.path.join(self.output_dir, 'descriptive_stats.txt'), 'w') as f:
             f.write("Descriptive Statistics:\n")
@@ -292,13 +481,16 @@ class EDFProcessor:
 
         logging.info(f"Exported statistics to {self.output_dir}")
 
-    def run(self):
-        """Runs the EDF processing pipeline."""
+    @instrumented("run")
+    def run(self, excel=False, band_power=False):
+        """Runs the EDF processing pipeline; band power is computed only with band_power=True."""
         self.check_directory()
         metadata_list = self.analyze_directory()
         df, descriptive_stats = self.generate_statistics(metadata_list)
+        channel_df = self.generate_channel_statistics()
+        band_power_df = self.generate_band_power() if band_power else None
         self.visualize_statistics(df)
-        self.export_statistics(df, descriptive_stats)
+        self.export_statistics(df, descriptive_stats, channel_df, band_power_df, excel)
         logging.info("EDF processing completed.")
 
 if __name__ == "__main__":
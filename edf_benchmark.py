@@ -0,0 +1,151 @@
+# edf_benchmark.py
+import os
+import sys
+import json
+import shutil
+import platform
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, replace
+from datetime import datetime
+from edf_metrics import io_counters, peak_rss
+from edf_synth import CorpusSpec, generate_corpus
+
+SIZES = (100, 1000)  # Corpus sizes in files
+OPERATIONS = ("statistics", "visualize", "similar_start", "duplicates", "corrupted", "rename")  # Rename runs last
+MB = 2 ** 20
+
+# Runs in a fresh interpreter, so memory and I/O counters cover one operation only
+PROBE = """
+import json, sys
+from edf_benchmark import measure_operation
+print(json.dumps(measure_operation(*sys.argv[1:])))
+"""
+
+def _prepare(processor, operation):
+    """Untimed setup of an operation; returns what its timed part needs."""
+    if operation == "visualize":
+        df, _ = processor.generate_statistics(processor.analyze_directory())
+        return df
+    return None
+
+def _run(processor, operation, prepared):
+    """Runs an operation; returns the number of files it covered."""
+    if operation == "statistics":
+        df, _ = processor.generate_statistics(processor.analyze_directory())
+        return len(df)
+    if operation == "visualize":
+        processor.visualize_statistics(prepared)
+        return len(prepared)
+    if operation == "similar_start":
+        processor.find_edf_with_similar_start_time()
+    elif operation == "duplicates":
+        processor.find_duplicate_files()
+    elif operation == "corrupted":
+        processor.find_and_delete_corrupted_edf()
+    elif operation == "rename":
+        processor.rename_edf_files()
+    else:
+        raise ValueError(f"Unknown operation {operation!r}")
+    return sum(1 for name in os.listdir(processor.directory) if name.endswith('.edf'))
+
+def measure_operation(operation, directory, backend):
+    """Times one operation of EDFProcessor on a corpus; returns seconds, files, bytes read and peak RSS."""
+    from EDFProcessor import EDFProcessor
+    processor = EDFProcessor(directory, backend=backend)
+    prepared = _prepare(processor, operation)
+    rchar, read_bytes = io_counters()
+    start = time.perf_counter()
+    files = _run(processor, operation, prepared)
+    seconds = time.perf_counter() - start
+    rchar_after, read_bytes_after = io_counters()
+    processor.catalog.close()
+    return {
+        "operation": operation,
+        "seconds": seconds,
+        "files": files,
+        "bytes_read": rchar_after - rchar if rchar is not None else None,
+        "storage_bytes_read": read_bytes_after - read_bytes if read_bytes is not None else None,
+        "peak_rss_mb": peak_rss(),
+    }
+
+def run_operation(operation, directory, backend="process", cold=True):
+    """Measures an operation in a fresh interpreter; cold runs start without the catalog and output files."""
+    if cold:
+        shutil.rmtree(os.path.join(directory, "output"), ignore_errors=True)
+    output = subprocess.run([sys.executable, "-c", PROBE, operation, directory, backend], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.splitlines()[-1])
+
+def benchmark(sizes=SIZES, operations=OPERATIONS, spec=None, work_dir=None, backend="process", warm=True,
+              keep=False):
+    """
+    Generates a synthetic corpus of every size and measures every operation on it.
+
+    Each operation runs cold (no catalog, no output files) and, with warm=True, a second
+    time on the catalog the first run left. Returns the results with the corpus specs and
+    the machine they ran on.
+    """
+    spec = spec or CorpusSpec()
+    work_dir = work_dir or tempfile.mkdtemp(prefix="edf_benchmark_")
+    results = []
+    for size in sizes:
+        directory = os.path.join(work_dir, f"corpus_{size}")
+        shutil.rmtree(directory, ignore_errors=True)
+        start = time.perf_counter()
+        manifest = generate_corpus(directory, replace(spec, n_files=size))
+        print(f"Corpus of {size} files ({manifest['bytes'] / MB:.1f} MB) generated in "
+              f"{time.perf_counter() - start:.1f} s")
+        for operation in operations:
+            for mode in ("cold", "warm") if warm else ("cold",):
+                result = run_operation(operation, directory, backend, cold=mode == "cold")
+                result.update({
+                    "size": size,
+                    "mode": mode,
+                    "corpus_mb": manifest['bytes'] / MB,
+                    "files_per_second": result['files'] / result['seconds'] if result['seconds'] else None,
+                    "mb_per_second": manifest['bytes'] / MB / result['seconds'] if result['seconds'] else None,
+                })
+                results.append(result)
+                print(f"{size:>7} {operation:<14} {mode:<5} {result['seconds']:8.3f} s "
+                      f"{result['files_per_second'] or 0:10.1f} files/s  peak {result['peak_rss_mb'] or 0:8.1f} MB")
+        if not keep:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend": backend,
+        "spec": asdict(spec),
+        "results": results,
+    }
+
+def save_results(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    return path
+
+def compare_results(old_path, new_path):
+    """Prints the time ratio new / old of every (size, operation, mode) measured in both runs."""
+    runs = []
+    for path in (old_path, new_path):
+        with open(path, encoding='utf-8') as f:
+            runs.append({(r['size'], r['operation'], r['mode']): r for r in json.load(f)['results']})
+    old, new = runs
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]['seconds'] / old[key]['seconds'] if old[key]['seconds'] else float('nan')
+        print(f"{key[0]:>7} {key[1]:<14} {key[2]:<5} {old[key]['seconds']:8.3f} s -> {new[key]['seconds']:8.3f} s "
+              f"({ratio:.2f}x)")
+
+if __name__ == "__main__":
+    sizes = input(f"Corpus sizes, comma separated [{','.join(map(str, SIZES))}]: ").strip()
+    sizes = tuple(int(size) for size in sizes.split(',')) if sizes else SIZES
+    previous = input("Previous results file to compare with (optional): ").strip()
+
+    report = benchmark(sizes)
+    path = save_results(report, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    print(f"Results saved to {path}")
+    if previous:
+        compare_results(previous, path)
@@ -0,0 +1,226 @@
+# edf_catalog.py
+import os
+import json
+import sqlite3
+import threading
+import logging
+from edf_executor import run_tasks
+from edf_header import EDFHeaderError, parse_edf_header, read_header_bytes, validate_against_mne
+from edf_metrics import increment, stage
+
+CATALOG_NAME = "edf_catalog.sqlite"
+COMMIT_EVERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    header BLOB,
+    error TEXT,
+    meas_date TEXT,
+    duration REAL,
+    channels TEXT,
+    events TEXT
+);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+CREATE TABLE IF NOT EXISTS features (
+    signature TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (signature, kind)
+);
+"""
+
+def read_header_record(file_path, validate=False):
+    """Stats a file and parses its header; module-level so it can run in a worker process."""
+    stat_result = os.stat(file_path)
+    try:
+        with stage("parse header"):
+            header_bytes = read_header_bytes(file_path)
+            header = parse_edf_header(header_bytes, file_path, stat_result.st_size)
+    except EDFHeaderError as e:
+        return stat_result, None, None, str(e), []
+    mismatches = validate_against_mne(header) if validate else []
+    return stat_result, header_bytes, header, None, mismatches
+
+def _read_validated_header_record(file_path):
+    return read_header_record(file_path, validate=True)
+
+class EDFCatalog:
+    """On-disk cache of parsed EDF headers, invalidated by file size, mtime and inode."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    @classmethod
+    def for_directory(cls, directory):
+        """Opens the catalog kept in the directory's output folder."""
+        output_dir = os.path.join(directory, "output")
+        os.makedirs(output_dir, exist_ok=True)
+        return cls(os.path.join(output_dir, CATALOG_NAME))
+
+    def close(self):
+        """Commits pending writes and closes the database."""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def commit(self):
+        """Flushes pending writes to disk."""
+        with self._lock:
+            self._connection.commit()
+            self._pending = 0
+
+    def _write(self, sql, params):
+        with self._lock:
+            self._connection.execute(sql, params)
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
+
+    def lookup(self, file_path, stat_result=None):
+        """Returns the cached row for a file, or None if it is missing or stale."""
+        stat_result = stat_result or os.stat(file_path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM files WHERE path = ?", (os.path.abspath(file_path),)).fetchone()
+        if row is None:
+            return None
+        if (row['size'], row['mtime_ns'], row['inode']) != (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino):
+            return None
+        return row
+
+    def store_header(self, file_path, stat_result, header_bytes=None, header=None, error=None):
+        """Stores a parsed header (or the parse error) for a file, replacing older data."""
+        self._write(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, header, error, meas_date, duration, channels, events) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+            (os.path.abspath(file_path), stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino,
+             header_bytes, error,
+             header.meas_date.isoformat() if header and header.meas_date else None,
+             header.duration if header else None,
+             json.dumps(header.ch_names) if header else None))
+
+    def get_header(self, file_path, force_refresh=False, validate=False):
+        """Returns the EDFHeader of a file, reading the file only if the cached copy is stale."""
+        row = None if force_refresh else self.lookup(file_path)
+        increment("header cache: hits" if row is not None else "header cache: misses")
+        if row is not None:
+            if row['error'] is not None:
+                raise EDFHeaderError(row['error'])
+            return parse_edf_header(row['header'], file_path, row['size'])
+
+        header, error = self._store_record(file_path, read_header_record(file_path, validate))
+        if error is not None:
+            raise EDFHeaderError(error)
+        return header
+
+    def get_headers(self, file_paths, force_refresh=False, validate=False, desc=None, **executor_options):
+        """
+        Returns ({path: EDFHeader}, {path: error message}) for many files.
+
+        Fresh entries come from the database; stale or missing ones are read on the
+        worker pool configured by executor_options (see edf_executor.run_tasks).
+        """
+        headers, errors, missing = {}, {}, []
+        with stage("header cache lookup"):
+            for file_path in file_paths:
+                try:
+                    row = None if force_refresh else self.lookup(file_path)
+                except OSError as e:
+                    errors[file_path] = str(e)
+                    continue
+                increment("header cache: hits" if row is not None else "header cache: misses")
+                if row is None:
+                    missing.append(file_path)
+                elif row['error'] is not None:
+                    errors[file_path] = row['error']
+                else:
+                    headers[file_path] = parse_edf_header(row['header'], file_path, row['size'])
+
+        task = _read_validated_header_record if validate else read_header_record
+        for file_path, record in run_tasks(task, missing, desc=desc, **executor_options):
+            header, error = self._store_record(file_path, record)
+            if error is not None:
+                errors[file_path] = error
+            else:
+                headers[file_path] = header
+        self.commit()
+        return headers, errors
+
+    def _store_record(self, file_path, record):
+        """Stores the result of read_header_record and returns (header, error)."""
+        stat_result, header_bytes, header, error, mismatches = record
+        for mismatch in mismatches:
+            logging.warning(f"Header of {file_path} differs from MNE: {mismatch}")
+        self.store_header(file_path, stat_result, header_bytes=header_bytes, header=header, error=error)
+        return header, error
+
+    def get_events(self, file_path):
+        """Returns (True, events) if events are cached for the current file version, else (False, None)."""
+        row = self.lookup(file_path)
+        if row is None or row['events'] is None:
+            return False, None
+        return True, json.loads(row['events'])
+
+    def store_events(self, file_path, events):
+        """Caches detected events (a list of [sample, previous, value] rows, or None)."""
+        self._write("UPDATE files SET events = ? WHERE path = ?",
+                    (json.dumps(events), os.path.abspath(file_path)))
+
+    def get_digest(self, file_path, algorithm, stat_result=None):
+        """Returns the cached full-file digest if size and mtime are unchanged, else None."""
+        stat_result = stat_result or os.stat(file_path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, digest FROM digests WHERE path = ? AND algorithm = ?",
+                (os.path.abspath(file_path), algorithm)).fetchone()
+        if row is None or (row['size'], row['mtime_ns']) != (stat_result.st_size, stat_result.st_mtime_ns):
+            return None
+        return row['digest']
+
+    def store_digest(self, file_path, algorithm, stat_result, digest):
+        """Caches a full-file digest for the given file version."""
+        self._write("INSERT OR REPLACE INTO digests (path, algorithm, size, mtime_ns, digest) VALUES (?, ?, ?, ?, ?)",
+                    (os.path.abspath(file_path), algorithm, stat_result.st_size, stat_result.st_mtime_ns, digest))
+
+    def get_features(self, signature, kind):
+        """Returns cached features (JSON data) for a content signature, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM features WHERE signature = ? AND kind = ?", (signature, kind)).fetchone()
+        return None if row is None else json.loads(row['data'])
+
+    def store_features(self, signature, kind, data):
+        """Caches features by content signature, so they survive renames and are shared by identical copies."""
+        self._write("INSERT OR REPLACE INTO features (signature, kind, data) VALUES (?, ?, ?)",
+                    (signature, kind, json.dumps(data)))
+
+    def move(self, old_path, new_path):
+        """Re-keys an entry after the file was renamed."""
+        for table in ("files", "digests"):
+            self._write(f"UPDATE OR REPLACE {table} SET path = ? WHERE path = ?",
+                        (os.path.abspath(new_path), os.path.abspath(old_path)))
+
+    def forget(self, file_path):
+        """Drops the entries of a deleted file."""
+        for table in ("files", "digests"):
+            self._write(f"DELETE FROM {table} WHERE path = ?", (os.path.abspath(file_path),))
@@ -0,0 +1,79 @@
+# edf_columnar.py
+import os
+import logging
+from pandas import CategoricalDtype, read_csv, read_parquet, to_numeric
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK_ROWS = 100_000  # Rows per Parquet row group / CSV write
+EXCEL_MAX_ROWS = 50_000  # Larger tables are cut when written to Excel
+# Low-cardinality text columns, stored once per distinct value
+CATEGORICAL_COLUMNS = ('sex', 'file_name', 'channel', 'unit')
+# Numeric columns that may be missing for every file, stored as float64 (NaN) rather than as untyped nulls
+NUMERIC_COLUMNS = ('age', 'duration_minutes')
+_csv_warned = False  # The CSV fallback is reported once per process
+
+def with_column_types(df):
+    """Returns df with its CATEGORICAL_COLUMNS as categoricals and its NUMERIC_COLUMNS as float64."""
+    numeric = [column for column in NUMERIC_COLUMNS if column in df.columns and df[column].dtype != 'float64']
+    if numeric:
+        df = df.assign(**{column: to_numeric(df[column], errors='coerce').astype('float64') for column in numeric})
+    columns = {column: 'category' for column in CATEGORICAL_COLUMNS
+               if column in df.columns and not isinstance(df[column].dtype, CategoricalDtype)}
+    return df.astype(columns) if columns else df
+
+def table_path(base_path):
+    """Returns the most recently exported table for base_path (Parquet or CSV), or None."""
+    paths = [base_path + extension for extension in ('.parquet', '.csv') if os.path.exists(base_path + extension)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def export_table(df, base_path, chunk_rows=CHUNK_ROWS):
+    """
+    Writes a table to base_path.parquet, or to base_path.csv (with a warning) if pyarrow is not installed.
+
+    Text columns such as sex, file and channel names are stored as categoricals and the
+    known numeric columns as float64, so the stored types do not depend on the data. Rows
+    are written in chunks of chunk_rows (one Parquet row group each), so the writer
+    never holds a second full copy of the table. Returns the path written.
+    """
+    global _csv_warned
+    df = with_column_types(df)
+    if pq is None:
+        path = base_path + '.csv'
+        if not _csv_warned:
+            logging.warning("pyarrow is not installed: tables are written as CSV instead of Parquet")
+            _csv_warned = True
+        df.to_csv(path, index=False, chunksize=chunk_rows)
+        return path
+
+    path = base_path + '.parquet'
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema,
+                                                    preserve_index=False))
+    return path
+
+def load_table(base_path, columns=None):
+    """Reads a table written by export_table back; with columns, only those of them that exist."""
+    path = table_path(base_path)
+    if path is None:
+        raise FileNotFoundError(f"No exported table {base_path}.parquet or {base_path}.csv")
+    if path.endswith('.parquet'):
+        if columns is not None:
+            names = set(pq.read_schema(path).names)
+            columns = [column for column in columns if column in names]
+        return with_column_types(read_parquet(path, columns=columns))
+    return with_column_types(read_csv(path, usecols=(lambda column: column in columns) if columns is not None else None))
+
+def export_excel(df, path, max_rows=EXCEL_MAX_ROWS):
+    """Writes at most max_rows rows of a table to an Excel file; returns the path."""
+    if len(df) > max_rows:
+        logging.warning(f"Only the first {max_rows} of {len(df)} rows are written to {path}")
+        df = df.iloc[:max_rows]
+    df.to_excel(path, index=False)
+    return path
@@ -1,43 +1,355 @@
 # edf_cur.py
 import os
-from mne.io import read_raw_edf
-from tqdm import tqdm
+import re
+import json
+import base64
+import hashlib
+from datetime import datetime
+from functools import partial
+import numpy as np
+from edf_executor import check_cancelled, run_tasks
+from edf_header import read_edf_header
+from edf_metrics import increment, instrumented, stage
 
-def is_edf_corrupted(file_path):
-    """Checks if an EDF file is corrupted using MNE."""
+# Verification levels, each including the checks of the previous one
+LEVELS = ("header", "size", "full")
+SCAN_CHUNK_BYTES = 16 * 1024 * 1024
+REPORT_NAME = "corruption_report.json"
+JOURNAL_DIR_NAME = "repair_journal"
+N_RECORDS_OFFSET = 236
+N_RECORDS_LENGTH = 8
+
+TAL_PATTERN = re.compile(rb"[+-]\d+(?:\.\d+)?(?:\x15\d+(?:\.\d+)?)?\x14(?:[^\x14\x00]*\x14)*")
+TIMEKEEPING_PATTERN = re.compile(rb"[+-]\d+(?:\.\d+)?\x14\x14")
+
+def _problem(check, message, severity="error"):
+    return {"check": check, "severity": severity, "message": message}
+
+def check_header(header):
+    """Sanity checks on the parsed header fields."""
+    problems = []
+    if header.version != "0":
+        problems.append(_problem("header", f"Unexpected version field {header.version!r}", "warning"))
+    if header.meas_date is None:
+        problems.append(_problem("header", "Invalid start date/time"))
+    if not header.data_channels:
+        problems.append(_problem("header", "No data signals"))
+    for ch in header.channels:
+        if ch.samples_per_record <= 0:
+            problems.append(_problem("header", f"Signal {ch.label!r} has {ch.samples_per_record} samples per record"))
+        if not -32768 <= ch.digital_min < ch.digital_max <= 32767:
+            problems.append(_problem("header", f"Signal {ch.label!r} has invalid digital range {ch.digital_min}..{ch.digital_max}"))
+        if ch.physical_min == ch.physical_max and not ch.is_annotation:
+            problems.append(_problem("header", f"Signal {ch.label!r} has an empty physical range"))
+    return problems
+
+def check_size(header):
+    """Checks that header_bytes + n_records * record_bytes matches the file size."""
+    problems = []
+    data_bytes = header.file_size - header.header_bytes
+    partial_bytes = data_bytes % header.record_bytes if header.record_bytes else data_bytes
+    if header.n_records == -1:
+        problems.append(_problem("size", "Number of data records is -1 (recording was not closed)"))
+    elif header.n_records != header.available_records:
+        problems.append(_problem(
+            "size", f"Header declares {header.n_records} data records, file holds {header.available_records}"))
+    if partial_bytes:
+        problems.append(_problem("size", f"File ends with a partial data record of {partial_bytes} bytes"))
+    return problems
+
+def check_tal(record, onset_required=True):
+    """Checks that an EDF+ annotation signal holds well-formed TALs."""
+    content = record.rstrip(b"\x00")
+    if not content:
+        return "Empty annotation record" if onset_required else None
+    tals = content.split(b"\x00")
+    if onset_required and not TIMEKEEPING_PATTERN.match(tals[0]):
+        return "Annotation record does not start with a time-keeping TAL"
+    for tal in tals:
+        if not TAL_PATTERN.fullmatch(tal):
+            return f"Malformed TAL {tal[:40]!r}"
+    return None
+
+def scan_data_records(file_path, header, chunk_bytes=SCAN_CHUNK_BYTES, consume=None):
+    """
+    Streams all complete data records and checks the samples.
+
+    Records are read in large sequential chunks and checked vectorized: samples outside
+    the digital range, all-zero records at the end of the file and malformed EDF+ TALs.
+    Every chunk read is also passed to consume, if given (e.g. to hash the file in the
+    same pass).
+    """
+    problems = []
+    record_samples = header.record_bytes // 2
+    if not header.available_records or not record_samples:
+        return problems
+    offsets = np.cumsum([0] + [ch.samples_per_record for ch in header.channels])
+    data_columns = np.concatenate([np.arange(offsets[i], offsets[i + 1])
+                                   for i, ch in enumerate(header.channels) if not ch.is_annotation] or [np.array([], int)])
+    out_of_range = [0] * header.n_signals
+    last_nonzero_record = -1
+    bad_tal = None
+    records_per_chunk = max(1, chunk_bytes // header.record_bytes)
+    # Only the first annotation signal must start each record with a time-keeping TAL
+    timekeeping_index = next((i for i, ch in enumerate(header.channels) if ch.is_annotation), None)
+
+    with open(file_path, "rb", buffering=0) as f:
+        f.seek(header.header_bytes)
+        first_record = 0
+        while first_record < header.available_records:
+            n = min(records_per_chunk, header.available_records - first_record)
+            buffer = f.read(n * header.record_bytes)
+            increment("bytes read: verification", len(buffer))
+            if consume is not None:
+                consume(buffer)
+            n = len(buffer) // header.record_bytes
+            if n == 0:
+                break
+            records = np.frombuffer(buffer, dtype="<i2", count=n * record_samples).reshape(n, record_samples)
+            for i, ch in enumerate(header.channels):
+                samples = records[:, offsets[i]:offsets[i + 1]]
+                if ch.is_annotation:
+                    if bad_tal is None and header.is_edf_plus:
+                        for k in range(n):
+                            if message := check_tal(samples[k].tobytes(), onset_required=(i == timekeeping_index)):
+                                bad_tal = f"Record {first_record + k}: {message}"
+                                break
+                    continue
+                out_of_range[i] += int(np.count_nonzero((samples < ch.digital_min) | (samples > ch.digital_max)))
+            nonzero = np.flatnonzero(np.any(records[:, data_columns] != 0, axis=1)) if data_columns.size else []
+            if len(nonzero):
+                last_nonzero_record = first_record + int(nonzero[-1])
+            first_record += n
+
+    for ch, count in zip(header.channels, out_of_range):
+        if count:
+            problems.append(_problem("full", f"Signal {ch.label!r} has {count} samples outside its digital range"))
+    trailing_zero = header.available_records - 1 - last_nonzero_record
+    if trailing_zero:
+        problems.append(_problem("full", f"{trailing_zero} all-zero data records at the end of the file", "warning"))
+    if bad_tal:
+        problems.append(_problem("full", bad_tal))
+    return problems
+
+def verify_edf(file_path, level="size", header=None, consume=None):
+    """
+    Verifies an EDF file at the given level and returns a report dictionary.
+
+    "header" parses and sanity-checks the header, "size" also compares the declared record
+    count with the file size, "full" also scans every data record (passing the bytes read
+    to consume, see scan_data_records).
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown verification level {level!r}, expected one of {LEVELS}")
+    report = {"file": file_path, "level": level, "ok": True, "problems": []}
+    try:
+        header = header or read_edf_header(file_path)
+    except Exception as e:
+        report["ok"] = False
+        report["problems"].append(_problem("header", f"Header cannot be parsed: {e}"))
+        return report
+
+    report.update(size=header.file_size, n_records=header.n_records, available_records=header.available_records,
+                  record_bytes=header.record_bytes)
+    problems = check_header(header)
+    if level in ("size", "full"):
+        problems += check_size(header)
+    if level == "full":
+        try:
+            problems += scan_data_records(file_path, header, consume=consume)
+        except OSError as e:
+            problems.append(_problem("full", f"Data records cannot be read: {e}"))
+    report["problems"] = problems
+    report["ok"] = not any(problem["severity"] == "error" for problem in problems)
+    return report
+
+def is_edf_corrupted(file_path, validate=False, level="header"):
+    """Checks if an EDF file is corrupted at the given verification level."""
     try:
-        raw = read_raw_edf(file_path, preload=False, verbose=False)  # Use only read_raw_edf
-        return False
+        header = read_edf_header(file_path, validate=validate)
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return True
+    return not verify_edf(file_path, level, header)["ok"]
 
-def find_and_delete_corrupted_edf(directory):
-    """Searches for and deletes corrupted EDF files in the specified directory."""
-    deleted_files = 0
-    edf_files = []
+def write_report(reports, report_path, level):
+    """Writes verification results as JSON."""
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    summary = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "level": level,
+        "checked": len(reports),
+        "corrupted": sum(not report["ok"] for report in reports),
+        "files": reports,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return report_path
 
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".edf"):
-                edf_files.append(os.path.join(root, file))
+def verify_directory(directory, level="size", **executor_options):
+    """Verifies all EDF files under directory on the worker pool and returns their reports."""
+    with stage("walk"):
+        edf_files = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files
+                     if file.endswith(".edf")]
+    return [report for _, report in run_tasks(partial(verify_edf, level=level), edf_files,
+                                              desc="Checking files", **executor_options)]
 
-    for file_path in tqdm(edf_files, desc="Checking files", unit="file"):
-        if is_edf_corrupted(file_path):
-            print(f"File is corrupted: {file_path}")
+def delete_corrupted(reports):
+    """Deletes the files whose report is not ok; returns the deleted paths."""
+    deleted = []
+    for report in reports:
+        if report["ok"]:
+            continue
+        check_cancelled()
+        try:
+            os.remove(report["file"])
+            print(f"File deleted: {report['file']}")
+            deleted.append(report["file"])
+        except Exception as e:
+            print(f"Error deleting file {report['file']}: {e}")
+    return deleted
+
+def plan_repair(header):
+    """
+    Returns (new_size, new_n_records) for a truncated file, or None if it needs no repair.
+
+    A file is truncated when it holds fewer complete records than its header announces,
+    or when the header still says -1 as during a recording. Files holding as many or more
+    records than announced are left alone.
+    """
+    if header.record_bytes == 0:
+        return None
+    new_n_records = header.available_records
+    if header.n_records != -1 and new_n_records >= header.n_records:
+        return None
+    return header.header_bytes + new_n_records * header.record_bytes, new_n_records
+
+def _journal_path(journal_dir, file_path):
+    """Journal entry name unique per file and repair."""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(journal_dir, f"{os.path.basename(file_path)}.{digest}.{stamp}.json")
+
+def repair_truncated_edf(file_path, journal_dir):
+    """
+    Repairs a file left by an interrupted recording, in place.
+
+    The partial trailing data record is cut off and the n_records header field is set to
+    the number of complete records; nothing else is written. The original field and the
+    removed bytes are saved to a journal entry first, so undo_repair can restore the file.
+    Returns the journal entry path, or None if the file needed no repair.
+    """
+    header = read_edf_header(file_path)
+    plan = plan_repair(header)
+    if plan is None:
+        return None
+    new_size, new_n_records = plan
+
+    with open(file_path, "r+b") as f:
+        f.seek(N_RECORDS_OFFSET)
+        original_field = f.read(N_RECORDS_LENGTH)
+        f.seek(new_size)
+        removed = f.read()
+
+        os.makedirs(journal_dir, exist_ok=True)
+        entry_path = _journal_path(journal_dir, file_path)
+        entry = {
+            "file": os.path.abspath(file_path),
+            "original_size": header.file_size,
+            "original_n_records_field": original_field.decode("latin-1"),
+            "removed_bytes": base64.b64encode(removed).decode("ascii"),
+            "new_size": new_size,
+            "new_n_records": new_n_records,
+        }
+        with open(entry_path, "w", encoding="utf-8") as journal:
+            json.dump(entry, journal)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        f.seek(N_RECORDS_OFFSET)
+        f.write(str(new_n_records).ljust(N_RECORDS_LENGTH).encode("ascii"))
+        f.truncate(new_size)
+        f.flush()
+        os.fsync(f.fileno())
+    return entry_path
+
+def undo_repair(entry_path):
+    """Restores a repaired file from its journal entry."""
+    with open(entry_path, encoding="utf-8") as journal:
+        entry = json.load(journal)
+    if os.path.getsize(entry["file"]) != entry["new_size"]:
+        raise ValueError(f"{entry['file']} changed since it was repaired; not restoring")
+    with open(entry["file"], "r+b") as f:
+        f.seek(N_RECORDS_OFFSET)
+        f.write(entry["original_n_records_field"].encode("latin-1"))
+        f.seek(0, os.SEEK_END)
+        f.write(base64.b64decode(entry["removed_bytes"]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(entry_path, entry_path + ".undone")
+    return entry["file"]
+
+@instrumented("repair_truncated_files")
+def repair_truncated_files(directory, **executor_options):
+    """Repairs all truncated EDF files under directory in parallel; returns the number repaired."""
+    with stage("walk"):
+        edf_files = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files
+                     if file.endswith(".edf")]
+    journal_dir = os.path.join(directory, "output", JOURNAL_DIR_NAME)
+    repaired = 0
+    for file_path, entry_path in run_tasks(partial(repair_truncated_edf, journal_dir=journal_dir), edf_files,
+                                           desc="Repairing files", **executor_options):
+        if entry_path:
+            print(f"File repaired: {file_path} (journal: {entry_path})")
+            repaired += 1
+    print(f"Repaired files: {repaired}")
+    return repaired
+
+def undo_repairs(directory):
+    """Restores every file repaired under directory from the journal."""
+    journal_dir = os.path.join(directory, "output", JOURNAL_DIR_NAME)
+    if not os.path.isdir(journal_dir):
+        return 0
+    restored = 0
+    for name in sorted(os.listdir(journal_dir), reverse=True):
+        if name.endswith(".json"):
             try:
-                os.remove(file_path)
-                print(f"File deleted: {file_path}")
-                deleted_files += 1
+                print(f"File restored: {undo_repair(os.path.join(journal_dir, name))}")
+                restored += 1
             except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
+                print(f"Error restoring from {name}: {e}")
+    return restored
+
+@instrumented("find_and_delete_corrupted_edf")
+def find_and_delete_corrupted_edf(directory, level="size", delete=False, **executor_options):
+    """
+    Searches for corrupted EDF files and writes output/corruption_report.json.
+
+    Files are only removed when delete is true; otherwise the report is left for review.
+    """
+    reports = verify_directory(directory, level, **executor_options)
+    corrupted = [report for report in reports if not report["ok"]]
+    for report in corrupted:
+        print(f"File is corrupted: {report['file']}")
+        for problem in report["problems"]:
+            print(f"  [{problem['severity']}] {problem['message']}")
+
+    report_path = write_report(reports, os.path.join(directory, "output", REPORT_NAME), level)
+    print(f"Corrupted files: {len(corrupted)}. Report saved to {report_path}")
 
-    print(f"Deleted corrupted files: {deleted_files}")
+    if delete:
+        deleted = delete_corrupted(corrupted)
+        print(f"Deleted corrupted files: {len(deleted)}")
+    return len(corrupted)
 
 if __name__ == "__main__":
     directory = input("Enter the directory path: ").strip()
 
     if os.path.isdir(directory):
-        find_and_delete_corrupted_edf(directory)
+        level = input(f"Verification level {LEVELS} [size]: ").strip() or "size"
+        if input("Repair truncated files first? [y/N]: ").strip().lower() == "y":
+            repair_truncated_files(directory)
+        delete = input("Delete corrupted files? [y/N]: ").strip().lower() == "y"
+        find_and_delete_corrupted_edf(directory, level, delete)
     else:
-        print("The specified directory does not exist.")
\ No newline at end of file
+        print("The specified directory does not exist.")
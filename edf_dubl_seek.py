@@ -2,56 +2,241 @@
 import hashlib
 import os
 from collections import defaultdict
+from functools import partial
 
-from tqdm import tqdm
+from edf_catalog import EDFCatalog
+from edf_executor import check_cancelled, run_tasks
+from edf_header import read_edf_header
+from edf_metrics import increment, instrumented, stage
 
-def calculate_file_hash(file_path, hash_algorithm="md5", chunk_size=8192):
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_HASH_ALGORITHM = "blake2b"
+READ_SIZE = 4 * 1024 * 1024  # Large sequential reads for full hashing
+BLOCK_SIZE = 64 * 1024  # Head block covers the EDF header of up to 255 signals
+
+def new_hash(hash_algorithm):
+    """Creates a hash object; xxHash names (e.g. 'xxh3_128') are used when the package is installed."""
+    if hash_algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"Hash algorithm {hash_algorithm} requires the xxhash package")
+        return getattr(xxhash, hash_algorithm)()
+    return hashlib.new(hash_algorithm)
+
+def calculate_file_hash(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM, chunk_size=READ_SIZE):
     """Calculates the file hash for content verification."""
-    hash_func = hashlib.new(hash_algorithm)
+    hash_func = new_hash(hash_algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    total = 0
+    with open(file_path, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            hash_func.update(view[:n])
+            total += n
+    increment("bytes read: hashing", total)
+    return hash_func.hexdigest()
+
+def calculate_partial_hash(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM, block_size=BLOCK_SIZE):
+    """
+    Hashes the head block (including the header region) and the tail block of a file.
+
+    Files no larger than two blocks are hashed whole, so for them the result equals
+    calculate_file_hash and no full pass is needed.
+    """
+    size = os.path.getsize(file_path)
+    if size <= 2 * block_size:
+        return calculate_file_hash(file_path, hash_algorithm)
+    hash_func = new_hash(hash_algorithm)
     with open(file_path, "rb") as f:
-        while chunk := f.read(chunk_size):
-            hash_func.update(chunk)
+        hash_func.update(f.read(block_size))
+        f.seek(-block_size, os.SEEK_END)
+        hash_func.update(f.read(block_size))
+    increment("bytes read: hashing", 2 * block_size)
     return hash_func.hexdigest()
 
-def find_duplicate_files(directory):
-    """Searches for duplicate files in the specified directory."""
+def _group_by(paths, key_func, desc, **executor_options):
+    """Groups paths by the value of key_func computed on the worker pool."""
+    groups = defaultdict(list)
+    for path, key in run_tasks(key_func, paths, desc=desc, **executor_options):
+        groups[key].append(path)
+    return groups
+
+@instrumented("find_duplicate_files")
+def find_duplicate_files(directory, hash_algorithm=DEFAULT_HASH_ALGORITHM, catalog=None, **executor_options):
+    """
+    Searches for duplicate files in the specified directory.
+
+    Files are narrowed down in stages: equal size, then equal head/tail block hash, and only
+    the remaining candidates are hashed in full. Full digests are cached in the catalog by
+    path, size and mtime, so unchanged files are never rehashed on later runs.
+    """
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = EDFCatalog.for_directory(directory)
+    output_dir = os.path.abspath(os.path.join(directory, "output"))
     size_dict = defaultdict(list)
 
-    # Collect files by size
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_size = os.path.getsize(file_path)
-            size_dict[file_size].append(file_path)
+    # Collect files by size, skipping our own output folder
+    with stage("walk"):
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir]
+            for file in files:
+                file_path = os.path.join(root, file)
+                file_size = os.path.getsize(file_path)
+                size_dict[file_size].append(file_path)
+
+    # Compare head and tail blocks of files with the same size
+    same_size = [path for paths in size_dict.values() if len(paths) > 1 for path in paths]
+    partial_groups = _group_by(same_size, partial(calculate_partial_hash, hash_algorithm=hash_algorithm),
+                               "Checking file blocks", **executor_options)
 
     hash_dict = defaultdict(list)
+    to_hash = []
+    for partial_hash, paths in partial_groups.items():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            stat_result = os.stat(path)
+            if stat_result.st_size <= 2 * BLOCK_SIZE:
+                # Small files were hashed whole in the previous stage
+                hash_dict[partial_hash].append(path)
+            elif (digest := catalog.get_digest(path, hash_algorithm, stat_result)) is not None:
+                increment("digest cache: hits")
+                hash_dict[digest].append(path)
+            else:
+                increment("digest cache: misses")
+                to_hash.append((path, stat_result))
 
-    # Check hash for files with the same size
-    for size, paths in tqdm(size_dict.items(), desc="Checking files", unit="group"):
-        if len(paths) > 1:
-            for path in paths:
-                file_hash = calculate_file_hash(path)
-                hash_dict[file_hash].append(path)
+    # Full hashes only for the survivors
+    stats = dict(to_hash)
+    for path, digest in run_tasks(partial(calculate_file_hash, hash_algorithm=hash_algorithm), list(stats),
+                                  desc="Checking files", **executor_options):
+        catalog.store_digest(path, hash_algorithm, stats[path], digest)
+        hash_dict[digest].append(path)
+
+    catalog.commit()
+    if own_catalog:
+        catalog.close()
 
     # Filter duplicates
-    duplicates = {hash_val: paths for hash_val, paths in hash_dict.items() if len(paths) > 1}
+    duplicates = {hash_val: sorted(paths) for hash_val, paths in hash_dict.items() if len(paths) > 1}
 
     return duplicates
 
+def signal_signature(header):
+    """Describes the header fields that define the signals (labels, rates, ranges, record layout)."""
+    channels = [(ch.label, ch.samples_per_record, ch.physical_dimension, ch.physical_min, ch.physical_max,
+                 ch.digital_min, ch.digital_max) for ch in header.channels]
+    return repr((header.record_duration, header.available_records, channels))
+
+def _hash_data_range(hash_func, f, start, stop, chunk_size=READ_SIZE):
+    """Feeds bytes [start, stop) of an open file into hash_func."""
+    f.seek(start)
+    remaining = stop - start
+    while remaining > 0 and (chunk := f.read(min(chunk_size, remaining))):
+        hash_func.update(chunk)
+        remaining -= len(chunk)
+    increment("bytes read: hashing", stop - start - remaining)
+
+def calculate_signal_prefilter(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """Hashes the signal-defining header fields plus the first and last data records."""
+    header = read_edf_header(file_path)
+    hash_func = new_hash(hash_algorithm)
+    hash_func.update(signal_signature(header).encode())
+    if header.available_records:
+        first_end = header.header_bytes + header.record_bytes
+        last_start = header.header_bytes + (header.available_records - 1) * header.record_bytes
+        with open(file_path, "rb") as f:
+            _hash_data_range(hash_func, f, header.header_bytes, first_end)
+            _hash_data_range(hash_func, f, last_start, last_start + header.record_bytes)
+    return hash_func.hexdigest()
+
+def calculate_signal_hash(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """Hashes the signal-defining header fields and all complete data records, ignoring the rest of the header."""
+    header = read_edf_header(file_path)
+    hash_func = new_hash(hash_algorithm)
+    hash_func.update(signal_signature(header).encode())
+    with open(file_path, "rb", buffering=0) as f:
+        _hash_data_range(hash_func, f, header.header_bytes,
+                         header.header_bytes + header.available_records * header.record_bytes)
+    return hash_func.hexdigest()
+
+@instrumented("find_duplicate_recordings")
+def find_duplicate_recordings(directory, hash_algorithm=DEFAULT_HASH_ALGORITHM, catalog=None, **executor_options):
+    """
+    Searches for EDF files holding the same recording, whatever their patient/recording fields say.
+
+    Copies that were re-anonymized or re-exported differ only in the header, so files are
+    compared by their signal description and data records. Candidates are grouped by the
+    cached header, then by a first/last record hash; only the survivors are streamed in full.
+    """
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = EDFCatalog.for_directory(directory)
+    with stage("walk"):
+        edf_files = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files
+                     if file.lower().endswith(".edf")]
+    headers, _ = catalog.get_headers(edf_files, desc="Reading headers", **executor_options)
+
+    signature_dict = defaultdict(list)
+    for path, header in headers.items():
+        signature_dict[signal_signature(header)].append(path)
+
+    same_layout = [path for paths in signature_dict.values() if len(paths) > 1 for path in paths]
+    prefilter_groups = _group_by(same_layout, partial(calculate_signal_prefilter, hash_algorithm=hash_algorithm),
+                                 "Checking first/last records", **executor_options)
+
+    # Signal digests share the digest cache under their own algorithm name
+    cache_key = f"signal-{hash_algorithm}"
+    hash_dict = defaultdict(list)
+    stats = {}
+    for paths in prefilter_groups.values():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            stat_result = os.stat(path)
+            if (digest := catalog.get_digest(path, cache_key, stat_result)) is not None:
+                increment("digest cache: hits")
+                hash_dict[digest].append(path)
+            else:
+                increment("digest cache: misses")
+                stats[path] = stat_result
+
+    for path, digest in run_tasks(partial(calculate_signal_hash, hash_algorithm=hash_algorithm), list(stats),
+                                  desc="Checking signal data", **executor_options):
+        catalog.store_digest(path, cache_key, stats[path], digest)
+        hash_dict[digest].append(path)
+
+    catalog.commit()
+    if own_catalog:
+        catalog.close()
+
+    return {hash_val: sorted(paths) for hash_val, paths in hash_dict.items() if len(paths) > 1}
+
 def delete_duplicates(duplicates):
-    """Deletes all duplicates except one."""
+    """Deletes all duplicates except one; returns the deleted paths."""
+    from tqdm import tqdm
+
+    deleted = []
     for hash_val, paths in duplicates.items():
         for path in tqdm(paths[1:], desc="Deleting duplicates", unit="file"):
+            check_cancelled()
             try:
                 os.remove(path)
+                deleted.append(path)
                 print(f"Deleted file: {path}")
             except OSError as e:
                 print(f"Error deleting file {path}: {e}")
+    return deleted
 
 def main():
     """Main function for finding and deleting duplicates."""
     directory = input("Enter the directory path: ")
-    duplicates = find_duplicate_files(directory)
+    signal_only = input("Compare signal data only, ignoring patient/recording fields? [y/N]: ").strip().lower() == "y"
+    duplicates = find_duplicate_recordings(directory) if signal_only else find_duplicate_files(directory)
 
     if duplicates:
         print("Found duplicate files (matching content):")
@@ -65,4 +250,4 @@ def main():
         print("No duplicate files found.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,116 @@
+# edf_events.py
+import logging
+import numpy as np
+from edf_header import STIM_LABELS, read_edf_header
+from edf_signal import EDFSignals
+
+EVENT_CHANNEL_LABELS = STIM_LABELS + ("stim",)
+CHUNK_SAMPLES = 1 << 20  # Stim samples decoded per chunk
+SHORTEST_EVENT = 2
+TRIGGER_MASK = 2 ** 17 - 1  # MNE keeps the lower 17 bits of full-rate stim channels
+
+def stim_channels(header):
+    """Indexes of the channels that carry trigger values (MNE's 'status'/'trigger', plus 'stim')."""
+    return [i for i, ch in enumerate(header.channels)
+            if not ch.is_annotation and ch.label.lower() in EVENT_CHANNEL_LABELS]
+
+def iter_stim_values(file_path, header, index, chunk_samples=CHUNK_SAMPLES):
+    """
+    Yields the trigger values of one channel as int64 chunks, decoded the way MNE does.
+
+    Only the channel's slice of each data record is copied out of the memory map
+    (see edf_signal.EDFSignals), a few records at a time. Channels sampled below the
+    record's highest rate are repeated to that rate (zero-order hold), as MNE
+    interpolates them.
+    """
+    channel = header.channels[index]
+    n_per_record = max(ch.samples_per_record for ch in header.data_channels)
+    upsample = None
+    if channel.samples_per_record != n_per_record:
+        upsample = np.arange(n_per_record) * channel.samples_per_record // n_per_record
+
+    with EDFSignals(file_path, header) as signals:
+        for values in signals.iter_records(index, max(1, chunk_samples // n_per_record), physical=True):
+            if upsample is None:
+                values = np.bitwise_and(values.astype(np.int64), TRIGGER_MASK)
+            else:
+                values = values[:, upsample].astype(np.int64)
+            # MNE takes the absolute value once any sample is negative; that is a no-op otherwise
+            yield np.abs(values.ravel())
+
+def find_channel_events(chunks, n_times):
+    """
+    Streams mne.find_events over trigger value chunks (default arguments, onset output).
+
+    Steps are detected per chunk, carrying the last value across chunk boundaries, so
+    memory stays constant apart from the events themselves.
+    """
+    onsets = []
+    previous = None
+    position = 0
+    last_onset = last_offset = -1
+    for values in chunks:
+        if not len(values):
+            continue
+        joined = values if previous is None else np.concatenate(([previous], values))
+        base = position if previous is None else position - 1
+        idx = np.flatnonzero(joined[1:] != joined[:-1])
+        pre, post = joined[idx], joined[idx + 1]
+        samples = base + idx + 1
+        is_onset = post > pre
+        is_offset = (is_onset | (post == 0)) & (pre > 0)
+        if is_onset.any():
+            onsets.append(np.column_stack((samples[is_onset], pre[is_onset], post[is_onset])))
+            last_onset = samples[is_onset][-1]
+        if is_offset.any():
+            last_offset = samples[is_offset][-1]
+        position += len(values)
+        previous = joined[-1]
+    if previous is None or not onsets:
+        return np.empty((0, 3), dtype=np.int64)
+    if previous != 0:
+        # The channel is padded with a zero after its end, closing the last event
+        last_offset = n_times
+    if last_offset < 0:
+        return np.empty((0, 3), dtype=np.int64)
+
+    events = np.concatenate(onsets).astype(np.int64)
+    if last_onset > last_offset:
+        events = events[:-1]
+    return events
+
+def _unique_rows(events):
+    """Drops duplicated events, the way MNE merges several stim channels."""
+    rows = np.ascontiguousarray(events).view(np.dtype((np.void, events.dtype.itemsize * events.shape[1])))
+    _, idx = np.unique(rows, return_index=True)
+    return events[idx]
+
+def find_stim_events(file_path, header=None, chunk_samples=CHUNK_SAMPLES):
+    """
+    Returns the same (n_events, 3) array as mne.find_events(read_raw_edf(file_path)).
+
+    Only the stim channels' samples are read, in constant memory. Returns an empty
+    array if the file has no stim channel.
+    """
+    header = header or read_edf_header(file_path)
+    events_list = []
+    for index in stim_channels(header):
+        events = find_channel_events(iter_stim_values(file_path, header, index, chunk_samples), header.n_times)
+        n_short_events = np.sum(np.diff(events[:, 0]) < SHORTEST_EVENT)
+        if n_short_events > 0:
+            raise ValueError(f"You have {n_short_events} events shorter than the shortest_event in "
+                             f"channel {header.channels[index].label}")
+        events_list.append(events)
+    if not events_list:
+        return np.empty((0, 3), dtype=np.int64)
+    events = np.concatenate(events_list)
+    if len(events_list) > 1:
+        n_events = len(events)
+        events = _unique_rows(events)
+        if len(events) < n_events:
+            logging.warning(f"{n_events - len(events)} duplicated events in {file_path} were ignored")
+    return events[np.argsort(events[:, 0])]
+
+def extract_stim_events(file_path):
+    """Extracts stim events as a list of [sample, previous, value] rows."""
+    return find_stim_events(file_path).tolist()
@@ -0,0 +1,143 @@
+# edf_executor.py
+import os
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from edf_metrics import Metrics, collecting, current_metrics, stage
+
+BACKENDS = ("process", "thread", "serial")
+DEFAULT_BACKEND = "process"
+DEFAULT_CHUNKSIZE = 16
+
+_reporter = ContextVar("edf_progress_reporter", default=None)
+
+class OperationCancelled(Exception):
+    """Raised inside an operation after the user cancelled it."""
+
+@contextmanager
+def report_progress(reporter):
+    """
+    Sends the progress of run_tasks calls made in the current thread to reporter.
+
+    The reporter provides start(desc, total, unit), advance(item) and a cancelled
+    attribute; once cancelled is true the running operation raises OperationCancelled.
+    """
+    token = _reporter.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _reporter.reset(token)
+
+def check_cancelled():
+    """Raises OperationCancelled if the operation running in this thread was cancelled."""
+    reporter = _reporter.get()
+    if reporter is not None and reporter.cancelled:
+        raise OperationCancelled()
+
+def default_workers(backend):
+    """Returns the default worker count for a backend."""
+    cpus = os.cpu_count() or 1
+    if backend == "process":
+        return cpus
+    return min(32, cpus + 4)
+
+def _run_chunk(func, chunk):
+    """Applies func to each item of a chunk, capturing errors per item."""
+    results = []
+    for item in chunk:
+        try:
+            results.append((item, func(item), None))
+        except Exception as e:
+            results.append((item, None, e))
+    return results
+
+def _run_chunk_measured(func, chunk):
+    """_run_chunk under a metrics collector of its own; returns the results and the worker's metrics."""
+    metrics = Metrics()
+    with collecting(metrics):
+        results = _run_chunk(func, chunk)
+    return results, metrics.to_dict()
+
+def _task_label(func, desc):
+    """Name of a run_tasks call in the metrics: its description or the function name."""
+    return desc or getattr(getattr(func, "func", func), "__name__", "tasks")
+
+def _collect(output, progress, reporter, metrics=None, label=None):
+    """Yields successful (item, result) pairs of a finished chunk and logs the failures."""
+    results = output
+    if metrics is not None:
+        results, snapshot = output
+        metrics.merge(snapshot)
+        metrics.counters[f"{label}: items"] += len(results)
+    for item, result, error in results:
+        progress.update(1)
+        if reporter is not None:
+            reporter.advance(item)
+            check_cancelled()
+        if error is not None:
+            logging.error(f"Error processing {item}: {error}")
+            if metrics is not None:
+                metrics.counters[f"{label}: errors"] += 1
+        else:
+            yield item, result
+
+def run_tasks(func, items, backend=DEFAULT_BACKEND, max_workers=None, chunksize=DEFAULT_CHUNKSIZE,
+              ordered=True, desc=None, unit="file"):
+    """
+    Runs func over items on a thread or process pool and yields (item, result) pairs.
+
+    Items are submitted in chunks with at most two chunks per worker in flight. Results
+    come back in input order when ordered is true, otherwise as soon as each chunk is done.
+    Items whose call raised are logged and skipped. With the process backend func and
+    items must be picklable (module-level functions, paths). Progress goes to tqdm and to
+    the reporter installed with report_progress; on cancellation queued chunks are dropped.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown executor backend {backend!r}, expected one of {BACKENDS}")
+    items = list(items)
+    chunksize = max(1, chunksize)
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    from tqdm import tqdm  # Imported on first use, so the GUI starts without it
+
+    reporter = _reporter.get()
+    if reporter is not None:
+        reporter.start(desc, len(items), unit)
+        check_cancelled()
+
+    # With metrics on, every chunk sends its stages and counters back with the results
+    metrics = current_metrics()
+    run_chunk = _run_chunk if metrics is None else _run_chunk_measured
+    label = _task_label(func, desc)
+
+    with tqdm(total=len(items), desc=desc, unit=unit, disable=desc is None or not items) as progress, stage(label):
+        # A single chunk is not worth a pool
+        if backend == "serial" or len(chunks) <= 1:
+            for chunk in chunks:
+                yield from _collect(run_chunk(func, chunk), progress, reporter, metrics, label)
+            return
+
+        max_workers = max_workers or default_workers(backend)
+        pool_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+        with pool_class(max_workers=min(max_workers, len(chunks))) as pool:
+            remaining = iter(chunks)
+            pending = deque(pool.submit(run_chunk, func, chunk) for chunk in islice(remaining, 2 * max_workers))
+            try:
+                while pending:
+                    if ordered:
+                        future = pending.popleft()
+                    else:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        future = done.pop()
+                        pending.remove(future)
+                    next_chunk = next(remaining, None)
+                    if next_chunk is not None:
+                        pending.append(pool.submit(run_chunk, func, next_chunk))
+                    yield from _collect(future.result(), progress, reporter, metrics, label)
+            finally:
+                # Cancelled or abandoned early: do not start the queued chunks
+                for future in pending:
+                    future.cancel()
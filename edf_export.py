@@ -0,0 +1,164 @@
+# edf_export.py
+import os
+import csv
+from functools import partial
+from edf_executor import run_tasks
+from edf_header import read_header_bytes
+from edf_metrics import instrumented
+from edfinfo_chg import BIRTHDATE_MODES, IDENTITY_OFFSET, plan_anonymization, verify_identity_change
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MANIFEST_NAME = "export_manifest.csv"
+FICLONE = 0x40049409  # Linux ioctl that makes the target share the source's extents (reflink)
+COPY_CHUNK = 64 * 1024 * 1024  # Bytes per kernel copy call
+READ_SIZE = 4 * 1024 * 1024  # Buffer of the user-space fallback
+
+def _reflink(src_fd, dst_fd):
+    """Clones the whole source file into the target; returns False if the filesystem cannot."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    while count > 0:
+        copied = os.copy_file_range(src_fd, dst_fd, min(count, COPY_CHUNK), offset, offset)
+        if copied == 0:
+            break
+        offset += copied
+        count -= copied
+    return count
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while count > 0:
+        copied = os.sendfile(dst_fd, src_fd, offset, min(count, COPY_CHUNK))
+        if copied == 0:
+            break
+        offset += copied
+        count -= copied
+    return count
+
+def _read_write(src_fd, dst_fd, offset, count):
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while count > 0:
+        chunk = os.read(src_fd, min(count, READ_SIZE))
+        if not chunk:
+            break
+        os.write(dst_fd, chunk)
+        count -= len(chunk)
+    return count
+
+def copy_range(src_fd, dst_fd, offset, count):
+    """
+    Copies count bytes at offset from one file to the same offset of another.
+
+    copy_file_range and sendfile keep the bytes inside the kernel; a plain read/write
+    loop is the last resort. Returns the name of the method that did the copy.
+    """
+    for name, copy in (("copy_file_range", _copy_file_range), ("sendfile", _sendfile)):
+        if not hasattr(os, name):
+            continue
+        try:
+            remaining = copy(src_fd, dst_fd, offset, count)
+        except OSError:
+            continue  # E.g. EXDEV or EINVAL on this filesystem pair
+        if remaining == 0:
+            return name
+        offset, count = offset + count - remaining, remaining
+    _read_write(src_fd, dst_fd, offset, count)
+    return "read/write"
+
+def export_anonymized(source, target, birthdate='year'):
+    """
+    Writes an anonymized copy of an EDF file; the source is only read.
+
+    The target gets the rewritten header, and the data section is reflinked or copied in
+    the kernel. The copy is written to a temporary name, its header is re-read and
+    verified, and only then is it renamed into place. Returns a manifest row.
+    """
+    before = read_header_bytes(source)
+    _, _, new_identity = plan_anonymization(before, source, birthdate)
+    header = before[:IDENTITY_OFFSET] + new_identity + before[IDENTITY_OFFSET + len(new_identity):]
+    size = os.path.getsize(source)
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    temporary = target + ".part"
+    flags = getattr(os, 'O_BINARY', 0)
+    src_fd = os.open(source, os.O_RDONLY | flags)
+    try:
+        dst_fd = os.open(temporary, os.O_RDWR | os.O_CREAT | os.O_TRUNC | flags, 0o644)
+        try:
+            if _reflink(src_fd, dst_fd):
+                method = "reflink"
+            else:
+                method = copy_range(src_fd, dst_fd, len(header), size - len(header))
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            os.write(dst_fd, header)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            verify_identity_change(before, os.read(dst_fd, len(before)), target)
+            if os.fstat(dst_fd).st_size != size:
+                raise OSError(f"Copy of {source} has {os.fstat(dst_fd).st_size} bytes instead of {size}")
+        finally:
+            os.close(dst_fd)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    finally:
+        os.close(src_fd)
+    os.replace(temporary, target)
+    return {"source": source, "target": target, "size": size, "method": method}
+
+def _export_pair(pair, birthdate):
+    return export_anonymized(pair[0], pair[1], birthdate)
+
+@instrumented("export_directory")
+def export_directory(directory, target_directory, birthdate='year', **executor_options):
+    """
+    Exports anonymized copies of all EDF files under directory into target_directory.
+
+    The folder structure is mirrored; the originals are never modified. Files are
+    exported on the worker pool, and the source -> target mapping is written to
+    MANIFEST_NAME in the target directory as each file finishes. Returns the rows.
+    """
+    if birthdate not in BIRTHDATE_MODES:
+        raise ValueError(f"Unknown birthdate mode {birthdate!r}, expected one of {BIRTHDATE_MODES}")
+    directory, target_directory = os.path.abspath(directory), os.path.abspath(target_directory)
+    skip = {os.path.join(directory, "output"), target_directory}
+    pairs = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip]
+        for file in files:
+            if file.lower().endswith('.edf'):
+                source = os.path.join(root, file)
+                pairs.append((source, os.path.join(target_directory, os.path.relpath(source, directory))))
+
+    os.makedirs(target_directory, exist_ok=True)
+    rows = []
+    with open(os.path.join(target_directory, MANIFEST_NAME), 'w', newline='', encoding='utf-8') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(["Source", "Target", "Size", "Method"])
+        for _, row in run_tasks(partial(_export_pair, birthdate=birthdate), pairs, desc="Exporting files",
+                                **executor_options):
+            writer.writerow([os.path.relpath(row["source"], directory), os.path.relpath(row["target"], target_directory),
+                             row["size"], row["method"]])
+            rows.append(row)
+    print(f"Exported files: {len(rows)} of {len(pairs)}")
+    return rows
+
+if __name__ == "__main__":
+    input_directory = input("Enter the path to the directory containing EDF files: ").strip()
+    output_directory = input("Enter the path to the export directory: ").strip()
+    if not os.path.isdir(input_directory):
+        print("The specified directory does not exist.")
+    else:
+        export_directory(input_directory, output_directory)
@@ -0,0 +1,187 @@
+# edf_gui_worker.py
+import io
+import os
+import time
+import queue
+import logging
+import threading
+import importlib
+import tkinter as tk
+from contextlib import redirect_stdout
+from tkinter import messagebox, ttk
+from edf_executor import OperationCancelled, report_progress
+
+POLL_MS = 100  # How often the Tk thread drains the message queue
+REPORT_INTERVAL = 0.1  # Minimum seconds between progress messages from the worker
+
+# Plots are only saved to files, and they are now drawn off the Tk thread. Setting the
+# backend through the environment keeps matplotlib out of the GUI startup.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+def lazy_operation(module_name, function_name):
+    """
+    Returns a function that imports module_name when it is first called and runs its
+    function_name; the import then happens on the worker thread, not at GUI startup.
+    """
+    def operation(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), function_name)(*args, **kwargs)
+    return operation
+
+class QueueReporter:
+    """Progress reporter for run_tasks that forwards rates and ETA to the Tk thread through a queue."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.cancel_event = threading.Event()
+        self.start(None, 0, "file")
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def start(self, desc, total, unit):
+        """Begins a new stage of the operation."""
+        self.desc, self.total, self.unit = desc, total, unit
+        self.done = self.bytes = 0
+        self.started = self.reported = time.monotonic()
+        self.messages.put(("progress", desc, 0, total, ""))
+
+    def advance(self, item):
+        """Counts one finished item; file paths also count towards MB/s."""
+        self.done += 1
+        if isinstance(item, str):
+            try:
+                self.bytes += os.path.getsize(item)
+            except OSError:
+                pass
+        now = time.monotonic()
+        if now - self.reported < REPORT_INTERVAL and self.done < self.total:
+            return
+        self.reported = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.done / elapsed
+        status = f"{rate:.1f} {self.unit}/s"
+        if self.bytes:
+            status += f", {self.bytes / elapsed / 1e6:.1f} MB/s"
+        status += f", ETA {(self.total - self.done) / rate:.0f} s"
+        self.messages.put(("progress", self.desc, self.done, self.total, status))
+
+class _QueueWriter(io.TextIOBase):
+    """Text stream that sends printed output to the queue."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def write(self, text):
+        if text:
+            self.messages.put(("text", text))
+        return len(text)
+
+class OperationRunner:
+    """
+    Runs one operation at a time on a worker thread, keeping the Tk window responsive.
+
+    The worker only talks to the Tk thread through a queue: progress from run_tasks,
+    printed output and the final result. The Tk thread drains the queue every POLL_MS
+    and inserts text into the output pane in batches. Cancel stops the operation at the
+    next file boundary.
+    """
+
+    def __init__(self, root, text_output):
+        self.root = root
+        self.text_output = text_output
+        self.messages = queue.Queue()
+        self.reporter = None
+        self.worker = None
+
+        self.frame = tk.Frame(root)
+        self.progress = ttk.Progressbar(self.frame, length=450, mode="determinate")
+        self.progress.grid(row=0, column=0, padx=5)
+        self.cancel_button = tk.Button(self.frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, padx=5)
+        self.status = tk.Label(self.frame, text="", anchor="w", width=80)
+        self.status.grid(row=1, column=0, columnspan=2, sticky="w", padx=5)
+
+    @property
+    def busy(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def write(self, text):
+        """Queues text for the output pane; safe to call from the worker."""
+        self.messages.put(("text", text))
+
+    def run(self, operation_name, operation_func, *args):
+        """Starts operation_func(*args) on the worker thread."""
+        if self.busy:
+            messagebox.showwarning("Busy", "Another operation is still running.")
+            return
+        self.reporter = QueueReporter(self.messages)
+        self.write(f"Started {operation_name}...\n")
+        self.cancel_button.config(state=tk.NORMAL)
+        self.worker = threading.Thread(target=self._work, args=(operation_name, operation_func, args, self.reporter),
+                                       daemon=True)
+        self.worker.start()
+        self.root.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        """Asks the running operation to stop."""
+        if self.reporter is not None:
+            self.reporter.cancel_event.set()
+            self.status.config(text="Cancelling...")
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def _work(self, operation_name, operation_func, args, reporter):
+        """Worker thread body; every outcome ends with a 'done' message."""
+        with report_progress(reporter), redirect_stdout(_QueueWriter(self.messages)):
+            try:
+                result = operation_func(*args)
+                self.messages.put(("done", operation_name, result, None))
+            except OperationCancelled:
+                self.messages.put(("done", operation_name, None, OperationCancelled()))
+            except Exception as e:
+                logging.error(f"Error during {operation_name}: {e}")
+                self.messages.put(("done", operation_name, None, e))
+
+    def _poll(self):
+        """Drains the queue on the Tk thread."""
+        texts, progress, finished = [], None, None
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "text":
+                texts.append(message[1])
+            elif message[0] == "progress":
+                progress = message[1:]
+            else:
+                finished = message[1:]
+
+        if progress is not None:
+            desc, done, total, status = progress
+            self.progress.config(maximum=max(total, 1), value=done)
+            if not self.reporter.cancelled:
+                self.status.config(text=f"{desc or 'Working'}: {done}/{total} {status}")
+        if finished is not None:
+            texts.append(self._finish(*finished))
+        if texts:
+            self.text_output.insert(tk.END, "".join(texts))
+            self.text_output.see(tk.END)
+        if finished is None:
+            self.root.after(POLL_MS, self._poll)
+        elif finished[2] is not None and not isinstance(finished[2], OperationCancelled):
+            messagebox.showerror("Error", f"An error occurred: {finished[2]}")
+
+    def _finish(self, operation_name, result, error):
+        """Resets the progress widgets and returns the closing text of an operation."""
+        self.progress.config(value=0)
+        self.status.config(text="")
+        self.cancel_button.config(state=tk.DISABLED)
+        if isinstance(error, OperationCancelled):
+            return f"{operation_name.capitalize()} cancelled.\n"
+        if error is not None:
+            return f"Error: {error}\n"
+        text = f"{operation_name.capitalize()} completed.\n"
+        if result:
+            text += f"Result: {result}\n"
+        return text
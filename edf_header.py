@@ -0,0 +1,366 @@
+# edf_header.py
+import os
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from edf_metrics import increment, stage
+
+HEADER_SIZE = 256
+SIGNAL_HEADER_SIZE = 256
+SAMPLE_BYTES = 2
+TAL_LABELS = ("EDF Annotations", "BDF Annotations")
+STIM_LABELS = ("status", "trigger")
+
+# Byte layout of the fixed part of the header: (name, offset, length)
+FIXED_FIELDS = (
+    ("version", 0, 8),
+    ("patient_id", 8, 80),
+    ("recording_id", 88, 80),
+    ("start_date", 168, 8),
+    ("start_time", 176, 8),
+    ("header_bytes", 184, 8),
+    ("reserved", 192, 44),
+    ("n_records", 236, 8),
+    ("record_duration", 244, 8),
+    ("n_signals", 252, 4),
+)
+
+# Per-signal fields follow the fixed part, each stored for all signals in turn
+SIGNAL_FIELDS = (
+    ("label", 16),
+    ("transducer", 80),
+    ("physical_dimension", 8),
+    ("physical_min", 8),
+    ("physical_max", 8),
+    ("digital_min", 8),
+    ("digital_max", 8),
+    ("prefiltering", 80),
+    ("samples_per_record", 8),
+    ("reserved", 32),
+)
+
+class EDFHeaderError(ValueError):
+    """Raised when an EDF header cannot be parsed."""
+
+@dataclass
+class EDFPatient:
+    """Parts of the EDF+ patient identification field."""
+    code: str = ''
+    sex: str = ''
+    birthdate: date = None
+    name: str = ''
+    additional: list = field(default_factory=list)
+
+@dataclass
+class EDFRecording:
+    """Parts of the EDF+ recording identification field."""
+    startdate: date = None
+    admin_code: str = ''
+    technician: str = ''
+    equipment: str = ''
+    additional: list = field(default_factory=list)
+
+@dataclass
+class EDFChannel:
+    """Header description of a single signal."""
+    label: str
+    transducer: str
+    physical_dimension: str
+    physical_min: float
+    physical_max: float
+    digital_min: int
+    digital_max: int
+    prefiltering: str
+    samples_per_record: int
+    sfreq: float
+
+    @property
+    def is_annotation(self):
+        """True for EDF+ annotation (TAL) signals."""
+        return self.label in TAL_LABELS
+
+    @property
+    def gain(self):
+        """Physical units per digital step."""
+        digital_range = self.digital_max - self.digital_min
+        if digital_range == 0:
+            return 1.0
+        return (self.physical_max - self.physical_min) / digital_range
+
+    @property
+    def offset(self):
+        """Physical value corresponding to a digital zero."""
+        return self.physical_min - self.digital_min * self.gain
+
+@dataclass
+class EDFHeader:
+    """Metadata held in the fixed 256 + ns * 256 byte EDF/EDF+ header."""
+    file_path: str
+    file_size: int
+    version: str
+    patient_id: str
+    recording_id: str
+    patient: EDFPatient
+    recording: EDFRecording
+    start_datetime: datetime
+    header_bytes: int
+    reserved: str
+    n_records: int
+    record_duration: float
+    channels: list
+
+    @property
+    def n_signals(self):
+        return len(self.channels)
+
+    @property
+    def is_edf_plus(self):
+        return self.reserved.startswith('EDF+')
+
+    @property
+    def record_bytes(self):
+        """Size of one data record in bytes."""
+        return sum(ch.samples_per_record for ch in self.channels) * SAMPLE_BYTES
+
+    @property
+    def available_records(self):
+        """Number of complete data records actually present in the file."""
+        if self.record_bytes == 0:
+            return 0
+        return max(self.file_size - self.header_bytes, 0) // self.record_bytes
+
+    @property
+    def data_channels(self):
+        """Signals excluding EDF+ annotation channels."""
+        return [ch for ch in self.channels if not ch.is_annotation]
+
+    @property
+    def ch_names(self):
+        """Channel names as MNE reports them (annotations dropped, duplicates numbered)."""
+        names = [ch.label for ch in self.data_channels]
+        duplicates = {name for name in names if names.count(name) > 1}
+        for stem in duplicates:
+            positions = [i for i, name in enumerate(names) if name == stem]
+            for number, position in enumerate(positions):
+                names[position] = f"{stem}-{number}"
+        return names
+
+    @property
+    def sfreq(self):
+        """Highest sampling frequency among the non-stim data channels."""
+        channels = self.data_channels
+        regular = [ch for ch in channels if ch.label.lower() not in STIM_LABELS] or channels
+        if not regular:
+            return 0.0
+        return max(ch.samples_per_record for ch in regular) / self.record_duration
+
+    @property
+    def n_times(self):
+        """Number of samples per channel, inferred from the file size like MNE."""
+        channels = self.data_channels
+        if not channels:
+            return 0
+        return self.available_records * max(ch.samples_per_record for ch in channels)
+
+    @property
+    def duration(self):
+        """Time of the last sample in seconds (equivalent to ``raw.times[-1]``)."""
+        if self.sfreq == 0 or self.n_times == 0:
+            return 0.0
+        return (self.n_times - 1) / self.sfreq
+
+    @property
+    def subject_info(self):
+        """Patient information shaped like MNE's ``info['subject_info']``."""
+        subject_info = {}
+        if self.patient.code:
+            subject_info['his_id'] = self.patient.code
+        if self.patient.sex:
+            subject_info['sex'] = {'M': 1, 'F': 2}.get(self.patient.sex, 0)
+        if self.patient.name:
+            names = self.patient.name.split('_')
+            if len(names) == 2:
+                subject_info['first_name'], subject_info['last_name'] = names
+            elif len(names) == 3:
+                subject_info['first_name'], subject_info['middle_name'], subject_info['last_name'] = names
+            else:
+                subject_info['last_name'] = self.patient.name
+        if self.patient.birthdate:
+            subject_info['birthday'] = self.patient.birthdate
+        for item in self.patient.additional:
+            key, _, value = item.partition('=')
+            try:
+                if key in ('weight', 'height'):
+                    subject_info[key] = float(value)
+                elif key == 'hand':
+                    subject_info[key] = int(value)
+            except ValueError:
+                continue
+        return subject_info
+
+    @property
+    def meas_date(self):
+        return self.start_datetime
+
+def _text(raw):
+    """Decodes a header field the way MNE does."""
+    return raw.decode('latin-1').split('\x00')[0]
+
+def _number(raw, name, cast=float):
+    """Parses a numeric header field."""
+    text = _text(raw).strip().replace(',', '.')
+    try:
+        return cast(float(text)) if cast is int else cast(text)
+    except ValueError:
+        raise EDFHeaderError(f"Invalid {name} field: {text!r}")
+
+def _parse_edf_date(text):
+    """Parses an EDF+ dd-MMM-yyyy date, returning None for 'X' or garbage."""
+    try:
+        return datetime.strptime(text, '%d-%b-%Y').date()
+    except ValueError:
+        return None
+
+def parse_patient_field(text):
+    """Splits the patient identification field into its EDF+ parts."""
+    parts = text.rstrip().split(' ')
+    patient = EDFPatient(code=parts[0] if parts else '')
+    if len(parts) >= 4:
+        patient.sex = parts[1]
+        patient.birthdate = _parse_edf_date(parts[2])
+        patient.name = parts[3]
+        patient.additional = parts[4:]
+    return patient
+
+def parse_recording_field(text):
+    """Splits the recording identification field into its EDF+ parts."""
+    parts = text.rstrip().split(' ')
+    recording = EDFRecording()
+    if len(parts) >= 5 and parts[0] == 'Startdate':
+        recording.startdate = _parse_edf_date(parts[1])
+        recording.admin_code, recording.technician, recording.equipment = parts[2:5]
+        recording.additional = parts[5:]
+    return recording
+
+def _parse_start_datetime(start_date, start_time, recording):
+    """Combines the header start date/time, preferring the 4-digit EDF+ year."""
+    day_start = recording.startdate
+    if day_start is None:
+        try:
+            day, month, year = (int(x) for x in start_date.split('.'))
+            year = year + 2000 if year < 85 else year + 1900
+            day_start = date(year, month, day)
+        except ValueError:
+            return None
+    try:
+        hour, minute, second = (int(x) for x in start_time.split('.'))
+    except ValueError:
+        hour, minute, second = 0, 0, 0
+    try:
+        return datetime(day_start.year, day_start.month, day_start.day, hour, minute, second, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def parse_edf_header(data, file_path='', file_size=None):
+    """Parses header bytes (fixed part followed by the signal part) into an EDFHeader."""
+    if len(data) < HEADER_SIZE:
+        raise EDFHeaderError(f"Header is truncated: {len(data)} bytes")
+
+    fixed = {name: data[offset:offset + length] for name, offset, length in FIXED_FIELDS}
+    n_signals = _number(fixed['n_signals'], 'number of signals', int)
+    header_bytes = _number(fixed['header_bytes'], 'header size', int)
+    if n_signals < 0 or header_bytes != HEADER_SIZE + n_signals * SIGNAL_HEADER_SIZE:
+        raise EDFHeaderError(f"Header size {header_bytes} does not match {n_signals} signals")
+    if len(data) < header_bytes:
+        raise EDFHeaderError(f"Signal header is truncated: {len(data)} of {header_bytes} bytes")
+
+    record_duration = _number(fixed['record_duration'], 'record duration')
+    if record_duration <= 0:
+        record_duration = 1.0
+
+    columns = {}
+    position = HEADER_SIZE
+    for name, length in SIGNAL_FIELDS:
+        columns[name] = [data[position + i * length:position + (i + 1) * length] for i in range(n_signals)]
+        position += length * n_signals
+
+    channels = []
+    for i in range(n_signals):
+        samples_per_record = _number(columns['samples_per_record'][i], 'samples per record', int)
+        channels.append(EDFChannel(
+            label=columns['label'][i].strip().decode('latin-1'),
+            transducer=_text(columns['transducer'][i]).strip(),
+            physical_dimension=columns['physical_dimension'][i].strip().decode('latin-1'),
+            physical_min=_number(columns['physical_min'][i], 'physical minimum'),
+            physical_max=_number(columns['physical_max'][i], 'physical maximum'),
+            digital_min=_number(columns['digital_min'][i], 'digital minimum', int),
+            digital_max=_number(columns['digital_max'][i], 'digital maximum', int),
+            prefiltering=_text(columns['prefiltering'][i]).strip(),
+            samples_per_record=samples_per_record,
+            sfreq=samples_per_record / record_duration,
+        ))
+
+    patient_id = fixed['patient_id'].decode('latin-1')
+    recording_id = fixed['recording_id'].decode('latin-1')
+    recording = parse_recording_field(recording_id)
+    return EDFHeader(
+        file_path=file_path,
+        file_size=len(data) if file_size is None else file_size,
+        version=_text(fixed['version']).strip(),
+        patient_id=patient_id.rstrip(),
+        recording_id=recording_id.rstrip(),
+        patient=parse_patient_field(patient_id),
+        recording=recording,
+        start_datetime=_parse_start_datetime(_text(fixed['start_date']), _text(fixed['start_time']), recording),
+        header_bytes=header_bytes,
+        reserved=_text(fixed['reserved']).strip(),
+        n_records=_number(fixed['n_records'], 'number of records', int),
+        record_duration=record_duration,
+        channels=channels,
+    )
+
+def read_header_bytes(file_path):
+    """Reads only the raw header bytes of an EDF file."""
+    with open(file_path, 'rb') as f:
+        data = f.read(HEADER_SIZE)
+        if len(data) < HEADER_SIZE:
+            raise EDFHeaderError(f"Header is truncated: {len(data)} bytes")
+        n_signals = _number(data[252:256], 'number of signals', int)
+        if n_signals > 0:
+            data += f.read(n_signals * SIGNAL_HEADER_SIZE)
+    increment("bytes read: headers", len(data))
+    return data
+
+def read_edf_header(file_path, validate=False):
+    """Reads the EDF header of a file without touching the data records."""
+    header = parse_edf_header(read_header_bytes(file_path), file_path, os.path.getsize(file_path))
+    if validate:
+        for mismatch in validate_against_mne(header):
+            logging.warning(f"Header of {file_path} differs from MNE: {mismatch}")
+    return header
+
+def validate_against_mne(header):
+    """Compares a parsed header with what MNE reads from the same file; returns the mismatches."""
+    from mne.io import read_raw_edf
+
+    with stage("mne: read_raw_edf"):
+        raw = read_raw_edf(header.file_path, preload=False, verbose=False)
+    info = raw.info
+    mne_subject_info = dict(info.get('subject_info') or {})
+    checks = [
+        ('meas_date', header.meas_date, info.get('meas_date')),
+        ('sfreq', header.sfreq, info['sfreq']),
+        ('ch_names', header.ch_names, list(info['ch_names'])),
+        ('n_times', header.n_times, raw.n_times),
+        ('duration', header.duration, raw.times[-1]),
+        ('subject_info', header.subject_info, mne_subject_info),
+    ]
+    mismatches = []
+    for name, ours, theirs in checks:
+        if isinstance(ours, float) and isinstance(theirs, float):
+            equal = abs(ours - theirs) <= 1e-9 * max(1.0, abs(theirs))
+        else:
+            equal = ours == theirs
+        if not equal:
+            mismatches.append(f"{name}: {ours!r} != {theirs!r}")
+    return mismatches
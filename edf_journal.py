@@ -0,0 +1,197 @@
+# edf_journal.py
+import os
+import json
+from datetime import datetime
+from edf_executor import check_cancelled
+
+RENAME_JOURNAL_DIR_NAME = "rename_journal"
+
+def plan_renames(mapping, names):
+    """
+    Orders the renames of mapping {old name: new name} so that no file is overwritten.
+
+    names are all names currently in the directory. A rename whose target is still
+    taken waits until the file holding it has moved; renames that form a cycle (a -> b,
+    b -> a) are broken up with a temporary name. Everything is worked out in memory.
+    Returns a list of (old, new) steps. Raises ValueError if two files share a target or
+    a target is held by a file that does not move. Names are compared with
+    os.path.normcase, as the filesystem does.
+    """
+    key = os.path.normcase
+    pending = {old: new for old, new in mapping.items() if old != new}
+    if len({key(new) for new in pending.values()}) != len(pending):
+        raise ValueError("Several files have the same target name")
+    moving = {key(old) for old in pending}
+    occupied = {key(name) for name in names} | moving
+    blocked = [new for new in pending.values() if key(new) in occupied and key(new) not in moving]
+    if blocked:
+        raise ValueError(f"Target names are taken by files that are not renamed: {blocked[:5]}")
+
+    waiting = {key(new): old for old, new in pending.items()}  # Target name -> file waiting for it
+    steps = []
+
+    def move_chain(old):
+        # Renaming old frees its name, so the file waiting for that name can follow, and so on
+        while old is not None:
+            new = pending.pop(old)
+            steps.append((old, new))
+            occupied.discard(key(old))
+            occupied.add(key(new))
+            old = waiting.pop(key(old), None)
+
+    for old in [old for old, new in pending.items() if key(new) not in occupied]:
+        del waiting[key(pending[old])]
+        move_chain(old)
+
+    # What is left are cycles: park one file under a temporary name, move the rest of
+    # its cycle, then move the parked file to its target
+    counter = 0
+    while pending:
+        old = next(iter(pending))
+        temporary = f"{old}.renaming"
+        while key(temporary) in occupied:
+            counter += 1
+            temporary = f"{old}.renaming{counter}"
+        new = pending.pop(old)
+        del waiting[key(new)]
+        steps.append((old, temporary))
+        occupied.discard(key(old))
+        occupied.add(key(temporary))
+        move_chain(waiting.pop(key(old)))
+        steps.append((temporary, new))
+        occupied.discard(key(temporary))
+        occupied.add(key(new))
+    return steps
+
+class RenameJournal:
+    """
+    Write-ahead journal of a batch of renames in one directory.
+
+    The complete plan is written and synced before the first rename, and every finished
+    step is appended right after it happens and synced before the next rename. An
+    interrupted batch can therefore be resumed or rolled back later; the one step whose
+    completion may not have been logged is recognized by its source being gone and its
+    target being present.
+    """
+
+    def __init__(self, path, directory, steps, done=(), finished=False):
+        self.path = path
+        self.directory = directory
+        self.steps = steps
+        self.done = set(done)
+        self.finished = finished
+
+    @classmethod
+    def create(cls, journal_dir, directory, steps, prefix="rename"):
+        """Writes the plan to a new journal file in journal_dir."""
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl")
+        with open(path, 'x', encoding='utf-8') as journal:
+            journal.write(json.dumps({'directory': os.path.abspath(directory), 'steps': steps}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        return cls(path, os.path.abspath(directory), [tuple(step) for step in steps])
+
+    @classmethod
+    def load(cls, path):
+        """Reads a journal file back."""
+        with open(path, encoding='utf-8') as journal:
+            plan = json.loads(journal.readline())
+            done, finished = set(), False
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Line cut off by a crash
+                if 'done' in entry:
+                    done.add(entry['done'])
+                elif 'undone' in entry:
+                    done.discard(entry['undone'])
+                elif 'finished' in entry:
+                    finished = True
+        return cls(path, plan['directory'], [tuple(step) for step in plan['steps']], done, finished)
+
+    def _log(self, journal, entry):
+        journal.write(json.dumps(entry) + '\n')
+        journal.flush()
+
+    def _sync(self, journal):
+        """Makes the logged steps durable; done before every rename, so at most one step is ever unlogged."""
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    def _rename(self, old, new):
+        """Renames old to new; returns False if that already happened before a crash."""
+        try:
+            os.rename(os.path.join(self.directory, old), os.path.join(self.directory, new))
+            return True
+        except FileNotFoundError:
+            if os.path.exists(os.path.join(self.directory, new)):
+                return False
+            raise
+
+    def apply(self, on_rename=None):
+        """
+        Performs all steps not done yet, in order; returns the number of steps performed.
+
+        on_rename(old_path, new_path) is called after each step. Cancelling leaves the
+        journal unfinished, so the batch can be resumed or rolled back.
+        """
+        performed = 0
+        with open(self.path, 'a', encoding='utf-8') as journal:
+            for index, (old, new) in enumerate(self.steps):
+                if index in self.done:
+                    continue
+                check_cancelled()
+                self._sync(journal)
+                self._rename(old, new)
+                self.done.add(index)
+                self._log(journal, {'done': index})
+                if on_rename:
+                    on_rename(os.path.join(self.directory, old), os.path.join(self.directory, new))
+                performed += 1
+            self._log(journal, {'finished': True})
+            self._sync(journal)
+        self.finished = True
+        return performed
+
+    def rollback(self, on_rename=None):
+        """Undoes the performed steps in reverse order; returns the number of steps undone."""
+        done = set(self.done)
+        first_pending = next((i for i in range(len(self.steps)) if i not in done), None)
+        if first_pending is not None:
+            # The step after the last logged one may have happened without being logged
+            old, new = self.steps[first_pending]
+            if not os.path.exists(os.path.join(self.directory, old)) and \
+                    os.path.exists(os.path.join(self.directory, new)):
+                done.add(first_pending)
+        undone = 0
+        with open(self.path, 'a', encoding='utf-8') as journal:
+            for index in sorted(done, reverse=True):
+                old, new = self.steps[index]
+                self._sync(journal)
+                self._rename(new, old)
+                self.done.discard(index)
+                self._log(journal, {'undone': index})
+                if on_rename:
+                    on_rename(os.path.join(self.directory, new), os.path.join(self.directory, old))
+                undone += 1
+            self._log(journal, {'finished': True})
+            self._sync(journal)
+        self.finished = True
+        return undone
+
+def unfinished_journals(journal_dir, prefix="rename"):
+    """Returns the journals in journal_dir whose batch was interrupted, oldest first."""
+    if not os.path.isdir(journal_dir):
+        return []
+    names = sorted(f for f in os.listdir(journal_dir) if f.startswith(prefix + '-') and f.endswith('.jsonl'))
+    journals = [RenameJournal.load(os.path.join(journal_dir, name)) for name in names]
+    return [journal for journal in journals if not journal.finished]
+
+def latest_journal(journal_dir, prefix="rename"):
+    """Returns the most recent journal in journal_dir, or None."""
+    if not os.path.isdir(journal_dir):
+        return None
+    names = sorted(f for f in os.listdir(journal_dir) if f.startswith(prefix + '-') and f.endswith('.jsonl'))
+    return RenameJournal.load(os.path.join(journal_dir, names[-1])) if names else None
@@ -0,0 +1,199 @@
+# edf_metrics.py
+import os
+import sys
+import json
+import time
+import logging
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+METRICS_DIR_NAME = "metrics"
+METRICS_ENV = "EDF_METRICS"  # "1", or a comma separated list of "profile" and "memory"
+MEMORY_TOP = 25  # Allocation sites listed in the tracemalloc summary
+
+_collector = ContextVar("edf_metrics_collector", default=None)
+_DISABLED = nullcontext()
+
+class Metrics:
+    """Per-stage timers and named counters of one operation."""
+
+    def __init__(self):
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.counters = Counter()
+
+    def add_stage(self, name, seconds, calls=1):
+        stage = self.stages[name]
+        stage["calls"] += calls
+        stage["seconds"] += seconds
+
+    def merge(self, snapshot):
+        """Adds the stages and counters of a to_dict() snapshot, e.g. one taken in a worker."""
+        for name, stage in snapshot["stages"].items():
+            self.add_stage(name, stage["seconds"], stage["calls"])
+        self.counters.update(snapshot["counters"])
+
+    def to_dict(self):
+        return {"stages": {name: dict(stage) for name, stage in self.stages.items()}, "counters": dict(self.counters)}
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics, self.name = metrics, name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_stage(self.name, time.perf_counter() - self.started)
+
+def current_metrics():
+    """The Metrics being collected in this context, or None when instrumentation is off."""
+    return _collector.get()
+
+def stage(name):
+    """Context manager that times a stage; a shared no-op when nothing is being collected."""
+    metrics = _collector.get()
+    return _DISABLED if metrics is None else _Stage(metrics, name)
+
+def increment(name, value=1):
+    """Adds value to a counter of the running operation, if one is being collected."""
+    metrics = _collector.get()
+    if metrics is not None:
+        metrics.counters[name] += value
+
+@contextmanager
+def collecting(metrics):
+    """Sends stage() and increment() calls made in this context to metrics."""
+    token = _collector.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _collector.reset(token)
+
+def metrics_options(value):
+    """Parses an EDF_METRICS value into collect_metrics options; None when it is unset or off."""
+    words = {word.strip().lower() for word in (value or "").split(",")} - {""}
+    if not words or words & {"0", "off", "no", "false"}:
+        return None
+    return {"profile": "profile" in words, "trace_memory": "memory" in words}
+
+ENV_OPTIONS = metrics_options(os.environ.get(METRICS_ENV))
+
+def io_counters():
+    """(bytes read through read calls, bytes fetched from storage) of this process and its reaped children."""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['read_bytes'])
+    except (OSError, KeyError, ValueError):
+        return None, None  # Not Linux
+
+def peak_rss():
+    """Peak resident memory in MB of this process or any of its reaped worker processes."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+def _memory_summary(snapshot):
+    return [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_kb": stat.size / 1024,
+             "count": stat.count} for stat in snapshot.statistics('lineno')[:MEMORY_TOP]]
+
+@contextmanager
+def collect_metrics(operation, output_dir, profile=False, trace_memory=False):
+    """
+    Collects the metrics of one operation and writes them to output_dir/metrics.
+
+    The JSON file holds the total time, bytes read (from /proc/self/io where available),
+    peak RSS and the stages and counters recorded with stage() and increment(), including
+    those sent back from pool workers. Stage times are inclusive, and work done on the
+    pool is summed over the workers. With profile a cProfile dump (.prof) of the calling
+    thread is written next to it; with trace_memory the top allocation sites are added.
+    """
+    metrics = Metrics()
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    rchar, read_bytes = io_counters()
+    started_at = datetime.now()
+    started = time.perf_counter()
+    error = None
+    try:
+        with collecting(metrics):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield metrics
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        report = {
+            "operation": operation,
+            "started": started_at.isoformat(timespec='seconds'),
+            "seconds": time.perf_counter() - started,
+            "status": "ok" if error is None else type(error).__name__,
+            "peak_rss_mb": peak_rss(),
+        }
+        rchar_after, read_bytes_after = io_counters()
+        if rchar is not None:
+            report["bytes_read"] = rchar_after - rchar
+            report["storage_bytes_read"] = read_bytes_after - read_bytes
+        report.update(metrics.to_dict())
+
+        metrics_dir = os.path.join(output_dir, METRICS_DIR_NAME)
+        os.makedirs(metrics_dir, exist_ok=True)
+        base_path = os.path.join(metrics_dir, f"{operation}-{started_at:%Y%m%d_%H%M%S_%f}")
+        if profiler is not None:
+            profiler.dump_stats(base_path + ".prof")
+            report["profile"] = base_path + ".prof"
+        if trace_memory:
+            report["memory_top"] = _memory_summary(tracemalloc.take_snapshot())
+            report["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        with open(base_path + ".json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        logging.info(f"Metrics of {operation} saved to {base_path}.json")
+
+def _target(args):
+    """Metrics options and output folder of an operation call, or (None, None) when it is not collected."""
+    first = args[0] if args else None
+    if hasattr(first, "metrics"):  # EDFProcessor and other objects with their own settings
+        return first.metrics, first.output_dir
+    if isinstance(first, str) and ENV_OPTIONS is not None:  # Script functions take the directory first
+        return ENV_OPTIONS, os.path.join(first, "output")
+    return None, None
+
+def instrumented(operation):
+    """
+    Decorator for operations. Inside a collected operation the call becomes a stage of it;
+    otherwise it is collected on its own when its object has metrics enabled (EDFProcessor)
+    or, for functions taking the directory first, when EDF_METRICS is set.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _collector.get()
+            if metrics is not None:
+                with _Stage(metrics, operation):
+                    return func(*args, **kwargs)
+            options, output_dir = _target(args)
+            if not options:
+                return func(*args, **kwargs)
+            with collect_metrics(operation, output_dir, **options):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,307 @@
+# edf_pipeline.py
+import os
+import json
+import argparse
+from datetime import timedelta
+from functools import partial
+from edf_catalog import EDFCatalog
+from edf_columnar import export_table
+from edf_cur import LEVELS, REPORT_NAME, delete_corrupted, verify_edf, write_report
+from edf_dubl_seek import DEFAULT_HASH_ALGORITHM, READ_SIZE, calculate_file_hash, delete_duplicates, new_hash
+from edf_executor import BACKENDS, DEFAULT_BACKEND, DEFAULT_CHUNKSIZE, run_tasks
+from edf_header import EDFHeaderError, parse_edf_header, read_header_bytes
+from edf_journal import RENAME_JOURNAL_DIR_NAME, RenameJournal, plan_renames
+from edf_metrics import collect_metrics, increment, instrumented, stage
+from edf_reader import read_edf_metadata
+from edf_rename import rename_metadata, resume_renames, target_names
+from edf_time import cluster_start_times
+from eeg_statistics import METADATA_STATS_NAME, generate_statistics, visualize_statistics
+
+STAGES = ("verify", "dedupe", "rename", "similar", "stats", "plots")  # In the order they run
+RECORDS_NAME = "pipeline_records.jsonl"
+DUPLICATES_NAME = "duplicates.json"
+SIMILAR_NAME = "similar_start_times.json"
+
+def _header_error_report(file_path, level, message):
+    return {"file": file_path, "level": level, "ok": False,
+            "problems": [{"check": "header", "severity": "error", "message": f"Header cannot be parsed: {message}"}]}
+
+def _verify_and_hash(file_path, header, header_bytes, hash_algorithm):
+    """Full verification and the full-file digest from one pass over the file."""
+    hash_func = new_hash(hash_algorithm)
+    hash_func.update(header_bytes)
+    consumed = 0
+
+    def consume(chunk):
+        nonlocal consumed
+        hash_func.update(chunk)
+        consumed += len(chunk)
+
+    report = verify_edf(file_path, "full", header, consume=consume)
+    with open(file_path, "rb") as f:
+        # The scan stops after the last complete record; the rest of the file follows
+        f.seek(header.header_bytes + consumed)
+        while chunk := f.read(READ_SIZE):
+            hash_func.update(chunk)
+    return report, hash_func.hexdigest()
+
+def read_file_record(item, level=None, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Reads what the pipeline needs from one file: header, verification report and digest.
+
+    item is (path, cached header bytes or None, whether the full digest is needed). The
+    header is read only if it is not cached, and with full verification the digest is
+    computed in the same pass over the data. Returns (stat_result, header_bytes, header,
+    error, report, digest).
+    """
+    file_path, header_bytes, need_digest = item
+    stat_result = os.stat(file_path)
+    header = error = report = digest = None
+    try:
+        header_bytes = header_bytes or read_header_bytes(file_path)
+        header = parse_edf_header(header_bytes, file_path, stat_result.st_size)
+    except EDFHeaderError as e:
+        header_bytes, error = None, str(e)
+
+    if level and header is None:
+        report = _header_error_report(file_path, level, error)
+    elif level == "full" and need_digest:
+        report, digest = _verify_and_hash(file_path, header, header_bytes, hash_algorithm)
+    elif level:
+        report = verify_edf(file_path, level, header)
+    if need_digest and digest is None:
+        digest = calculate_file_hash(file_path, hash_algorithm)
+    return stat_result, header_bytes, header, error, report, digest
+
+def _walk(directory, output_dir):
+    """{path: stat_result} of every EDF file under directory, skipping the output folder."""
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != output_dir]
+        for name in names:
+            if name.lower().endswith('.edf'):
+                path = os.path.join(root, name)
+                files[path] = os.stat(path)
+    return files
+
+def _stream_record(stream, record):
+    """Writes the per-file result line of a record."""
+    header = record["header"]
+    stream.write(json.dumps({
+        "file": record["file"],
+        "size": record["size"],
+        "error": record["error"],
+        "ok": record["report"]["ok"] if record["report"] else None,
+        "problems": [problem["message"] for problem in record["report"]["problems"]] if record["report"] else [],
+        "digest": record["digest"],
+        "start": header.meas_date.isoformat() if header and header.meas_date else None,
+        "duration": header.duration if header else None,
+    }, ensure_ascii=False) + "\n")
+
+def read_records(directory, catalog, level=None, dedupe=False, hash_algorithm=DEFAULT_HASH_ALGORITHM,
+                 records_path=None, **executor_options):
+    """
+    Walks the directory once and returns {path: record} for every EDF file.
+
+    Headers and digests come from the catalog when the file is unchanged; files that
+    still need a header, a full scan or a digest are read once on the worker pool. Only
+    files sharing their size with another file are hashed. Each record is streamed to
+    records_path as soon as it is complete.
+    """
+    output_dir = os.path.join(directory, "output")
+    with stage("walk"):
+        files = _walk(directory, output_dir)
+    sizes = {}
+    for stat_result in files.values():
+        sizes[stat_result.st_size] = sizes.get(stat_result.st_size, 0) + 1
+
+    records, items, unread = {}, [], set()
+    with stage("catalog lookup"):
+        for path, stat_result in files.items():
+            row = catalog.lookup(path, stat_result)
+            increment("header cache: hits" if row is not None else "header cache: misses")
+            need_digest = dedupe and sizes[stat_result.st_size] > 1
+            digest = catalog.get_digest(path, hash_algorithm, stat_result) if need_digest else None
+            if need_digest:
+                increment("digest cache: hits" if digest is not None else "digest cache: misses")
+            header_bytes = row['header'] if row is not None and row['error'] is None else None
+            record = {"file": path, "size": stat_result.st_size, "header": None, "error": None, "report": None,
+                      "digest": digest}
+            records[path] = record
+            if row is None:
+                unread.add(path)
+            elif row['error'] is not None:
+                record["error"] = row['error']
+                record["report"] = _header_error_report(path, level, row['error']) if level else None
+            else:
+                record["header"] = parse_edf_header(header_bytes, path, row['size'])
+                if level and level != "full":
+                    record["report"] = verify_edf(path, level, record["header"])
+            if row is None or (level == "full" and header_bytes) or (need_digest and digest is None):
+                items.append((path, header_bytes, need_digest and digest is None))
+
+    with open(records_path or os.devnull, "w", encoding="utf-8") as stream:
+        pending = {item[0] for item in items}
+        for path, record in records.items():
+            if path not in pending:
+                _stream_record(stream, record)
+
+        task = partial(read_file_record, level=level, hash_algorithm=hash_algorithm)
+        for (path, _, _), result in run_tasks(task, items, ordered=False, desc="Reading files", **executor_options):
+            stat_result, header_bytes, header, error, report, digest = result
+            record = records[path]
+            if path in unread:
+                catalog.store_header(path, stat_result, header_bytes=header_bytes, header=header, error=error)
+                record.update(header=header, error=error)
+            if report is not None:
+                record["report"] = report
+            if digest is not None:
+                catalog.store_digest(path, hash_algorithm, stat_result, digest)
+                record["digest"] = digest
+            _stream_record(stream, record)
+    catalog.commit()
+    # Files that could not be read at all (logged by run_tasks) are left out
+    return {path: record for path, record in records.items()
+            if record["header"] is not None or record["error"] is not None}
+
+def _drop(records, paths, catalog):
+    for path in paths:
+        records.pop(path, None)
+        catalog.forget(path)
+
+def _rename(directory, records, catalog):
+    """Renames the EDF files directly in the directory; returns the number renamed and re-keys the records."""
+    names = os.listdir(directory)
+    metadata = {os.path.basename(path): rename_metadata(record["header"]) for path, record in records.items()
+                if record["header"] is not None and os.path.dirname(path) == directory}
+    mapping = target_names(names, metadata)
+    steps = plan_renames(mapping, names)
+    if steps:
+        journal = RenameJournal.create(os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME), directory, steps)
+        journal.apply(catalog.move)
+        catalog.commit()
+    for old_name, new_name in mapping.items():
+        if old_name != new_name:
+            record = records.pop(os.path.join(directory, old_name))
+            record["file"] = os.path.join(directory, new_name)
+            records[record["file"]] = record
+    return sum(old != new for old, new in mapping.items())
+
+@instrumented("run_pipeline")
+def run_pipeline(directory, stages=STAGES, level="size", hash_algorithm=DEFAULT_HASH_ALGORITHM,
+                 delete_corrupted_files=False, delete_duplicate_files=False, time_delta=timedelta(minutes=10),
+                 **executor_options):
+    """
+    Runs the selected stages (see STAGES) over the directory with a single read of every file.
+
+    The directory is walked once and each file's header, verification and digest are
+    read once (see read_records); the stages then work on these shared records in the
+    order verify -> dedupe -> rename -> similar -> stats -> plots. Files deleted as
+    corrupted or duplicate are left out of the later stages. Results are written to the
+    output folder as they are produced. Returns a summary of every stage.
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {STAGES}")
+    directory = os.path.normpath(directory)
+    output_dir = os.path.join(directory, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    catalog = EDFCatalog.for_directory(directory)
+    summary = {}
+    try:
+        if "rename" in stages:
+            summary["resumed renames"] = resume_renames(directory, catalog.move)
+
+        level = level if "verify" in stages else None
+        records = read_records(directory, catalog, level, "dedupe" in stages, hash_algorithm,
+                               os.path.join(output_dir, RECORDS_NAME), **executor_options)
+        summary["files"] = len(records)
+
+        if "verify" in stages:
+            with stage("verify"):
+                reports = [records[path]["report"] for path in sorted(records)]
+                corrupted = [report for report in reports if not report["ok"]]
+                summary["corruption report"] = write_report(reports, os.path.join(output_dir, REPORT_NAME), level)
+                summary["corrupted"] = len(corrupted)
+                if delete_corrupted_files:
+                    _drop(records, delete_corrupted(corrupted), catalog)
+
+        if "dedupe" in stages:
+            with stage("dedupe"):
+                groups = {}
+                for path in sorted(records):
+                    if records[path]["digest"]:
+                        groups.setdefault(records[path]["digest"], []).append(path)
+                duplicates = {digest: paths for digest, paths in groups.items() if len(paths) > 1}
+                with open(os.path.join(output_dir, DUPLICATES_NAME), "w", encoding="utf-8") as f:
+                    json.dump(duplicates, f, indent=2, ensure_ascii=False)
+                summary["duplicate groups"] = len(duplicates)
+                if delete_duplicate_files:
+                    _drop(records, delete_duplicates(duplicates), catalog)
+
+        if "rename" in stages:
+            with stage("rename"):
+                summary["renamed"] = _rename(directory, records, catalog)
+
+        intact = {path: record["header"] for path, record in sorted(records.items()) if record["header"] is not None}
+        if "similar" in stages:
+            with stage("similar"):
+                groups = cluster_start_times([(header.meas_date, path) for path, header in intact.items()
+                                              if header.meas_date], time_delta)
+                with open(os.path.join(output_dir, SIMILAR_NAME), "w", encoding="utf-8") as f:
+                    json.dump([[{"start": start.isoformat(), "file": path} for start, path in group]
+                               for group in groups], f, indent=2, ensure_ascii=False)
+                summary["similar start groups"] = len(groups)
+
+        if "stats" in stages or "plots" in stages:
+            with stage("statistics"):
+                metadata_list = [read_edf_metadata(path, header=header) for path, header in intact.items()]
+                df, _ = generate_statistics([metadata for metadata in metadata_list if metadata])
+            if "stats" in stages:
+                summary["statistics"] = export_table(df, os.path.join(output_dir, METADATA_STATS_NAME))
+            if "plots" in stages:
+                summary["plots"] = visualize_statistics(df, output_dir)
+    finally:
+        catalog.close()
+    return summary
+
+def main(argv=None):
+    """Command line entry point: edf_pipeline.py DIRECTORY [--stages verify,dedupe,...]."""
+    parser = argparse.ArgumentParser(description="Runs the selected EDF operations over a folder in a single pass.")
+    parser.add_argument("directory", help="folder with EDF files")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma separated stages to run, from {','.join(STAGES)} (default: all)")
+    parser.add_argument("--level", choices=LEVELS, default="size", help="verification level (default: size)")
+    parser.add_argument("--delete-corrupted", action="store_true", help="delete files that fail verification")
+    parser.add_argument("--delete-duplicates", action="store_true",
+                        help="delete all but one file of each duplicate group")
+    parser.add_argument("--time-delta", type=float, default=10,
+                        help="minutes between similar start times (default: 10)")
+    parser.add_argument("--hash", default=DEFAULT_HASH_ALGORITHM, help="hash algorithm for duplicates")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=None, help="worker count (default: per backend)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--metrics", action="store_true", help="write output/metrics/run_pipeline-<time>.json")
+    parser.add_argument("--profile", action="store_true", help="also write a cProfile dump with the metrics")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    options = dict(stages=stages, level=args.level, hash_algorithm=args.hash,
+                   delete_corrupted_files=args.delete_corrupted, delete_duplicate_files=args.delete_duplicates,
+                   time_delta=timedelta(minutes=args.time_delta), backend=args.backend, max_workers=args.workers,
+                   chunksize=args.chunksize)
+    try:
+        if args.metrics or args.profile:
+            with collect_metrics("run_pipeline", os.path.join(args.directory, "output"), profile=args.profile):
+                summary = run_pipeline(args.directory, **options)
+        else:
+            summary = run_pipeline(args.directory, **options)
+    except ValueError as e:
+        parser.error(str(e))
+    for name, value in summary.items():
+        print(f"{name.capitalize()}: {value}")
+
+if __name__ == "__main__":
+    main()
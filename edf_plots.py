@@ -0,0 +1,143 @@
+# edf_plots.py
+import os
+import json
+import hashlib
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from edf_metrics import increment, stage
+
+# Figures are only saved to files, never shown
+matplotlib.use("Agg")
+
+PLOT_CACHE_NAME = "plot_cache.json"
+HISTOGRAM_BINS = 20
+KDE_GRID = 512  # Grid points of the binned KDE
+FIGURE_SIZE = (8, 6)
+
+def binned_kde(values, grid_size=KDE_GRID):
+    """
+    Gaussian KDE on a regular grid, computed from a histogram of the data.
+
+    The values are binned onto grid_size points and the counts are convolved with the
+    Gaussian kernel (Scott's bandwidth, as seaborn uses), which costs O(n + grid²)
+    instead of O(n · grid). The curve covers the data range. Returns (x, density), or
+    None when the data has no spread.
+    """
+    n = len(values)
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if n < 2 or std == 0:
+        return None
+    bandwidth = std * n ** -0.2
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=grid_size, range=(low, high))
+    centers = (edges[:-1] + edges[1:]) / 2
+    step = edges[1] - edges[0]
+    offsets = np.arange(-grid_size + 1, grid_size) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = np.convolve(counts, kernel)[grid_size - 1:2 * grid_size - 1] / n
+    inside = (centers >= values.min()) & (centers <= values.max())
+    return centers[inside], density[inside]
+
+def count_plot(df, column, title, file_name):
+    """Figure spec of a bar chart of the value counts of a column."""
+    counts = df[column].value_counts(sort=False)
+    counts = counts[counts > 0]
+    return {'kind': 'count', 'file_name': file_name, 'title': title, 'xlabel': column,
+            'labels': [str(label) for label in counts.index], 'counts': counts.to_numpy(dtype=np.int64)}
+
+def histogram_plot(df, column, title, file_name, bins=HISTOGRAM_BINS):
+    """Figure spec of a histogram with a KDE curve, or None when the column has no numbers."""
+    values = df[column].to_numpy(dtype=float, na_value=np.nan)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    spec = {'kind': 'histogram', 'file_name': file_name, 'title': title, 'xlabel': column,
+            'counts': counts, 'edges': edges}
+    kde = binned_kde(values)
+    if kde is not None:
+        x, density = kde
+        spec['kde_x'], spec['kde_y'] = x, density * len(values) * (edges[1] - edges[0])  # On the count scale
+    return spec
+
+def statistics_plots(df):
+    """Figure specs of the sex, age and duration distributions present in a metadata table."""
+    specs = []
+    if 'sex' in df.columns:
+        specs.append(count_plot(df, 'sex', 'Sex Distribution', 'sex_distribution.png'))
+    if 'age' in df.columns:
+        specs.append(histogram_plot(df, 'age', 'Age Distribution', 'age_distribution.png'))
+    if 'duration_minutes' in df.columns:
+        specs.append(histogram_plot(df, 'duration_minutes', 'Recording Duration (minutes)',
+                                    'duration_distribution.png'))
+    return [spec for spec in specs if spec is not None]
+
+def spec_digest(spec):
+    """Hash of everything a figure is drawn from."""
+    hash_func = hashlib.blake2b(digest_size=16)
+    for key in sorted(spec):
+        value = spec[key]
+        hash_func.update(key.encode())
+        hash_func.update(np.ascontiguousarray(value).tobytes() if isinstance(value, np.ndarray) else repr(value).encode())
+    return hash_func.hexdigest()
+
+def render_plot(spec, output_dir):
+    """Draws one figure spec to output_dir/<file_name>; returns the path."""
+    figure = Figure(figsize=FIGURE_SIZE)
+    axes = figure.add_subplot()
+    if spec['kind'] == 'count':
+        axes.bar(spec['labels'], spec['counts'], color='C0')
+        axes.set_ylabel('count')
+    else:
+        edges = spec['edges']
+        axes.bar(edges[:-1], spec['counts'], width=np.diff(edges), align='edge', color='C0', alpha=0.75,
+                 edgecolor='white')
+        if 'kde_x' in spec:
+            axes.plot(spec['kde_x'], spec['kde_y'], color='C0')
+        axes.set_ylabel('Count')
+    axes.set_xlabel(spec['xlabel'])
+    axes.set_title(spec['title'])
+    path = os.path.join(output_dir, spec['file_name'])
+    figure.savefig(path)
+    return path
+
+def _load_cache(output_dir):
+    try:
+        with open(os.path.join(output_dir, PLOT_CACHE_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(output_dir, cache):
+    path = os.path.join(output_dir, PLOT_CACHE_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def render_plots(specs, output_dir):
+    """
+    Renders figure specs one after another, skipping figures whose data has not changed.
+
+    The digest of each spec is kept in PLOT_CACHE_NAME; a figure is drawn again only if
+    its digest differs or its image is missing. There are only a few figures, so they are
+    drawn in this process rather than paying for a worker pool. Returns the paths that were rendered.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = _load_cache(output_dir)
+    digests = {spec['file_name']: spec_digest(spec) for spec in specs}
+    stale = [spec for spec in specs if cache.get(spec['file_name']) != digests[spec['file_name']]
+             or not os.path.exists(os.path.join(output_dir, spec['file_name']))]
+    increment("plot cache: hits", len(specs) - len(stale))
+    increment("plot cache: misses", len(stale))
+    rendered = []
+    with stage("plotting"):
+        for spec in stale:
+            rendered.append(render_plot(spec, output_dir))
+            cache[spec['file_name']] = digests[spec['file_name']]
+    _save_cache(output_dir, cache)
+    return rendered
+
+def visualize_statistics(df, output_dir):
+    """Saves the sex, age and duration distribution plots of a metadata table; returns the rendered paths."""
+    return render_plots(statistics_plots(df), output_dir)
@@ -0,0 +1,133 @@
+# edf_quality.py
+import os
+import json
+import numpy as np
+from edf_dubl_seek import DEFAULT_HASH_ALGORITHM, new_hash, signal_signature
+from edf_header import read_edf_header
+from edf_signal import EDFSignals
+
+CHANNEL_STATS_NAME = "edf_channel_stats.csv"
+CHUNK_BYTES = 16 * 1024 * 1024  # Data records decoded per step, whatever the recording length
+FLATLINE_SECONDS = 1.0  # Constant runs at least this long count as flatline
+DIGITAL_VALUES = 1 << 16  # int16 samples index a 65536-bin histogram
+QUALITY_COLUMNS = ["file_name", "channel", "unit", "sfreq", "n_samples", "mean", "std", "rms", "min", "max",
+                   "median", "iqr", "mad", "flatline_pct", "clipped_pct"]
+
+class ChannelAccumulator:
+    """
+    Streaming statistics of one channel: an exact histogram of its int16 samples plus
+    the length of the constant run still open at the end of the last chunk.
+    """
+
+    def __init__(self, min_flat_run):
+        self.histogram = np.zeros(DIGITAL_VALUES, dtype=np.int64)
+        self.min_flat_run = max(2, min_flat_run)
+        self.flat_samples = 0
+        self.run_value = None
+        self.run_length = 0
+
+    def update(self, values):
+        """Adds a 1-D chunk of digital samples."""
+        if not len(values):
+            return
+        self.histogram += np.bincount(values.astype(np.int32) + 32768, minlength=DIGITAL_VALUES)
+
+        starts = np.flatnonzero(values[1:] != values[:-1]) + 1
+        lengths = np.diff(np.concatenate(([0], starts, [len(values)])))
+        if values[0] == self.run_value:
+            lengths[0] += self.run_length
+        else:
+            self._close_run(self.run_length)
+        closed = lengths[:-1]
+        self.flat_samples += int(closed[closed >= self.min_flat_run].sum())
+        self.run_value, self.run_length = values[-1], int(lengths[-1])
+
+    def _close_run(self, length):
+        if length >= self.min_flat_run:
+            self.flat_samples += length
+
+    def result(self, channel):
+        """Returns the statistics in physical units, or None for a channel without samples."""
+        self._close_run(self.run_length)
+        self.run_value, self.run_length = None, 0
+        values = np.flatnonzero(self.histogram)
+        counts = self.histogram[values]
+        n = int(counts.sum())
+        if n == 0:
+            return None
+        physical = (values - 32768) * channel.gain + channel.offset
+
+        mean = float(np.dot(counts, physical) / n)
+        std = float(np.sqrt(np.dot(counts, (physical - mean) ** 2) / n))
+        cumulative = np.cumsum(counts)
+        median = _percentile(physical, cumulative, 50)
+        deviations = np.abs(physical - median)
+        order = np.argsort(deviations)
+        clipped = counts[(values - 32768 <= channel.digital_min) | (values - 32768 >= channel.digital_max)].sum()
+        return {
+            "n_samples": n,
+            "mean": mean,
+            "std": std,
+            "rms": float(np.sqrt(std ** 2 + mean ** 2)),
+            "min": float(physical.min()),
+            "max": float(physical.max()),
+            "median": median,
+            "iqr": _percentile(physical, cumulative, 75) - _percentile(physical, cumulative, 25),
+            "mad": _percentile(deviations[order], np.cumsum(counts[order]), 50),
+            "flatline_pct": 100.0 * self.flat_samples / n,
+            "clipped_pct": 100.0 * int(clipped) / n,
+        }
+
+def _percentile(sorted_values, cumulative, q):
+    """Percentile of histogram data, interpolated linearly like numpy.percentile."""
+    rank = q / 100 * (cumulative[-1] - 1)
+    low, high = sorted_values[np.searchsorted(cumulative, [np.floor(rank), np.ceil(rank)], side="right")]
+    return float(low + (high - low) * (rank - np.floor(rank)))
+
+def channel_quality(file_path, header=None, chunk_bytes=CHUNK_BYTES, flatline_seconds=FLATLINE_SECONDS,
+                    hash_func=None):
+    """
+    Computes per-channel quality statistics of an EDF file in one streaming pass.
+
+    Records are read chunk by chunk through the memory map, so memory use does not depend
+    on the recording length; hash_func, if given, is fed the raw records on the way.
+    Returns one dict per data channel (see QUALITY_COLUMNS).
+    """
+    header = header or read_edf_header(file_path)
+    channels = [i for i, ch in enumerate(header.channels) if not ch.is_annotation]
+    accumulators = {i: ChannelAccumulator(int(flatline_seconds * header.channels[i].sfreq)) for i in channels}
+    chunk_records = max(1, chunk_bytes // max(header.record_bytes, 1))
+
+    with EDFSignals(file_path, header) as signals:
+        for start in range(0, header.available_records, chunk_records):
+            if hash_func is not None:
+                hash_func.update(signals.records[start:start + chunk_records])
+            for i in channels:
+                accumulators[i].update(signals.digital(i, start, start + chunk_records).ravel())
+
+    rows = []
+    for i, name in zip(channels, header.ch_names):
+        channel = header.channels[i]
+        stats = accumulators[i].result(channel)
+        if stats is None:
+            continue
+        rows.append({"file_name": os.path.basename(file_path), "channel": name,
+                     "unit": channel.physical_dimension, "sfreq": channel.sfreq, **stats})
+    return rows
+
+def file_channel_quality(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Computes channel_quality and the file's signal digest in one pass.
+
+    The digest equals edf_dubl_seek.calculate_signal_hash, the content signature of the
+    feature cache (see eeg_features.cached_features). Returns (digest, rows).
+    """
+    header = read_edf_header(file_path)
+    hash_func = new_hash(hash_algorithm)
+    hash_func.update(signal_signature(header).encode())
+    rows = channel_quality(file_path, header, hash_func=hash_func)
+    return hash_func.hexdigest(), rows
+
+def quality_kind():
+    """Cache key of the quality parameters; changing them invalidates cached results."""
+    return 'quality-' + json.dumps({'flatline': FLATLINE_SECONDS, 'columns': QUALITY_COLUMNS})
@@ -1,44 +1,72 @@
 # edf_reader.py
 import os
-from mne.io import read_raw_edf
-from mne import find_events
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from numpy import asarray
+from edf_catalog import EDFCatalog
+from edf_events import extract_stim_events, stim_channels
+from edf_executor import run_tasks
+from edf_header import read_edf_header
+from edf_metrics import instrumented
 
-def read_edf_metadata(file_path):
-    """Reads metadata from an EDF file."""
+def read_events(file_path, catalog=None):
+    """Extracts stim events, reusing the catalog copy when there is one."""
+    if catalog is not None:
+        cached, events = catalog.get_events(file_path)
+        if cached:
+            return asarray(events)
+    events = extract_stim_events(file_path)
+    if catalog is not None:
+        catalog.store_events(file_path, events)
+    return asarray(events)
+
+def read_edf_metadata(file_path, validate=False, catalog=None, force_refresh=False, header=None, with_events=False):
+    """Reads metadata from the EDF header (through the catalog if one is given); stim events only if with_events."""
     try:
-        raw = read_raw_edf(file_path, preload=False)
-        info = raw.info
+        if header is None and catalog is not None:
+            header = catalog.get_header(file_path, force_refresh=force_refresh, validate=validate)
+        elif header is None:
+            header = read_edf_header(file_path, validate=validate)
         metadata = {
             'file_name': os.path.basename(file_path),
-            'subject_info': info.get('subject_info', {}),
-            'duration': raw.times[-1],
-            'channels': info['ch_names'],
-            'sfreq': info['sfreq'],
-            'events': find_events(raw) if 'stim' in info['ch_names'] else None,  # Use find_events
-            'meas_date': info.get('meas_date', None)
+            'subject_info': header.subject_info,
+            'duration': header.duration,
+            'channels': header.ch_names,
+            'sfreq': header.sfreq,
+            # Events are the only part that reads signal data
+            'events': read_events(file_path, catalog) if with_events and stim_channels(header) else None,
+            'meas_date': header.meas_date
         }
         return metadata
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return None
 
-def analyze_directory(directory):
-    """Analyzes all EDF files in the specified directory."""
+@instrumented("analyze_directory")
+def analyze_directory(directory, force_refresh=False, with_events=False, **executor_options):
+    """
+    Analyzes all EDF files in the specified directory (see edf_executor.run_tasks for the options).
+
+    Stim events are extracted only if with_events is true.
+    """
     metadata_list = []
     edf_files = [os.path.join(directory, file_name) for file_name in os.listdir(directory) if file_name.endswith('.edf')]
+    catalog = EDFCatalog.for_directory(directory)
+
+    # Headers are parsed on the worker pool; the catalog is only touched from this process
+    headers, errors = catalog.get_headers(edf_files, force_refresh=force_refresh, **executor_options)
+    for file_path, error in errors.items():
+        print(f"Error reading file {file_path}: {error}")
 
-    with ThreadPoolExecutor() as executor:
-        # Start tasks in a thread pool
-        future_to_file = {executor.submit(read_edf_metadata, file_path): file_path for file_path in edf_files}
+    if with_events:
+        stim_files = [path for path, header in headers.items()
+                      if stim_channels(header) and not catalog.get_events(path)[0]]
+        for file_path, events in run_tasks(extract_stim_events, stim_files, desc="Extracting events", **executor_options):
+            catalog.store_events(file_path, events)
 
-        for future in as_completed(future_to_file):
-            file_path = future_to_file[future]
-            try:
-                metadata = future.result()
-                if metadata:
-                    metadata_list.append(metadata)
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
+    for file_path in edf_files:
+        if file_path in headers:
+            metadata = read_edf_metadata(file_path, catalog=catalog, header=headers[file_path], with_events=with_events)
+            if metadata:
+                metadata_list.append(metadata)
 
+    catalog.close()
     return metadata_list
\ No newline at end of file
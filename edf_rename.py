@@ -1,26 +1,30 @@
 # edf_rename.py
 import os
-from mne.io import read_raw_edf
-from tqdm import tqdm
+from edf_executor import run_tasks
+from edf_header import read_edf_header
+from edf_journal import RENAME_JOURNAL_DIR_NAME, RenameJournal, latest_journal, plan_renames, unfinished_journals
+from edf_metrics import instrumented
 
-def get_edf_metadata(file_path):
+def rename_metadata(header):
+    """Returns the (patient_name, recording_date) that name a file, from its header."""
+    subject_info = header.subject_info
+    first_name = subject_info.get('first_name', '').strip().capitalize()
+    middle_name = subject_info.get('middle_name', '').strip().capitalize()
+    last_name = subject_info.get('last_name', '').strip().capitalize()
+    patient_name = f"{first_name}_{middle_name}_{last_name}".strip()
+    if not patient_name:
+        patient_name = 'Unknown'
+    recording_date = header.meas_date
+    if recording_date:
+        recording_date = recording_date.strftime('%Y-%m-%d_%H-%M-%S')
+    else:
+        recording_date = 'Unknown_Date'
+    return patient_name, recording_date
+
+def get_edf_metadata(file_path, validate=False):
     """Extracts metadata from an EDF file."""
     try:
-        raw = read_raw_edf(file_path, preload=False)
-        info = raw.info
-        subject_info = info.get('subject_info', {})
-        first_name = subject_info.get('first_name', '').strip().capitalize()
-        middle_name = subject_info.get('middle_name', '').strip().capitalize()
-        last_name = subject_info.get('last_name', '').strip().capitalize()
-        patient_name = f"{first_name}_{middle_name}_{last_name}".strip()
-        if not patient_name:
-            patient_name = 'Unknown'
-        recording_date = info.get('meas_date', None)
-        if recording_date:
-            recording_date = recording_date.strftime('%Y-%m-%d_%H-%M-%S')
-        else:
-            recording_date = 'Unknown_Date'
-        return patient_name, recording_date
+        return rename_metadata(read_edf_header(file_path, validate=validate))
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return None, None
@@ -32,32 +36,78 @@ def format_filename(filename):
     formatted_parts = [part.capitalize() if part.isalpha() else part for part in parts]
     return '_'.join(formatted_parts)
 
-def rename_edf_files(directory):
-    """Renames EDF files in the directory."""
-    edf_files = [f for f in os.listdir(directory) if f.endswith('.edf')]
-    renamed_count = 0  # Counter for renamed files
+def target_names(names, metadata):
+    """
+    Works out the new name of every file from its (patient_name, recording_date).
+
+    Collisions are resolved in memory with _1, _2, ... suffixes. A file that already
+    carries its target name (with or without a suffix) keeps it, so running the rename
+    again changes nothing; the names of files that are being renamed are free for
+    others. Returns {old name: new name}.
+    """
+    key = os.path.normcase
+    bases = {name: f"{format_filename(patient_name)}_{recording_date}"
+             for name, (patient_name, recording_date) in metadata.items()}
+    taken = {key(name) for name in names if name not in bases}
+    mapping = {}
+    for name, base in bases.items():
+        suffix = name[len(base):-len('.edf')] if key(name).startswith(key(base)) else None
+        if suffix == '' or (suffix and suffix[0] == '_' and suffix[1:].isdigit()):
+            mapping[name] = name
+            taken.add(key(name))
+    for name in sorted(bases):
+        if name in mapping:
+            continue
+        new_name, counter = f"{bases[name]}.edf", 1
+        while key(new_name) in taken:
+            new_name = f"{bases[name]}_{counter}.edf"
+            counter += 1
+        mapping[name] = new_name
+        taken.add(key(new_name))
+    return mapping
+
+def resume_renames(directory, on_rename=None):
+    """Finishes renames that were interrupted; returns the number of files moved."""
+    journal_dir = os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME)
+    return sum(journal.apply(on_rename) for journal in unfinished_journals(journal_dir))
+
+def rollback_renames(directory, on_rename=None):
+    """Restores the names from before the last rename batch; returns the number of files moved back."""
+    journal = latest_journal(os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME))
+    return journal.rollback(on_rename) if journal else 0
 
-    for file_name in tqdm(edf_files, desc="Renaming files", unit="file"):
-        file_path = os.path.join(directory, file_name)
-        patient_name, recording_date = get_edf_metadata(file_path)
+@instrumented("rename_edf_files")
+def rename_edf_files(directory, **executor_options):
+    """
+    Renames EDF files in the directory to <patient>_<recording date>.edf.
 
+    Metadata is read on the worker pool, the complete rename plan is computed in memory,
+    and the plan is applied from a journal in output/rename_journal, so an interrupted
+    run can be resumed or rolled back. An interrupted earlier run is resumed first.
+    """
+    resumed = resume_renames(directory)
+    if resumed:
+        print(f"Finished an interrupted rename: {resumed} files")
+
+    names = os.listdir(directory)
+    edf_files = [f for f in names if f.endswith('.edf')]
+    paths = [os.path.join(directory, file_name) for file_name in edf_files]
+    results = dict(run_tasks(get_edf_metadata, paths, desc="Reading metadata", **executor_options))
+
+    metadata = {}
+    for file_name, file_path in zip(edf_files, paths):
+        patient_name, recording_date = results.get(file_path, (None, None))
         if patient_name and recording_date:
-            formatted_patient_name = format_filename(patient_name)
-            new_name = f"{formatted_patient_name}_{recording_date}.edf"
-            new_file_path = os.path.join(directory, new_name)
-
-            counter = 1
-            while os.path.exists(new_file_path):
-                new_name = f"{formatted_patient_name}_{recording_date}_{counter}.edf"
-                new_file_path = os.path.join(directory, new_name)
-                counter += 1
-
-            os.rename(file_path, new_file_path)
-            renamed_count += 1  # Increment the counter
+            metadata[file_name] = (patient_name, recording_date)
         else:
             print(f"Failed to extract metadata for file {file_name}")
 
-    return renamed_count  # Return the number of renamed files
+    mapping = target_names(names, metadata)
+    steps = plan_renames(mapping, names)
+    if steps:
+        journal = RenameJournal.create(os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME), directory, steps)
+        journal.apply()
+    return sum(old != new for old, new in mapping.items())  # Return the number of renamed files
 
 def main():
     """Main function for renaming EDF files."""
@@ -66,6 +116,10 @@ def main():
         print("The specified directory does not exist.")
         return
 
+    if input("Undo the last rename instead? [y/N]: ").strip().lower() == 'y':
+        print(f"Files restored: {rollback_renames(directory)}")
+        return
+
     renamed_count = rename_edf_files(directory)
     print(f"Files renamed: {renamed_count}")
 
@@ -1,47 +1,117 @@
 # edf_rnd_name.py
 import os
-import random
 import csv
+import hashlib
+from edf_journal import RENAME_JOURNAL_DIR_NAME, RenameJournal, plan_renames, unfinished_journals
+from edf_metrics import instrumented
 
-# Function to generate a unique 6-digit numeric code
-def generate_unique_code(used_codes):
-    while True:
-        code = ''.join(random.choices('0123456789', k=6))
-        if code not in used_codes:
-            used_codes.add(code)
-            return code
+MAPPING_NAME = "name_mapping.csv"
+CODE_WIDTH = 6  # Digits per code; 10**CODE_WIDTH files at most
+ROUNDS = 4
+JOURNAL_PREFIX = "randomize"
 
-# Prompt the user for the directory path
-directory = input("Enter the path to the directory containing the files: ")
+class KeyedPermutation:
+    """
+    Pseudo-random permutation of range(size) chosen by a secret key.
 
-# Change to the specified directory
-os.chdir(directory)
+    A balanced Feistel network over the smallest even number of bits that covers size,
+    with cycle walking for values outside the range (fewer than 4 steps on average).
+    Distinct indices always give distinct values, so no set of used codes is needed.
+    """
 
-# Get a list of files in the specified directory
-files = [f for f in os.listdir() if os.path.isfile(f)]
+    def __init__(self, size, key=None):
+        self.size = size
+        self.key = key or os.urandom(16)
+        bits = max(2, (size - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
 
-# Create a set to store used codes
-used_codes = set()
+    def _round(self, number, value):
+        digest = hashlib.blake2b(bytes((number,)) + value.to_bytes(8, 'little'), key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little') & self.mask
 
-# Create a list to store the old and new name correspondence
-name_mapping = []
+    def _encrypt(self, value):
+        left, right = value >> self.half, value & self.mask
+        for number in range(ROUNDS):
+            left, right = right, left ^ self._round(number, right)
+        return (left << self.half) | right
 
-# Rename the files
-for old_name in files:
-    # Generate a unique code
-    new_name = generate_unique_code(used_codes) + os.path.splitext(old_name)[1]
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
 
-    # Rename the file
-    os.rename(old_name, new_name)
+def generate_codes(count, width=CODE_WIDTH, key=None):
+    """Yields count distinct random numeric codes of the given width."""
+    if count > 10 ** width:
+        raise ValueError(f"{count} files do not fit into {width}-digit codes")
+    permutation = KeyedPermutation(10 ** width, key)
+    for index in range(count):
+        yield str(permutation[index]).zfill(width)
 
-    # Add the correspondence to the list
-    name_mapping.append((old_name, new_name))
+def _apply(directory, mapping, names, on_rename):
+    steps = plan_renames(mapping, names)
+    journal = RenameJournal.create(os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME), directory, steps,
+                                   prefix=JOURNAL_PREFIX)
+    return journal.apply(on_rename)
 
-# Save the correspondence in a CSV file
-with open('name_mapping.csv', 'w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(['Old Name', 'New Name'])
-    writer.writerows(name_mapping)
+@instrumented("randomize_filenames")
+def randomize_filenames(directory, width=CODE_WIDTH, on_rename=None):
+    """
+    Renames every file in the directory to a random numeric code, keeping the extension.
 
-print(f"Files successfully renamed in directory {directory}.")
-print("The name correspondence table is saved in name_mapping.csv.")
\ No newline at end of file
+    The old -> new names are written to MAPPING_NAME row by row and synced before any file
+    is renamed; the renames are applied from a journal. If an earlier run was
+    interrupted, it is finished instead of starting a new one, so the mapping stays
+    valid. Returns the path of the mapping file.
+    """
+    mapping_path = os.path.join(directory, MAPPING_NAME)
+    journal_dir = os.path.join(directory, "output", RENAME_JOURNAL_DIR_NAME)
+    interrupted = unfinished_journals(journal_dir, prefix=JOURNAL_PREFIX)
+    if interrupted:
+        moved = sum(journal.apply(on_rename) for journal in interrupted)
+        print(f"Finished an interrupted randomization: {moved} files")
+        return mapping_path
+
+    with os.scandir(directory) as entries:
+        files = sorted(entry.name for entry in entries if entry.is_file() and entry.name != MAPPING_NAME)
+    mapping = {}
+    with open(mapping_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Old Name', 'New Name'])
+        for old_name, code in zip(files, generate_codes(len(files), width)):
+            new_name = code + os.path.splitext(old_name)[1]
+            mapping[old_name] = new_name
+            writer.writerow([old_name, new_name])
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+
+    _apply(directory, mapping, files + [MAPPING_NAME], on_rename)
+    return mapping_path
+
+@instrumented("restore_filenames")
+def restore_filenames(directory, on_rename=None):
+    """Renames randomized files back to their original names from MAPPING_NAME; returns the count."""
+    with open(os.path.join(directory, MAPPING_NAME), newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)
+        mapping = {new_name: old_name for old_name, new_name in reader}
+    names = os.listdir(directory)
+    present = set(names)
+    mapping = {new_name: old_name for new_name, old_name in mapping.items() if new_name in present}
+    return _apply(directory, mapping, names, on_rename)
+
+if __name__ == "__main__":
+    input_directory = input("Enter the path to the directory containing the files: ").strip()
+
+    if not os.path.isdir(input_directory):
+        print("The specified directory does not exist.")
+    elif input("Restore the original names from name_mapping.csv? [y/N]: ").strip().lower() == 'y':
+        print(f"Files restored: {restore_filenames(input_directory)}")
+    else:
+        output_path = randomize_filenames(input_directory)
+        print(f"Files successfully renamed in directory {input_directory}.")
+        print(f"The name correspondence table is saved in {output_path}.")
@@ -0,0 +1,107 @@
+# edf_signal.py
+import numbers
+import numpy as np
+from edf_header import read_edf_header
+
+def record_dtype(header):
+    """Structured dtype of one data record: one int16 sub-array per signal."""
+    return np.dtype([(f"s{i}", "<i2", (ch.samples_per_record,)) for i, ch in enumerate(header.channels)])
+
+class EDFSignals:
+    """
+    Memory-mapped, read-only view of the data records of an EDF file.
+
+    The data section is mapped as an array of records, so per-channel views are strided
+    int16 arrays that copy nothing; pages are only read when samples are accessed.
+    Physical scaling (in the header's units, e.g. uV) is applied to the requested
+    samples only. Only complete data records are mapped.
+    """
+
+    def __init__(self, file_path, header=None):
+        self.file_path = file_path
+        self.header = header or read_edf_header(file_path)
+        dtype = record_dtype(self.header)
+        if self.header.available_records:
+            self.records = np.memmap(file_path, dtype=dtype, mode="r", offset=self.header.header_bytes,
+                                     shape=(self.header.available_records,))
+        else:
+            self.records = np.empty(0, dtype=dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmaps the file; views taken before stay valid until they are released."""
+        self.records = None
+
+    def channel_index(self, channel):
+        """Resolves a channel given by index (including numpy integers) or label."""
+        if isinstance(channel, numbers.Integral):
+            return int(channel)
+        labels = [ch.label for ch in self.header.channels]
+        if channel not in labels:
+            raise KeyError(f"Channel {channel!r} not found in {self.file_path}")
+        return labels.index(channel)
+
+    def n_samples(self, channel):
+        """Number of samples of a channel in the complete records."""
+        return self.header.available_records * self.header.channels[self.channel_index(channel)].samples_per_record
+
+    def digital(self, channel, start_record=0, stop_record=None):
+        """Strided (n_records, samples_per_record) int16 view of a channel; nothing is copied."""
+        return self.records[f"s{self.channel_index(channel)}"][start_record:stop_record]
+
+    def scale(self, channel, values):
+        """Converts digital values of a channel to physical float64 values."""
+        ch = self.header.channels[self.channel_index(channel)]
+        physical = values * ch.gain
+        physical += ch.offset
+        return physical
+
+    def physical(self, channel, start_record=0, stop_record=None):
+        """Physical values of a channel for a range of records, as a 1-D float64 array."""
+        return self.scale(channel, self.digital(channel, start_record, stop_record)).ravel()
+
+    def sample_range(self, channel, t0, t1):
+        """Returns [start, stop) sample indexes of a channel covering t0..t1 seconds."""
+        index = self.channel_index(channel)
+        sfreq = self.header.channels[index].sfreq
+        n_samples = self.n_samples(index)
+        start = min(max(0, int(round(t0 * sfreq))), n_samples)
+        stop = n_samples if t1 is None else min(max(start, int(round(t1 * sfreq))), n_samples)
+        return start, stop
+
+    def read_samples(self, channel, start, stop, physical=True):
+        """Reads samples [start, stop) of a channel, touching only the records that hold them."""
+        index = self.channel_index(channel)
+        per_record = self.header.channels[index].samples_per_record
+        first_record = start // per_record
+        last_record = -(-stop // per_record)
+        values = self.digital(index, first_record, last_record).reshape(-1)
+        values = values[start - first_record * per_record:stop - first_record * per_record]
+        return self.scale(index, values) if physical else np.array(values)
+
+    def read_window(self, channels, t0=0.0, t1=None, physical=True):
+        """
+        Reads t0..t1 seconds of the given channels (indexes or labels; all data channels if None).
+
+        Returns a list with one 1-D array per channel at the channel's own sampling rate.
+        """
+        if channels is None:
+            channels = [i for i, ch in enumerate(self.header.channels) if not ch.is_annotation]
+        return [self.read_samples(channel, *self.sample_range(channel, t0, t1), physical=physical)
+                for channel in channels]
+
+    def iter_records(self, channel, chunk_records, physical=False):
+        """Yields a channel's samples in chunks of whole records, as (n, samples_per_record) arrays."""
+        for start in range(0, self.header.available_records, max(1, chunk_records)):
+            values = self.digital(channel, start, start + chunk_records)
+            yield self.scale(channel, values) if physical else values
+
+def read_window(file_path, channels=None, t0=0.0, t1=None, physical=True):
+    """Reads t0..t1 seconds of the given channels of an EDF file (see EDFSignals.read_window)."""
+    with EDFSignals(file_path) as signals:
+        return signals.read_window(channels, t0, t1, physical)
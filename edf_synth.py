@@ -0,0 +1,213 @@
+# edf_synth.py
+import os
+import json
+import shutil
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+import numpy as np
+from edf_header import FIXED_FIELDS, HEADER_SIZE, SIGNAL_HEADER_SIZE, TAL_LABELS
+
+MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+CHANNEL_NAMES = ("Fp1", "Fp2", "F7", "F3", "Fz", "F4", "F8", "T3", "C3", "Cz", "C4", "T4", "T5", "P3", "Pz", "P4",
+                 "T6", "O1", "O2")
+SURNAMES = ("Ivanov", "Petrov", "Smirnov", "Kuznetsov", "Popov", "Sokolov", "Lebedev", "Kozlov", "Novikov",
+            "Morozov", "Volkov", "Solovyov", "Vasilyev", "Zaitsev", "Pavlov", "Semyonov", "Golubev", "Vinogradov")
+FIRST_NAMES = {"M": ("Ivan", "Aleksey", "Dmitry", "Sergey", "Andrey", "Mikhail", "Nikolai", "Pavel"),
+               "F": ("Anna", "Maria", "Elena", "Olga", "Tatiana", "Natalia", "Irina", "Svetlana")}
+MIDDLE_NAMES = {"M": ("Ivanovich", "Petrovich", "Sergeyevich", "Andreyevich"),
+                "F": ("Ivanovna", "Petrovna", "Sergeyevna", "Andreyevna")}
+CORRUPTIONS = ("truncated", "header", "empty")
+TAL_SAMPLES = 30  # Samples (2 bytes each) of the EDF+ annotation signal per record
+PHYSICAL_RANGE = 3200.0  # uV
+RECORDS_PER_WRITE = 64  # Data records generated and written at a time
+MANIFEST_NAME = "synth_manifest.json"
+
+@dataclass
+class CorpusSpec:
+    """Shape of a synthetic EDF/EDF+ corpus; the same spec and seed always give the same bytes."""
+    n_files: int = 100
+    n_channels: int = 19
+    sfreq: int = 256
+    duration: float = 30.0  # Mean recording length in seconds; lengths vary by ±50 %
+    edf_plus_ratio: float = 0.5  # Share of EDF+ files, the others are plain EDF
+    duplicate_ratio: float = 0.05  # Share of files that are byte copies of another file
+    corruption_ratio: float = 0.05  # Share of files that are truncated or have a broken header
+    clustered_ratio: float = 0.3  # Share of files that start close to another recording
+    cluster_spread: float = 5.0  # Minutes between the starts of clustered recordings
+    recordings_per_patient: int = 3
+    seed: int = 0
+
+def _field(value, length):
+    return str(value).ljust(length)[:length].encode('latin-1')
+
+def _edf_date(day):
+    return f"{day.day:02d}-{MONTHS[day.month - 1]}-{day.year}"
+
+def build_header(patient_id, recording_id, start, n_records, labels, samples_per_record, edf_plus,
+                 record_duration=1.0):
+    """Returns the header bytes of an EDF/EDF+ file with 16-bit signals over PHYSICAL_RANGE."""
+    fixed = {
+        "version": "0",
+        "patient_id": patient_id,
+        "recording_id": recording_id,
+        "start_date": start.strftime("%d.%m.%y"),
+        "start_time": start.strftime("%H.%M.%S"),
+        "header_bytes": HEADER_SIZE + len(labels) * SIGNAL_HEADER_SIZE,
+        "reserved": "EDF+C" if edf_plus else "",
+        "n_records": n_records,
+        "record_duration": f"{record_duration:g}",
+        "n_signals": len(labels),
+    }
+    header = b"".join(_field(fixed[name], length) for name, _, length in FIXED_FIELDS)
+    annotation = [label in TAL_LABELS for label in labels]
+    columns = (
+        (labels, 16),
+        (["" if tal else "AgAgCl electrode" for tal in annotation], 80),
+        (["" if tal else "uV" for tal in annotation], 8),
+        ([-1 if tal else -PHYSICAL_RANGE for tal in annotation], 8),
+        ([1 if tal else PHYSICAL_RANGE for tal in annotation], 8),
+        ([-32768] * len(labels), 8),
+        ([32767] * len(labels), 8),
+        (["" if tal else "HP:0.1Hz LP:70Hz" for tal in annotation], 80),
+        (samples_per_record, 8),
+        ([""] * len(labels), 32),
+    )
+    for values, length in columns:
+        header += b"".join(_field(f"{value:g}" if isinstance(value, float) else value, length) for value in values)
+    return header
+
+def _records(rng, n_records, n_channels, sfreq, edf_plus):
+    """Yields blocks of data records: alpha rhythm plus noise, and the EDF+ time-keeping TALs."""
+    time = np.arange(sfreq) / sfreq
+    phases = rng.uniform(0, 2 * np.pi, n_channels)[:, None]
+    alpha = np.sin(2 * np.pi * rng.uniform(8, 12) * time[None, :] + phases)
+    scale = 32767 / PHYSICAL_RANGE
+    for first in range(0, n_records, RECORDS_PER_WRITE):
+        count = min(RECORDS_PER_WRITE, n_records - first)
+        signal = 30 * alpha[None, :, :] + rng.normal(0, 10, (count, n_channels, sfreq))
+        samples = np.clip(np.rint(signal * scale), -32768, 32767).astype('<i2').reshape(count, -1)
+        if edf_plus:
+            tals = np.zeros((count, TAL_SAMPLES * 2), dtype=np.uint8)
+            for i in range(count):
+                onset = f"+{first + i}\x14\x14\x00".encode()
+                tals[i, :len(onset)] = np.frombuffer(onset, dtype=np.uint8)
+            yield np.hstack((samples.view(np.uint8), tals)).tobytes()
+        else:
+            yield samples.tobytes()
+
+def write_recording(path, spec, patient, start, n_records, edf_plus, seed):
+    """Writes one synthetic recording; returns its size in bytes."""
+    labels = [f"EEG {CHANNEL_NAMES[i]}" if i < len(CHANNEL_NAMES) else f"EEG {i + 1}"
+              for i in range(spec.n_channels)]
+    samples_per_record = [spec.sfreq] * spec.n_channels
+    name = "_".join(patient["name"])
+    if edf_plus:
+        patient_id = f"{patient['code']} {patient['sex']} {_edf_date(patient['birthdate'])} {name}"
+        recording_id = f"Startdate {_edf_date(start)} X X Synthetic"
+        labels.append(TAL_LABELS[0])
+        samples_per_record.append(TAL_SAMPLES)
+    else:
+        patient_id, recording_id = " ".join(patient["name"]), "Synthetic"
+    with open(path, 'wb') as f:
+        f.write(build_header(patient_id, recording_id, start, n_records, labels, samples_per_record, edf_plus))
+        for block in _records(np.random.default_rng(seed), n_records, spec.n_channels, spec.sfreq, edf_plus):
+            f.write(block)
+        return f.tell()
+
+def corrupt(path, kind, rng):
+    """Damages a written recording: cuts it mid-record, breaks the header size field, or empties it."""
+    if kind == "empty":
+        os.truncate(path, 0)
+    elif kind == "truncated":
+        size = os.path.getsize(path)
+        os.truncate(path, size - int(rng.integers(1, max(2, size // 4))))
+    else:
+        with open(path, 'r+b') as f:
+            f.seek(184)
+            f.write(_field("garbage", 8))
+
+def _patients(spec, rng):
+    count = max(1, spec.n_files // max(1, spec.recordings_per_patient))
+    patients = []
+    for index in range(count):
+        sex = "M" if rng.random() < 0.5 else "F"
+        suffix = "" if sex == "M" else "a"
+        patients.append({
+            "code": f"P{index:05d}",
+            "sex": sex,
+            "birthdate": datetime(1950, 1, 1) + timedelta(days=int(rng.integers(0, 65 * 365))),
+            "name": (str(rng.choice(SURNAMES)) + suffix, str(rng.choice(FIRST_NAMES[sex])),
+                     str(rng.choice(MIDDLE_NAMES[sex]))),
+        })
+    return patients
+
+def _start_times(spec, count, rng):
+    """Start times spread over a year; clustered_ratio of them follow a previous start by minutes."""
+    origin = datetime(2023, 1, 1, 8)
+    starts = []
+    for _ in range(count):
+        if starts and rng.random() < spec.clustered_ratio:
+            offset = timedelta(minutes=float(rng.uniform(0, spec.cluster_spread)))
+            start = starts[int(rng.integers(len(starts)))] + offset
+        else:
+            start = origin + timedelta(days=int(rng.integers(0, 365)), minutes=float(rng.uniform(0, 600)))
+        starts.append(start.replace(microsecond=0))
+    return starts
+
+def generate_corpus(directory, spec=None):
+    """
+    Writes a deterministic synthetic corpus of spec.n_files EDF/EDF+ files into directory.
+
+    Each patient has several recordings. A share of the files are byte copies of other
+    files under new names (duplicates), a share are corrupted, and a share start within
+    spec.cluster_spread minutes of another recording. Returns the manifest, which is
+    also saved as MANIFEST_NAME in the directory.
+    """
+    spec = spec or CorpusSpec()
+    rng = np.random.default_rng(spec.seed)
+    os.makedirs(directory, exist_ok=True)
+    n_duplicates = int(round(spec.n_files * spec.duplicate_ratio))
+    n_originals = spec.n_files - n_duplicates
+    patients = _patients(spec, rng)
+    starts = _start_times(spec, n_originals, rng)
+    records_per_file = np.maximum(1, np.rint(spec.duration * rng.uniform(0.5, 1.5, n_originals))).astype(int)
+
+    files = []
+    for index in range(n_originals):
+        name = f"rec_{index:06d}.edf"
+        patient = patients[int(rng.integers(len(patients)))]
+        write_recording(os.path.join(directory, name), spec, patient, starts[index], int(records_per_file[index]),
+                        rng.random() < spec.edf_plus_ratio, seed=[spec.seed, index])
+        files.append(name)
+
+    n_corrupted = min(n_originals, int(round(spec.n_files * spec.corruption_ratio)))
+    corrupted = {}
+    for index in sorted(rng.choice(n_originals, n_corrupted, replace=False)):
+        kind = CORRUPTIONS[int(rng.integers(len(CORRUPTIONS)))]
+        corrupt(os.path.join(directory, files[index]), kind, rng)
+        corrupted[files[index]] = kind
+
+    intact = [name for name in files if name not in corrupted] or files
+    duplicates = {}
+    for index in range(n_duplicates):
+        name, original = f"copy_{index:06d}.edf", intact[int(rng.integers(len(intact)))]
+        shutil.copyfile(os.path.join(directory, original), os.path.join(directory, name))
+        duplicates[name] = original
+
+    manifest = {
+        "spec": asdict(spec),
+        "files": files + list(duplicates),
+        "duplicates": duplicates,
+        "corrupted": corrupted,
+        "bytes": sum(os.path.getsize(os.path.join(directory, name)) for name in files + list(duplicates)),
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+if __name__ == "__main__":
+    directory = input("Enter the directory for the synthetic corpus: ").strip()
+    n_files = int(input("Number of files [100]: ").strip() or 100)
+    seed = int(input("Seed [0]: ").strip() or 0)
+    manifest = generate_corpus(directory, CorpusSpec(n_files=n_files, seed=seed))
+    print(f"Written {len(manifest['files'])} files ({manifest['bytes'] / 2 ** 20:.1f} MB) to {directory}")
@@ -1,17 +1,17 @@
 # edf_time.py
 import os
-from collections import defaultdict
+import heapq
 from datetime import timedelta
-from mne.io import read_raw_edf
-from tqdm import tqdm
+from edf_executor import run_tasks
+from edf_header import read_edf_header
+from edf_metrics import instrumented, stage
 
-def get_edf_start_time(file_path):
+def get_edf_start_time(file_path, validate=False):
     """
-    Extracts the recording start time from an EDF file using MNE.
+    Extracts the recording start time from the EDF header.
     """
     try:
-        raw = read_raw_edf(file_path, preload=False, verbose=False)
-        start_datetime = raw.info['meas_date']
+        start_datetime = read_edf_header(file_path, validate=validate).meas_date
         if start_datetime:
             return start_datetime
         return None
@@ -19,29 +19,110 @@ def get_edf_start_time(file_path):
         print(f"Error reading file {file_path}: {e}")
         return None
 
-def find_edf_with_similar_start_time(directory, time_delta=timedelta(minutes=10)):
+def patient_key(header):
+    """Normalized patient identity used to restrict overlap checks to one patient."""
+    return (header.patient.name or header.patient_id).strip().lower()
+
+def recording_interval(header):
+    """Returns (start, end, patient) of a recording, or None without a valid start time."""
+    if header.meas_date is None:
+        return None
+    end = header.meas_date + timedelta(seconds=header.available_records * header.record_duration)
+    return header.meas_date, end, patient_key(header)
+
+def get_edf_interval(file_path):
     """
-    Finds EDF files with similar start times (within time_delta).
+    Reads (start, end, patient) of a recording from the EDF header.
     """
-    time_dict = defaultdict(list)
-    edf_files = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files if file.lower().endswith('.edf')]
+    try:
+        return recording_interval(read_edf_header(file_path))
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return None
 
-    for file_path in tqdm(edf_files, desc="Processing files", unit="file"):
-        start_datetime = get_edf_start_time(file_path)
-        if start_datetime:
-            rounded_time = start_datetime - timedelta(minutes=start_datetime.minute % 10)
-            time_dict[rounded_time].append((start_datetime, file_path))
+def cluster_start_times(start_times, time_delta):
+    """
+    Groups (start, file_path) pairs whose start times chain within time_delta.
 
-    similar_time_groups = []
-    for rounded_time, files in time_dict.items():
-        if len(files) > 1:
-            files.sort()
-            for i in range(1, len(files)):
-                if files[i][0] - files[i - 1][0] <= time_delta:
-                    similar_time_groups.append(files)
-                    break
+    A sorted sweep puts a file in the current group whenever it starts at most time_delta
+    after the previous one, so boundaries such as 09:59 and 10:01 never split a group.
+    This is single-link chaining: a group can span far more than time_delta (starts at
+    10:00, 10:08 and 10:16 form one group for 10 minutes), and only neighbours are
+    guaranteed to be close. Use pair_start_times for pairs that are each within
+    time_delta. Only groups with more than one file are returned.
+    """
+    groups = []
+    current = []
+    for start, file_path in sorted(start_times):
+        if current and start - current[-1][0] > time_delta:
+            if len(current) > 1:
+                groups.append(current)
+            current = []
+        current.append((start, file_path))
+    if len(current) > 1:
+        groups.append(current)
+    return groups
+
+def pair_start_times(start_times, time_delta):
+    """Returns every (earlier, later) pair of (start, file_path) items at most time_delta apart."""
+    pairs = []
+    ordered = sorted(start_times)
+    first = 0
+    for i, (start, file_path) in enumerate(ordered):
+        while start - ordered[first][0] > time_delta:
+            first += 1
+        pairs.extend((ordered[j], (start, file_path)) for j in range(first, i))
+    return pairs
 
-    return similar_time_groups
+def find_overlaps(intervals, tolerance=timedelta(0), same_patient=False):
+    """
+    Finds recordings whose (start, end) intervals overlap.
+
+    intervals holds (start, end, patient, file_path) tuples. A sweep over start times keeps
+    the still-running recordings in a heap ordered by end time, giving O(n log n + k) for
+    k reported pairs. Recordings separated by a gap shorter than tolerance also count;
+    back-to-back recordings (one ends exactly when the next starts) do not overlap.
+    Returns (file_a, file_b, overlap) tuples where overlap is a timedelta (negative for gaps).
+    """
+    overlaps = []
+    active = []
+    for start, end, patient, file_path in sorted(intervals):
+        while active and active[0][0] + tolerance <= start:
+            heapq.heappop(active)
+        for other_end, other_patient, other_path in active:
+            if same_patient and other_patient != patient:
+                continue
+            overlaps.append((other_path, file_path, min(end, other_end) - start))
+        heapq.heappush(active, (end, patient, file_path))
+    return overlaps
+
+def _read_intervals(directory, **executor_options):
+    """Reads (start, end, patient, file_path) for every EDF file under directory."""
+    with stage("walk"):
+        edf_files = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files
+                     if file.lower().endswith('.edf')]
+    return [(interval[0], interval[1], interval[2], file_path)
+            for file_path, interval in run_tasks(get_edf_interval, edf_files, desc="Processing files", **executor_options)
+            if interval]
+
+@instrumented("find_edf_with_similar_start_time")
+def find_edf_with_similar_start_time(directory, time_delta=timedelta(minutes=10), pairs=False, **executor_options):
+    """
+    Finds EDF files with similar start times (within time_delta).
+
+    Returns groups of (start, file_path) items, or the individual pairs if pairs is true.
+    """
+    start_times = [(start, file_path) for start, _, _, file_path in _read_intervals(directory, **executor_options)]
+    if pairs:
+        return pair_start_times(start_times, time_delta)
+    return cluster_start_times(start_times, time_delta)
+
+@instrumented("find_overlapping_edf")
+def find_overlapping_edf(directory, tolerance=timedelta(0), same_patient=False, **executor_options):
+    """
+    Finds EDF recordings whose time spans overlap, optionally only within the same patient.
+    """
+    return find_overlaps(_read_intervals(directory, **executor_options), tolerance, same_patient)
 
 def main():
     """
@@ -52,7 +133,9 @@ def main():
         print("The specified directory does not exist.")
         return
 
-    similar_time_groups = find_edf_with_similar_start_time(directory)
+    intervals = _read_intervals(directory)
+    similar_time_groups = cluster_start_times([(start, file_path) for start, _, _, file_path in intervals],
+                                              timedelta(minutes=10))
 
     if similar_time_groups:
         print("EDF files with similar start times (within 10 minutes) were found:")
@@ -63,5 +146,11 @@ def main():
     else:
         print("No EDF files with similar start times were found.")
 
+    overlaps = find_overlaps(intervals)
+    if overlaps:
+        print("\nRecordings with overlapping time spans:")
+        for file_a, file_b, overlap in overlaps:
+            print(f"  {file_a} and {file_b} overlap by {overlap}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,328 @@
+# edf_watch.py
+import os
+import sys
+import time
+import ctypes
+import select
+import struct
+import argparse
+from ctypes.util import find_library
+from datetime import datetime
+from edf_catalog import EDFCatalog
+from edf_columnar import export_table
+from edf_executor import BACKENDS, DEFAULT_BACKEND
+from edf_metrics import collect_metrics, increment, instrumented, stage
+from edf_reader import read_edf_metadata
+from eeg_statistics import (DESCRIPTIVE_STATS_NAME, METADATA_STATS_NAME, describe_statistics, statistics_row,
+                            statistics_table, visualize_statistics, write_descriptive_stats)
+
+SETTLE_SECONDS = 2.0  # A file is read once its size and mtime have not changed for this long
+INCOMPLETE_GRACE = 60.0  # Files shorter than their header says are waited for this long, then read as they are
+POLL_INTERVAL = 2.0  # Seconds between scans of the polling watcher, and the longest wait of the watch loop
+WRITE_DELAY = 30.0  # While files are still arriving, the outputs are rewritten at most this often
+
+# inotify(7) flags
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, length of the name that follows
+READ_BUFFER = 64 * 1024
+
+def is_edf(name):
+    return name.lower().endswith('.edf')
+
+def signature(stat_result):
+    """What identifies a version of a file: size, mtime and inode, as in the catalog."""
+    return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+def scan(directory):
+    """{name: stat_result} of the EDF files directly in directory, from one scandir pass."""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if is_edf(entry.name):
+                try:
+                    if entry.is_file():
+                        files[entry.name] = entry.stat()
+                except FileNotFoundError:
+                    pass  # Removed while scanning
+    return files
+
+class InotifyWatcher:
+    """Change notifications for the files of a directory from Linux inotify, through ctypes."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {directory}")
+
+    def changes(self, timeout):
+        """Waits up to timeout seconds; returns the names with events, or None if the kernel dropped events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        names, overflow = set(), False
+        while ready:
+            try:
+                data = os.read(self.fd, READ_BUFFER)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                overflow |= bool(mask & IN_Q_OVERFLOW)
+                if length:
+                    names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+                offset += length
+        return None if overflow else names
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Finds changed files by comparing scandir snapshots of a directory every interval."""
+
+    def __init__(self, directory, interval=POLL_INTERVAL):
+        self.directory, self.interval = directory, interval
+        self.snapshot = {name: signature(stat_result) for name, stat_result in scan(directory).items()}
+        self.next_scan = time.monotonic() + interval
+
+    def changes(self, timeout):
+        """Waits up to timeout seconds; returns the names whose size, mtime or inode changed since the last scan."""
+        time.sleep(max(0.0, min(timeout, self.next_scan - time.monotonic())))
+        if time.monotonic() < self.next_scan:
+            return set()
+        snapshot = {name: signature(stat_result) for name, stat_result in scan(self.directory).items()}
+        self.next_scan = time.monotonic() + self.interval
+        changed = {name for name in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(name) != self.snapshot.get(name)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def open_watcher(directory, poll_interval=POLL_INTERVAL, use_inotify=True):
+    """An InotifyWatcher on Linux, otherwise (or if inotify is unavailable) a PollingWatcher."""
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"inotify is not available ({e}), polling every {poll_interval} s")
+    return PollingWatcher(directory, poll_interval)
+
+class DirectoryWatch:
+    """
+    Keeps the metadata table, descriptive statistics and plots of a folder up to date.
+
+    Only EDF files that are new, changed or removed are read again: the table rows are
+    kept per file and the outputs are rebuilt from them. A file is read once its size
+    and mtime have been stable for settle seconds; if its header is still unreadable or
+    announces more records than the file holds, it is assumed to be still copying and
+    is waited for up to INCOMPLETE_GRACE seconds.
+    """
+
+    def __init__(self, directory, settle=SETTLE_SECONDS, poll_interval=POLL_INTERVAL, plots=True, use_inotify=True,
+                 **executor_options):
+        self.directory = os.path.normpath(directory)
+        self.output_dir = os.path.join(self.directory, "output")
+        self.settle, self.poll_interval, self.plots, self.use_inotify = settle, poll_interval, plots, use_inotify
+        self.executor_options = executor_options
+        self.catalog = EDFCatalog.for_directory(self.directory)
+        self.watcher = None
+        self.rows = {}  # name -> metadata table row
+        self.known = {}  # name -> signature of the version the row was read from
+        self.pending = {}  # name -> (signature, monotonic time of its last change, monotonic time it is due)
+        self.removed = set()
+        self.dirty, self.last_write = False, time.monotonic()
+
+    def start(self):
+        """Starts watching, reads the files already present and writes the outputs."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Watch first, so nothing that lands during the initial read is missed
+        self.watcher = open_watcher(self.directory, self.poll_interval, self.use_inotify)
+        files, now = scan(self.directory), time.monotonic()
+        for name, stat_result in files.items():
+            if time.time() - stat_result.st_mtime < self.settle:
+                self.pending[name] = (signature(stat_result), now, now + self.settle)  # Possibly still being copied
+        settled = {name: stat_result for name, stat_result in files.items() if name not in self.pending}
+        self._read(settled, now, desc="Reading headers")
+        self.write_outputs()
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        self.catalog.close()
+
+    def _note(self, name, now):
+        """Records an event for a file."""
+        try:
+            stat_result = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            self.pending.pop(name, None)
+            if name in self.known:
+                self.removed.add(name)
+            return
+        self.removed.discard(name)
+        current = signature(stat_result)
+        if current == self.known.get(name):
+            self.pending.pop(name, None)  # Touched but unchanged, or changed back
+        elif name not in self.pending or self.pending[name][0] != current:
+            self.pending[name] = (current, now, now + self.settle)
+
+    def _read(self, files, now, desc=None):
+        """Reads the headers of settled files into rows; files that look incomplete stay pending."""
+        paths = {name: os.path.join(self.directory, name) for name in files}
+        headers, errors = self.catalog.get_headers(list(paths.values()), desc=desc, **self.executor_options)
+        updated = 0
+        for name, stat_result in files.items():
+            path = paths[name]
+            header = headers.get(path)
+            complete = header is not None and 0 < header.n_records <= header.available_records
+            _, changed, _ = self.pending.get(name, (None, now, None))
+            if not complete and now - changed < INCOMPLETE_GRACE:
+                self.pending[name] = (signature(stat_result), changed, changed + INCOMPLETE_GRACE)
+                continue
+            self.pending.pop(name, None)
+            self.known[name] = signature(stat_result)
+            metadata = read_edf_metadata(path, header=header) if header is not None else None
+            if metadata is None:
+                print(f"Error reading file {path}: {errors.get(path, 'unknown error')}")
+                if self.rows.pop(name, None) is not None:
+                    self.dirty = True
+                continue
+            self.rows[name] = statistics_row(metadata)
+            self.dirty = True
+            updated += 1
+        increment("watch: files read", updated)
+        return updated
+
+    def apply(self, now=None):
+        """Applies removals and the pending files that are due; returns (files read, files removed)."""
+        now = time.monotonic() if now is None else now
+        with stage("apply changes"):
+            for name in self.removed:
+                self.rows.pop(name, None)
+                self.known.pop(name, None)
+                self.catalog.forget(os.path.join(self.directory, name))
+            removed, self.removed = len(self.removed), set()
+            self.dirty |= bool(removed)
+            increment("watch: files removed", removed)
+
+            due = {}
+            for name, (_, _, due_at) in list(self.pending.items()):
+                if due_at > now:
+                    continue
+                try:
+                    stat_result = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    self._note(name, now)
+                    continue
+                if signature(stat_result) != self.pending[name][0]:
+                    self._note(name, now)  # Still being written
+                else:
+                    due[name] = stat_result
+            read = self._read(due, now) if due else 0
+            self.catalog.commit()
+
+        # A batch copy rewrites the outputs when it is done, or every WRITE_DELAY seconds while it lasts
+        if self.dirty and (not self.pending or now - self.last_write >= WRITE_DELAY):
+            self.write_outputs()
+        return read, removed
+
+    def write_outputs(self):
+        """Rebuilds the metadata table, the descriptive statistics and the plots from the kept rows."""
+        with stage("write outputs"):
+            df = statistics_table([self.rows[name] for name in sorted(self.rows)])
+            stats = describe_statistics(df)
+            export_table(df, os.path.join(self.output_dir, METADATA_STATS_NAME))
+            write_descriptive_stats(stats, os.path.join(self.output_dir, DESCRIPTIVE_STATS_NAME))
+            if self.plots and len(df):
+                # Unchanged distributions keep their images (see edf_plots.render_plots)
+                visualize_statistics(df, self.output_dir)
+        self.dirty, self.last_write = False, time.monotonic()
+        return df, stats
+
+    def _timeout(self, now):
+        deadlines = [due_at for _, _, due_at in self.pending.values()]
+        if self.dirty:
+            deadlines.append(self.last_write + WRITE_DELAY)
+        return max(0.0, min([now + self.poll_interval] + deadlines) - now)
+
+    def step(self):
+        """Waits for the next changes and applies what is due; returns (files read, files removed)."""
+        changed = self.watcher.changes(self._timeout(time.monotonic()))
+        now = time.monotonic()
+        if changed is None:  # Events were lost: compare everything
+            changed = set(scan(self.directory)) | set(self.known) | set(self.pending)
+        for name in changed:
+            if is_edf(name):
+                self._note(name, now)
+        return self.apply(now)
+
+    def run(self, stop=None):
+        """Watches until stop (a threading.Event) is set or the user presses Ctrl+C."""
+        self.start()
+        print(f"Watching {self.directory}: {len(self.rows)} files in the table")
+        try:
+            while stop is None or not stop.is_set():
+                read, removed = self.step()
+                if read or removed:
+                    print(f"{datetime.now():%H:%M:%S} {read} files read, {removed} removed, "
+                          f"{len(self.rows)} in the table")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.dirty:
+                self.write_outputs()
+            self.close()
+
+@instrumented("watch_directory")
+def watch_directory(directory, settle=SETTLE_SECONDS, poll_interval=POLL_INTERVAL, plots=True, use_inotify=True,
+                    stop=None, **executor_options):
+    """
+    Keeps output/edf_metadata_stats, descriptive_stats.txt and the distribution plots of a
+    folder up to date while EDF files are added, changed or removed (see DirectoryWatch).
+    """
+    DirectoryWatch(directory, settle, poll_interval, plots, use_inotify, **executor_options).run(stop)
+
+def main(argv=None):
+    """Command line entry point: edf_watch.py DIRECTORY [--settle SECONDS] [--polling]."""
+    parser = argparse.ArgumentParser(description="Keeps the statistics of a folder up to date as EDF files arrive.")
+    parser.add_argument("directory", help="folder with EDF files")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help=f"seconds a file must stay unchanged before it is read (default: {SETTLE_SECONDS:g})")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help=f"seconds between scans when polling (default: {POLL_INTERVAL:g})")
+    parser.add_argument("--polling", action="store_true", help="scan the folder instead of using inotify")
+    parser.add_argument("--no-plots", action="store_true", help="do not redraw the distribution plots")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=None, help="worker count (default: per backend)")
+    parser.add_argument("--metrics", action="store_true", help="write output/metrics/watch_directory-<time>.json")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    options = dict(settle=args.settle, poll_interval=args.interval, plots=not args.no_plots,
+                   use_inotify=not args.polling, backend=args.backend, max_workers=args.workers)
+    if args.metrics:
+        with collect_metrics("watch_directory", os.path.join(args.directory, "output")):
+            watch_directory(args.directory, **options)
+    else:
+        watch_directory(args.directory, **options)
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,184 @@
 # edfinfo_chg.py
 import os
+import re
+from datetime import date
+from functools import partial
+from edf_executor import run_tasks
+from edf_header import FIXED_FIELDS, EDFHeaderError, parse_edf_header, read_header_bytes
+from edf_metrics import instrumented
+
+# The patient and recording identification fields are adjacent: bytes 8..168
+FIELD_LAYOUT = {name: (offset, length) for name, offset, length in FIXED_FIELDS}
+PATIENT_OFFSET, PATIENT_LENGTH = FIELD_LAYOUT['patient_id']
+RECORDING_OFFSET, RECORDING_LENGTH = FIELD_LAYOUT['recording_id']
+IDENTITY_OFFSET = PATIENT_OFFSET
+IDENTITY_LENGTH = PATIENT_LENGTH + RECORDING_LENGTH
+UNKNOWN = 'X'  # EDF+ marker for an unknown or hidden subfield
+BIRTHDATE_MODES = ('year', 'keep', 'remove')
+PATIENT_SEXES = ('M', 'F', UNKNOWN)
+HIDDEN_RECORDING = 'Startdate X X X X'
+MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+EDF_DATE = re.compile(r'(\d{2})-([A-Z]{3})-(\d{4})')
+
+def is_edf_date(text):
+    """True for an EDF+ dd-MMM-yyyy date such as 02-AUG-1951."""
+    match = EDF_DATE.fullmatch(text)
+    if match is None or match.group(2) not in MONTHS:
+        return False
+    try:
+        date(int(match.group(3)), MONTHS.index(match.group(2)) + 1, int(match.group(1)))
+    except ValueError:
+        return False  # E.g. 31-FEB-2000
+    return True
+
+def anonymize_patient_field(text, birthdate='year'):
+    """
+    Returns an anonymized EDF+ patient field: 'X <sex> <birthdate> X'.
+
+    The patient code, name and additional subfields are hidden; the sex is kept. The
+    birthdate is kept as is, reduced to January 1st of its year, or hidden, depending on
+    birthdate. Sex and birthdate are kept only if they are valid EDF+ values (M, F or X;
+    dd-MMM-yyyy or X); any other field is free text and is hidden completely.
+    """
+    parts = text.rstrip().split(' ')
+    if len(parts) < 4:
+        return UNKNOWN
+    sex, born = parts[1], parts[2]
+    if sex not in PATIENT_SEXES or not (born == UNKNOWN or is_edf_date(born)):
+        return UNKNOWN
+    if birthdate == 'remove':
+        born = UNKNOWN
+    elif birthdate == 'year' and born != UNKNOWN:
+        born = '01-JAN-' + born[7:]
+    return ' '.join((UNKNOWN, sex, born, UNKNOWN))
+
+def anonymize_recording_field(text):
+    """
+    Returns an anonymized EDF+ recording field: 'Startdate <date> X X <equipment>'.
+
+    The start date (which MNE uses for the 4-digit year) and the equipment are kept; the
+    admin code, technician and additional subfields are hidden. Fields that do not start
+    with 'Startdate' and a valid dd-MMM-yyyy date (or X) are free text and become
+    'Startdate X X X X'.
+    """
+    parts = text.rstrip().split(' ')
+    if len(parts) < 5 or parts[0] != 'Startdate' or not (parts[1] == UNKNOWN or is_edf_date(parts[1])):
+        return HIDDEN_RECORDING
+    return ' '.join(('Startdate', parts[1], UNKNOWN, UNKNOWN, parts[4]))
+
+def _identity_bytes(patient, recording):
+    """Encodes both fields, space padded, as the 160 bytes stored at IDENTITY_OFFSET."""
+    return (patient.ljust(PATIENT_LENGTH)[:PATIENT_LENGTH] +
+            recording.ljust(RECORDING_LENGTH)[:RECORDING_LENGTH]).encode('ascii', errors='replace')
+
+def _pread(fd, length, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, length)
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(fd, data, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+def verify_identity_change(before, after, file_path):
+    """Checks that only the identity bytes changed and that the new header still parses the same."""
+    end = IDENTITY_OFFSET + IDENTITY_LENGTH
+    if len(before) != len(after) or before[:IDENTITY_OFFSET] != after[:IDENTITY_OFFSET] or before[end:] != after[end:]:
+        raise EDFHeaderError(f"Header bytes outside the patient/recording fields changed in {file_path}")
+    old, new = parse_edf_header(before, file_path), parse_edf_header(after, file_path)
+    if (old.start_datetime, old.n_records, old.record_duration, old.channels) != \
+            (new.start_datetime, new.n_records, new.record_duration, new.channels):
+        raise EDFHeaderError(f"Anonymized header of {file_path} no longer parses the same")
+
+def plan_anonymization(header_bytes, file_path='', birthdate='year'):
+    """
+    Works out the anonymized fields for raw header bytes.
+
+    Returns (result, old_identity, new_identity): the result dict of anonymize_edf and
+    the 160 bytes at IDENTITY_OFFSET before and after.
+    """
+    if birthdate not in BIRTHDATE_MODES:
+        raise ValueError(f"Unknown birthdate mode {birthdate!r}, expected one of {BIRTHDATE_MODES}")
+    parse_edf_header(header_bytes, file_path)
+    old_identity = header_bytes[IDENTITY_OFFSET:IDENTITY_OFFSET + IDENTITY_LENGTH]
+    patient = old_identity[:PATIENT_LENGTH].decode('latin-1')
+    recording = old_identity[PATIENT_LENGTH:].decode('latin-1')
+    new_identity = _identity_bytes(anonymize_patient_field(patient, birthdate), anonymize_recording_field(recording))
+    result = {
+        'file': file_path,
+        'patient': (patient.rstrip(), new_identity[:PATIENT_LENGTH].decode('ascii').rstrip()),
+        'recording': (recording.rstrip(), new_identity[PATIENT_LENGTH:].decode('ascii').rstrip()),
+        'changed': new_identity != old_identity,
+    }
+    return result, old_identity, new_identity
+
+def anonymize_edf(edf_file_path, birthdate='year', dry_run=False):
+    """
+    Anonymizes the patient and recording fields of one EDF file in place.
+
+    Only the 160 bytes of the two fields are written, with a single positional write.
+    The header is read back and re-parsed afterwards; if anything else changed, the
+    original bytes are restored and EDFHeaderError is raised. With dry_run nothing is
+    written. Returns a dict with the old and new field values and whether they changed.
+    """
+    before = read_header_bytes(edf_file_path)
+    result, old_identity, new_identity = plan_anonymization(before, edf_file_path, birthdate)
+    if dry_run or not result['changed']:
+        return result
+
+    fd = os.open(edf_file_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+    try:
+        if _pread(fd, IDENTITY_LENGTH, IDENTITY_OFFSET) != old_identity:
+            raise EDFHeaderError(f"{edf_file_path} changed while it was being anonymized")
+        _pwrite(fd, new_identity, IDENTITY_OFFSET)
+        after = _pread(fd, len(before), 0)
+        try:
+            verify_identity_change(before, after, edf_file_path)
+        except EDFHeaderError:
+            _pwrite(fd, old_identity, IDENTITY_OFFSET)
+            raise
+    finally:
+        os.close(fd)
+    return result
 
 def replace_patient_name_in_edf(edf_file_path):
     """
-    Replaces the patient name in the EDF file with underscores (_) of the same length.
-    The EDF file format has a fixed-length field for patient name at offset 8 (8th byte).
-    """
-    # Open the file in read-write mode (binary mode)
-    with open(edf_file_path, 'r+b') as f:
-        f.seek(8)  # Move to the start of the patientname field (8th byte)
-        patientname = f.read(80).decode('ascii')  # Read the current patientname field
-
-        # Split the patientname field into parts
-        parts = patientname.split(' ', 3)  # Split by spaces, but no more than 3 times
-        if len(parts) >= 3:
-            # Keep the first three parts (UUID, gender, date of birth)
-            new_patientname = ' '.join(parts[:3])
-            # Replace the patient name with underscores (_) of the same length
-            name_to_replace = parts[3].split('Startdate')[0]  # Remove "Startdate" and everything after
-            new_patientname += ' ' + ('_' * len(name_to_replace))  # Replace the name with '_'
-            # Add the remaining part (if any)
-            if 'Startdate' in parts[3]:
-                new_patientname += ' ' + parts[3].split('Startdate', 1)[1]
-            # Pad to 80 characters
-            new_patientname = new_patientname.ljust(80)
-        else:
-            # If the structure does not match the expected format, leave the field as is
-            new_patientname = patientname
-
-        # Write the new patientname field
-        f.seek(8)
-        f.write(new_patientname.encode('ascii'))
-
-input_directory = input("Enter the path to the directory containing EDF files: ")
-
-if not os.path.isdir(input_directory):
-    print("The specified directory does not exist.")
-else:
-    edf_files = [f for f in os.listdir(input_directory) if f.endswith('.edf')]
-    if not edf_files:
-        print("There are no EDF files in the directory.")
+    Hides the patient name (and code) in an EDF file; the birthdate and sex are kept.
+    """
+    return anonymize_edf(edf_file_path, birthdate='keep')
+
+def format_diff(result):
+    """Formats the field changes of one anonymize_edf result as a diff."""
+    lines = [result['file']]
+    for field in ('patient', 'recording'):
+        old, new = result[field]
+        if old != new:
+            lines.append(f"  - {field}: {old!r}")
+            lines.append(f"  + {field}: {new!r}")
+    return '\n'.join(lines)
+
+@instrumented("anonymize_directory")
+def anonymize_directory(directory, birthdate='year', dry_run=False, **executor_options):
+    """Anonymizes all EDF files in a directory on the worker pool; returns the per-file results."""
+    edf_files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.edf')]
+    task = partial(anonymize_edf, birthdate=birthdate, dry_run=dry_run)
+    results = [result for _, result in run_tasks(task, edf_files, desc="Anonymizing files", **executor_options)]
+    for result in results:
+        if result['changed']:
+            print(format_diff(result))
+    changed = sum(result['changed'] for result in results)
+    print(f"{'Files to change' if dry_run else 'Files anonymized'}: {changed} of {len(edf_files)}")
+    return results
+
+if __name__ == "__main__":
+    input_directory = input("Enter the path to the directory containing EDF files: ")
+
+    if not os.path.isdir(input_directory):
+        print("The specified directory does not exist.")
     else:
-        for file_name in edf_files:
-            edf_file_path = os.path.join(input_directory, file_name)
-            try:
-                replace_patient_name_in_edf(edf_file_path)
-                print(f"File {file_name} processed.")
-            except Exception as e:
-                print(f"Error processing file {file_name}: {e}")
-
-        # Check the last processed file
-        last_file = edf_files[-1]
-        edf_file_path = os.path.join(input_directory, last_file)
-        with open(edf_file_path, 'rb') as f:
-            f.seek(8)
-            patientname = f.read(80).decode('ascii').strip()
-            print(f"\nInformation about the last processed file ({last_file}):")
-            print(f"Patient name: {patientname}")
\ No newline at end of file
+        mode = input(f"Birthdate handling {BIRTHDATE_MODES} [year]: ").strip() or 'year'
+        dry_run = input("Dry run (only show the changes)? [y/N]: ").strip().lower() == 'y'
+        anonymize_directory(input_directory, mode, dry_run)
@@ -0,0 +1,175 @@
+# eeg_features.py
+import os
+import json
+import numpy as np
+from functools import partial
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas import DataFrame
+from edf_catalog import EDFCatalog
+from edf_dubl_seek import DEFAULT_HASH_ALGORITHM, new_hash, signal_signature
+from edf_events import stim_channels
+from edf_executor import run_tasks
+from edf_header import read_edf_header
+from edf_metrics import increment
+from edf_signal import EDFSignals
+
+BAND_POWER_NAME = 'edf_band_power.csv'
+BANDS = {
+    'delta': (1.0, 4.0),
+    'theta': (4.0, 8.0),
+    'alpha': (8.0, 13.0),
+    'beta': (13.0, 30.0),
+    'gamma': (30.0, 45.0),
+}
+WINDOW_SECONDS = 4.0  # Welch segment length (0.25 Hz resolution)
+OVERLAP = 0.5
+CHUNK_BYTES = 16 * 1024 * 1024
+BAND_POWER_COLUMNS = (['file_name', 'channel', 'sfreq', 'n_segments', 'total_power']
+                      + [f'{band}_power' for band in BANDS] + [f'{band}_relative' for band in BANDS])
+
+class WelchAccumulator:
+    """
+    Welch PSD of one channel, fed chunk by chunk.
+
+    Segments start at multiples of the step in the whole signal, exactly as in
+    scipy.signal.welch (Hann window, constant detrend, density scaling, mean average);
+    only the samples of an unfinished segment are carried to the next chunk.
+    """
+
+    def __init__(self, sfreq, nperseg):
+        self.sfreq = sfreq
+        self.nperseg = nperseg
+        self.step = nperseg - int(nperseg * OVERLAP)
+        self.window = np.hanning(nperseg + 1)[:-1]  # Periodic Hann window, as scipy's default
+        self.power_sum = np.zeros(nperseg // 2 + 1)
+        self.n_segments = 0
+        self.carry = np.empty(0)
+
+    def update(self, values):
+        """Adds the next samples (physical units) of the channel."""
+        buffer = np.concatenate((self.carry, values)) if len(self.carry) else values
+        if len(buffer) < self.nperseg:
+            self.carry = buffer
+            return
+        frames = sliding_window_view(buffer, self.nperseg)[::self.step]
+        frames = (frames - frames.mean(axis=1, keepdims=True)) * self.window
+        self.power_sum += (np.abs(np.fft.rfft(frames, axis=1)) ** 2).sum(axis=0)
+        self.n_segments += len(frames)
+        self.carry = buffer[len(frames) * self.step:].copy()
+
+    def psd(self):
+        """Returns (frequencies, one-sided power spectral density)."""
+        psd = self.power_sum / max(self.n_segments, 1) / (self.sfreq * (self.window ** 2).sum())
+        psd[1:] *= 2
+        if self.nperseg % 2 == 0:
+            psd[-1] /= 2  # The Nyquist bin has no mirrored half
+        return np.fft.rfftfreq(self.nperseg, 1 / self.sfreq), psd
+
+def band_powers(freqs, psd, bands=BANDS):
+    """Absolute power per band and total power over all bands, integrated over PSD bins."""
+    resolution = freqs[1] - freqs[0] if len(freqs) > 1 else 0.0
+    low, high = min(b[0] for b in bands.values()), max(b[1] for b in bands.values())
+    total = float(psd[(freqs >= low) & (freqs < high)].sum() * resolution)
+    powers = {}
+    for band, (band_low, band_high) in bands.items():
+        # Bands above the Nyquist frequency cannot be measured
+        powers[band] = float(psd[(freqs >= band_low) & (freqs < band_high)].sum() * resolution) \
+            if band_high <= freqs[-1] else float('nan')
+    return total, powers
+
+def file_band_power(file_path, hash_algorithm=DEFAULT_HASH_ALGORITHM, chunk_bytes=CHUNK_BYTES):
+    """
+    Computes band power per channel and the file's signal digest in one pass.
+
+    The digest equals edf_dubl_seek.calculate_signal_hash, so it serves as the content
+    signature for the feature cache. Returns (digest, rows).
+    """
+    header = read_edf_header(file_path)
+    hash_func = new_hash(hash_algorithm)
+    hash_func.update(signal_signature(header).encode())
+
+    skip = set(stim_channels(header))
+    channels = [(i, name) for i, name in zip([i for i, ch in enumerate(header.channels) if not ch.is_annotation],
+                                             header.ch_names) if i not in skip]
+    accumulators = {}
+    for i, _ in channels:
+        channel = header.channels[i]
+        n_samples = header.available_records * channel.samples_per_record
+        nperseg = min(int(round(WINDOW_SECONDS * channel.sfreq)), n_samples)
+        if nperseg >= 2:
+            accumulators[i] = WelchAccumulator(channel.sfreq, nperseg)
+
+    chunk_records = max(1, chunk_bytes // max(header.record_bytes, 1))
+    with EDFSignals(file_path, header) as signals:
+        for start in range(0, header.available_records, chunk_records):
+            hash_func.update(signals.records[start:start + chunk_records])
+            for i, accumulator in accumulators.items():
+                accumulator.update(signals.physical(i, start, start + chunk_records))
+
+    rows = []
+    for i, name in channels:
+        if i not in accumulators:
+            continue
+        total, powers = band_powers(*accumulators[i].psd())
+        row = {'file_name': os.path.basename(file_path), 'channel': name, 'sfreq': header.channels[i].sfreq,
+               'n_segments': accumulators[i].n_segments, 'total_power': total}
+        for band, power in powers.items():
+            row[f'{band}_power'] = power
+            row[f'{band}_relative'] = power / total if total > 0 else float('nan')
+        rows.append(row)
+    return hash_func.hexdigest(), rows
+
+def _feature_kind():
+    """Cache key of the feature parameters; changing them invalidates cached results."""
+    return 'bandpower-' + json.dumps({'bands': BANDS, 'window': WINDOW_SECONDS, 'overlap': OVERLAP}, sort_keys=True)
+
+def cached_features(file_paths, compute, kind, catalog=None, hash_algorithm=DEFAULT_HASH_ALGORITHM, desc=None,
+                    **executor_options):
+    """
+    Returns {path: rows} of a per-file feature, cached in the catalog by signal content.
+
+    compute(file_path, hash_algorithm) returns (signal digest, rows) from one pass over
+    the file. A file whose signal digest is already known (from an earlier run or the
+    duplicate search) and whose features of this kind are cached is not read at all.
+    The rest run on the worker pool.
+    """
+    if not file_paths:
+        return {}
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = EDFCatalog.for_directory(os.path.dirname(file_paths[0]))
+    digest_key = f"signal-{hash_algorithm}"
+    results, stats = {}, {}
+    for file_path in file_paths:
+        stat_result = os.stat(file_path)
+        digest = catalog.get_digest(file_path, digest_key, stat_result)
+        cached = catalog.get_features(digest, kind) if digest else None
+        if cached is not None:
+            results[file_path] = [dict(row, file_name=os.path.basename(file_path)) for row in cached]
+        else:
+            stats[file_path] = stat_result
+    increment("feature cache: hits", len(results))
+    increment("feature cache: misses", len(stats))
+
+    for file_path, (digest, rows) in run_tasks(partial(compute, hash_algorithm=hash_algorithm), list(stats),
+                                               desc=desc, **executor_options):
+        catalog.store_digest(file_path, digest_key, stats[file_path], digest)
+        catalog.store_features(digest, kind, rows)
+        results[file_path] = rows
+
+    catalog.commit()
+    if own_catalog:
+        catalog.close()
+    return results
+
+def generate_band_power(file_paths, catalog=None, hash_algorithm=DEFAULT_HASH_ALGORITHM, **executor_options):
+    """
+    Computes delta..gamma absolute and relative band power per channel for many files.
+
+    Results are cached by signal content (see cached_features). Returns a DataFrame with
+    one row per file and channel.
+    """
+    results = cached_features(file_paths, file_band_power, _feature_kind(), catalog, hash_algorithm,
+                              desc="Computing band power", **executor_options)
+    rows = [row for file_path in file_paths for row in results.get(file_path, [])]
+    return DataFrame(rows, columns=BAND_POWER_COLUMNS)
@@ -1,10 +1,15 @@
 # eeg_statistics.py
 import os
-from collections import defaultdict
 from dateutil.parser import parse
-from pandas import DataFrame
-from seaborn import countplot, histplot
-from matplotlib.pyplot import figure, title, savefig, close
+from pandas import DataFrame, to_numeric
+from edf_plots import visualize_statistics
+from edf_quality import CHANNEL_STATS_NAME, QUALITY_COLUMNS, file_channel_quality, quality_kind
+from eeg_features import cached_features
+
+METADATA_STATS_NAME = 'edf_metadata_stats'
+DESCRIPTIVE_STATS_NAME = 'descriptive_stats.txt'
+STATISTICS_COLUMNS = ['file_name', 'sex', 'age', 'duration_minutes']
+DISPLAY_COLUMNS = ['sex', 'age', 'duration_minutes']  # What describe_statistics needs
 
 def calculate_age(birthdate, recording_date):
     """Calculates the age at the time of recording."""
@@ -23,55 +28,57 @@ def calculate_age(birthdate, recording_date):
         print(f"Error calculating age: {e}")
         return None
 
-def generate_statistics(metadata_list):
-    """Generates descriptive statistics from metadata."""
-    stats = defaultdict(list)
-    for metadata in metadata_list:
-        subject_info = metadata.get('subject_info', {})
-        stats['file_name'].append(metadata['file_name'])
-        stats['sex'].append(
-            'Male' if subject_info.get('sex') == 1 else 'Female' if subject_info.get('sex') == 2 else 'Unknown')
+def statistics_row(metadata):
+    """The metadata table row of one file."""
+    subject_info = metadata.get('subject_info', {})
+    sex = subject_info.get('sex')
+    birthdate = subject_info.get('birthday')
+    recording_date = metadata.get('meas_date')
+    age = calculate_age(birthdate, recording_date) if birthdate and recording_date else None
+    return {
+        'file_name': metadata['file_name'],
+        'sex': 'Male' if sex == 1 else 'Female' if sex == 2 else 'Unknown',
+        'age': min(age, 60) if age is not None else None,  # Limit age to 60 years
+        'duration_minutes': metadata['duration'] / 60,
+    }
 
-        birthdate = subject_info.get('birthday')
-        recording_date = metadata.get('meas_date')
-        if birthdate and recording_date:
-            age = calculate_age(birthdate, recording_date)
-            if age is not None:
-                stats['age'].append(min(age, 60))  # Limit age to 60 years
+def statistics_table(rows):
+    """The metadata table of statistics_row rows; age stays numeric (NaN) even if no file has a birthdate."""
+    df = DataFrame(rows, columns=STATISTICS_COLUMNS)
+    df['age'] = to_numeric(df['age'], errors='coerce').astype('float64')
+    return df
 
-        stats['duration_minutes'].append(metadata['duration'] / 60)
+def generate_statistics(metadata_list):
+    """Generates descriptive statistics from metadata."""
+    df = statistics_table([statistics_row(metadata) for metadata in metadata_list])
+    return df, describe_statistics(df)
 
-    df = DataFrame(stats)
-    descriptive_stats = {
+def describe_statistics(df):
+    """Descriptive statistics of a metadata table."""
+    return {
         'sex_distribution': df['sex'].value_counts(),
         'age_distribution': df['age'].describe() if 'age' in df.columns else None,
         'duration_stats': df['duration_minutes'].describe()
     }
-    return df, descriptive_stats
-
-def visualize_statistics(df, output_dir):
-    """Visualizes the statistics."""
-    os.makedirs(output_dir, exist_ok=True)
 
-    if 'sex' in df.columns:
-        figure(figsize=(8, 6))
-        countplot(data=df, x='sex')
-        title('Sex Distribution')
-        savefig(os.path.join(output_dir, 'sex_distribution.png'))
-        close()
+def write_descriptive_stats(stats, path):
+    """Writes the descriptive statistics as the text summary EDFProcessor exports."""
+    with open(path, 'w') as f:
+        f.write("Descriptive Statistics:\n")
+        f.write(f"Sex Distribution:\n{stats['sex_distribution']}\n")
+        f.write(f"Age Distribution:\n{stats['age_distribution']}\n")
+        f.write(f"Duration Statistics:\n{stats['duration_stats']}\n")
+    return path
 
-    if 'age' in df.columns:
-        age_data = df[df['age'].apply(lambda x: isinstance(x, (int, float)))]
-        if not age_data.empty:
-            figure(figsize=(8, 6))
-            histplot(data=age_data, x='age', bins=20, kde=True)
-            title('Age Distribution')
-            savefig(os.path.join(output_dir, 'age_distribution.png'))
-            close()
+def generate_channel_statistics(file_paths, catalog=None, **executor_options):
+    """
+    Computes per-channel signal quality statistics for many files in parallel.
 
-    if 'duration_minutes' in df.columns:
-        figure(figsize=(8, 6))
-        histplot(data=df, x='duration_minutes', bins=20, kde=True)
-        title('Recording Duration (minutes)')
-        savefig(os.path.join(output_dir, 'duration_distribution.png'))
-        close()
\ No newline at end of file
+    Results are cached in the catalog by signal content (see eeg_features.cached_features),
+    so files seen before are not read again. Returns a long-format DataFrame with one row
+    per file and channel (see edf_quality).
+    """
+    results = cached_features(file_paths, file_channel_quality, quality_kind(), catalog,
+                              desc="Computing channel statistics", **executor_options)
+    rows = [row for file_path in file_paths for row in results.get(file_path, [])]
+    return DataFrame(rows, columns=QUALITY_COLUMNS)
@@ -1,8 +1,24 @@
 # generate_patient_table.py
 import csv
 import os
-from tqdm import tqdm
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
 from transliterate import translit
+from edf_executor import run_tasks
+from edf_header import read_edf_header
+from edf_metrics import instrumented
+
+PATIENT_TABLE_COLUMNS = ["Patient Name", "Birthdate", "Sex", "Recordings", "First Recording", "Last Recording", "Files"]
+BLOCK_PREFIX = 3  # Letters of the phonetic surname key that must agree
+SIMILARITY = 0.85  # Minimal SequenceMatcher ratio of two phonetic name tokens
+CYRILLIC = re.compile('[Ѐ-ӿ]')
+# Spellings that different Latin transliterations of the same Russian name use
+PHONETIC_REPLACEMENTS = (('shch', 'sh'), ('sch', 'sh'), ('kh', 'h'), ('tz', 'c'), ('ts', 'c'), ('yu', 'u'),
+                         ('ju', 'u'), ('ya', 'a'), ('ja', 'a'), ('ye', 'e'), ('yo', 'e'), ('jo', 'e'), ('ck', 'k'),
+                         ('w', 'v'), ('x', 'ks'), ('y', 'i'), ('j', 'i'))
+IOTATED_START = re.compile('^i(?=[aeu])')  # 'Iurii', 'Iana': the GOST spelling of a leading Yu, Ya, Ye
 
 def extract_patient_name(filename):
     """Extracts the patient's name from the file name."""
@@ -11,31 +27,240 @@ def extract_patient_name(filename):
         return " ".join(parts[:3])
     raise ValueError(f"Invalid file name: {filename}")
 
-def generate_patient_table(directory, output_file):
-    """Creates a CSV table with unique patient names in Cyrillic."""
-    files = [f for f in os.listdir(directory) if f.endswith(".edf")]
-    patient_names = set()
+@lru_cache(maxsize=None)
+def to_latin(text):
+    """Transliterates Cyrillic text to Latin; the same names recur, so results are memoized."""
+    return translit(text, 'ru', reversed=True) if CYRILLIC.search(text) else text
+
+@lru_cache(maxsize=None)
+def to_cyrillic(text):
+    """Transliterates Latin text to Cyrillic (memoized)."""
+    return text if CYRILLIC.search(text) else translit(text, 'ru')
 
-    for file in tqdm(files, desc="Processing files", unit="file"):
+def _decode(text):
+    """Header text is decoded as latin-1; names written in cp1251 are decoded again."""
+    if any('\xc0' <= char <= '\xff' for char in text):
         try:
-            name = extract_patient_name(file)
-            # Transliterate the name from Latin to Cyrillic
-            translated_name = translit(name, 'ru', reversed=True)
-            patient_names.add(translated_name)
-        except Exception as e:
-            print(f"Error processing file {file}: {e}")
+            return text.encode('latin-1').decode('cp1251')
+        except UnicodeError:
+            pass
+    return text
 
-    sorted_names = sorted(patient_names)
+@lru_cache(maxsize=None)
+def phonetic_key(token):
+    """Reduces a Latin name token to a key shared by its transliteration variants."""
+    key = IOTATED_START.sub('', re.sub(r"[^a-z]", '', token.lower()))
+    for old, new in PHONETIC_REPLACEMENTS:
+        key = key.replace(old, new)
+    return re.sub(r'(.)\1+', r'\1', key)
 
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, output_file)
+def name_tokens(name):
+    """Normalized phonetic tokens of a name; 'Ivanov_Ivan_I.' gives ('ivanov', 'ivan', 'i')."""
+    return tuple(key for key in (phonetic_key(token) for token in re.split(r"[\s_.,-]+", to_latin(name))) if key)
+
+def patient_record(file_path, header):
+    """Returns the identity of one recording: name, name tokens, birthdate, sex, start."""
+    patient = header.patient
+    if header.is_edf_plus:
+        name = patient.name if patient.name != 'X' else ''
+    else:
+        name = header.patient_id if header.patient_id != 'X' else ''  # Plain EDF: the field is free text
+    name = _decode(name).replace('_', ' ').strip()
+    if not name:
+        try:
+            name = extract_patient_name(os.path.basename(file_path))
+        except ValueError:
+            name = ''
+    return {
+        'file': file_path,
+        'name': name,
+        'tokens': name_tokens(name),
+        'birthdate': patient.birthdate,
+        'sex': patient.sex if patient.sex in ('M', 'F') else '',
+        'start': header.meas_date,
+    }
+
+def _similar(a, b):
+    """SequenceMatcher ratio test, with its cheap upper bounds checked first."""
+    if a == b:
+        return True
+    matcher = SequenceMatcher(None, a, b)
+    return matcher.real_quick_ratio() >= SIMILARITY and matcher.quick_ratio() >= SIMILARITY and \
+        matcher.ratio() >= SIMILARITY
+
+def _tokens_match(short, long):
+    """Every token of the shorter name matches a distinct token of the longer one; initials match by letter."""
+    remaining = list(long)
+    for token in short:
+        for candidate in remaining:
+            if (len(token) == 1 or len(candidate) == 1) and token[0] == candidate[0] or _similar(token, candidate):
+                remaining.remove(candidate)
+                break
+        else:
+            return False
+    return True
+
+def same_patient(a, b):
+    """Whether two recordings (see patient_record) belong to the same patient."""
+    if a['birthdate'] and b['birthdate'] and a['birthdate'] != b['birthdate']:
+        return False
+    if a['sex'] and b['sex'] and a['sex'] != b['sex']:
+        return False
+    if not a['tokens'] or not b['tokens']:
+        return False
+    short, long = sorted((a['tokens'], b['tokens']), key=len)
+    # The surname (first token) has to match, the remaining tokens may be initials or missing
+    if not _similar(short[0], long[0]):
+        return False
+    return _tokens_match(sorted(short[1:], key=len, reverse=True), long[1:])  # Full names pick before initials
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def is_weak_identity(record):
+    """Undated or initials-only identities ('Ivanov I') fit several patients and must not link them."""
+    return record['birthdate'] is None or all(len(token) == 1 for token in record['tokens'][1:])
+
+def name_initials(record):
+    """Initials of the given names; names sharing none of them are not compared (see cluster_patients)."""
+    return frozenset(token[0] for token in record['tokens'][1:])
+
+def _index_add(index, i, initials):
+    for initial in initials or ('',):
+        index[initial].append(i)
 
+def _candidates(index, initials):
+    """Identities of an initials index that may be the same patient as a name with these initials."""
+    if not initials:  # A bare surname fits any given names
+        return list(dict.fromkeys(i for ids in index.values() for i in ids))
+    return list(dict.fromkeys(i for initial in (*initials, '') for i in index.get(initial, ())))
+
+def cluster_patients(records):
+    """
+    Groups recordings of the same patient; returns a list of lists of records.
+
+    Identical identities are merged first. The remaining distinct identities are
+    compared only within blocks that share the first BLOCK_PREFIX letters of the
+    phonetic surname, and inside a block only with the identities an index of given-name
+    initials returns (phonetic keys already fold transliteration variants, so two
+    spellings of one name start alike). Full identities are dated, so they are further
+    split by birthdate; a large block of one surname therefore costs about as much as
+    its patients with the same birthdate and initial, not the square of its size. Two
+    clusters merge only if every identity of one is the same patient as every identity
+    of the other, so links do not chain. Weak identities (see is_weak_identity) join a
+    cluster of full identities only when it is the only one they fit.
+    """
+    identities = defaultdict(list)
+    for record in records:
+        identities[(record['tokens'], record['birthdate'], record['sex'])].append(record)
+    keys = list(identities)
+    parents = list(range(len(keys)))
+    members = {i: [identities[key][0]] for i, key in enumerate(keys)}  # Root -> one record per identity
+    weak = [is_weak_identity(identities[key][0]) for key in keys]
+    initials = [name_initials(identities[key][0]) for key in keys]
+    strong_roots = {i for i in range(len(keys)) if not weak[i]}
+
+    def compatible(i, j):
+        return all(same_patient(a, b) for a in members[i] for b in members[j])
+
+    def union(i, j):
+        i, j = _find(parents, i), _find(parents, j)
+        parents[j] = i
+        members[i].extend(members.pop(j))
+        if j in strong_roots:
+            strong_roots.discard(j)
+            strong_roots.add(i)
+
+    blocks = defaultdict(list)
+    for i, (tokens, _, _) in enumerate(keys):
+        if tokens:
+            blocks[tokens[0][:BLOCK_PREFIX]].append(i)
+    for block in blocks.values():
+        dated = defaultdict(lambda: defaultdict(list))  # Birthdate -> initial -> full identities
+        full = defaultdict(list)  # Initial -> full identities of any birthdate
+        for i in block:
+            if weak[i]:
+                continue
+            for j in _candidates(dated[keys[i][1]], initials[i]):
+                if _find(parents, i) != _find(parents, j) and compatible(_find(parents, i), _find(parents, j)):
+                    union(i, j)
+            _index_add(dated[keys[i][1]], i, initials[i])
+            _index_add(full, i, initials[i])
+
+        # A weak identity that fits several patients stays on its own
+        weak_members = [i for i in block if weak[i]]
+        for i in weak_members:
+            matches = set()
+            for j in _candidates(dated.get(keys[i][1], {}) if keys[i][1] else full, initials[i]):
+                root = _find(parents, j)
+                if root not in matches and compatible(root, i):
+                    matches.add(root)
+                    if len(matches) > 1:
+                        break
+            if len(matches) == 1:
+                union(matches.pop(), i)
+        index = defaultdict(list)
+        for i in weak_members:
+            for j in _candidates(index, initials[i]):
+                root_i, root_j = _find(parents, i), _find(parents, j)
+                if root_i != root_j and not (root_i in strong_roots or root_j in strong_roots) and \
+                        compatible(root_i, root_j):
+                    union(i, j)
+            _index_add(index, i, initials[i])
+
+    clusters = defaultdict(list)
+    for i, key in enumerate(keys):
+        clusters[_find(parents, i)].extend(identities[key])
+    return list(clusters.values())
+
+def patient_rows(clusters):
+    """Builds one patient -> recordings row per cluster (see PATIENT_TABLE_COLUMNS)."""
+    rows = []
+    for records in clusters:
+        # The most complete of the most frequent spellings names the patient; Cyrillic spellings come first
+        names = Counter(record['name'] for record in records if record['name'])
+        name = max(names, key=lambda n: (bool(CYRILLIC.search(n)), len(name_tokens(n)), names[n], n)) if names else ''
+        starts = sorted(record['start'] for record in records if record['start'])
+        birthdates = {record['birthdate'] for record in records if record['birthdate']}
+        sexes = {record['sex'] for record in records if record['sex']}
+        rows.append([
+            to_cyrillic(name) if name else 'Unknown',
+            birthdates.pop().isoformat() if len(birthdates) == 1 else '',
+            sexes.pop() if len(sexes) == 1 else '',
+            len(records),
+            starts[0].strftime('%Y-%m-%d %H:%M:%S') if starts else '',
+            starts[-1].strftime('%Y-%m-%d %H:%M:%S') if starts else '',
+            '; '.join(sorted(os.path.basename(record['file']) for record in records)),
+        ])
+    return sorted(rows, key=lambda row: row[0])
+
+def write_patient_table(rows, output_path):
     with open(output_path, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
-        writer.writerow(["Patient Name"])
-        for name in sorted_names:
-            writer.writerow([name])
+        writer.writerow(PATIENT_TABLE_COLUMNS)
+        writer.writerows(rows)
+
+@instrumented("generate_patient_table")
+def generate_patient_table(directory, output_file, **executor_options):
+    """
+    Creates a CSV table of patients (names in Cyrillic) with their recordings.
+
+    Patients are identified from the header fields, not the file names, and spelling
+    variants of the same patient are merged. Returns the path of the table.
+    """
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".edf")]
+    records = [patient_record(file_path, header)
+               for file_path, header in run_tasks(read_edf_header, files, desc="Reading headers", **executor_options)]
+    rows = patient_rows(cluster_patients(records))
+
+    output_dir = os.path.join(directory, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, output_file)
+    write_patient_table(rows, output_path)
+    return output_path
 
 def main():
     """Main function to generate the patient table."""
@@ -45,8 +270,8 @@ def main():
     if not os.path.isdir(directory):
         print("The specified directory does not exist.")
     else:
-        generate_patient_table(directory, output_file)
-        print(f"The patient name table is saved to output/{output_file}.")
+        output_path = generate_patient_table(directory, output_file)
+        print(f"The patient table is saved to {output_path}.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
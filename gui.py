@@ -1,17 +1,8 @@
 import os
-import csv
 import logging
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
-from tqdm import tqdm
-from transliterate import translit
-from edf_cur import find_and_delete_corrupted_edf
-from edf_dubl_seek import delete_duplicates, find_duplicate_files
-from edf_rename import rename_edf_files
-from edf_time import find_edf_with_similar_start_time
-from main import analyze_directory, generate_statistics, visualize_statistics
-import mne
-import random
+from edf_gui_worker import OperationRunner, lazy_operation
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -19,7 +10,7 @@ class EDFApp:
     def __init__(self, root):
         self.root = root
         self.root.title("EDF File Manager")
-        self.root.geometry("800x500")
+        self.root.geometry("800x580")
         self.directory = ""
         self._setup_ui()
 
@@ -31,7 +22,8 @@ class EDFApp:
         buttons = [
             ("Open Folder", self.select_directory, "Select a folder containing EDF files"),
             ("Rename EDF", self.rename_files, "Rename EDF files based on metadata"),
-            ("Delete Corrupted", self.check_corrupted, "Delete corrupted EDF files"),
+            ("Check Corrupted", self.check_corrupted, "Verify EDF files and write a corruption report"),
+            ("Repair Truncated", self.repair_truncated, "Cut partial records and fix the record count (reversible)"),
             ("Delete Duplicates", self.find_duplicates, "Find and delete duplicate EDF files"),
             ("Find Similar", self.find_similar_time, "Find EDF files with similar start times"),
             ("Generate Statistics", self.generate_stats, "Generate statistics for EDF files"),
@@ -48,6 +40,8 @@ class EDFApp:
             self._create_tooltip(btn, tooltip)
 
         self.text_output = scrolledtext.ScrolledText(self.root, wrap=tk.WORD, width=90, height=20)
+        self.runner = OperationRunner(self.root, self.text_output)
+        self.runner.frame.pack(pady=5)
         self.text_output.pack(pady=10)
 
     def _create_tooltip(self, widget, text):
@@ -83,7 +77,7 @@ class EDFApp:
 
     def rename_files(self):
         """Rename EDF files."""
-        self._execute_operation("file renaming process", rename_edf_files)
+        self._execute_operation("file renaming process", lazy_operation("edf_rename", "rename_edf_files"))
 
     def find_duplicates(self):
         """Find and delete duplicates."""
@@ -91,7 +85,12 @@ class EDFApp:
 
     def check_corrupted(self):
         """Check for corrupted files."""
-        self._execute_operation("corrupted file check process", find_and_delete_corrupted_edf)
+        self._execute_operation("corrupted file check process",
+                                lazy_operation("edf_cur", "find_and_delete_corrupted_edf"))
+
+    def repair_truncated(self):
+        """Repair truncated files."""
+        self._execute_operation("truncated file repair process", lazy_operation("edf_cur", "repair_truncated_files"))
 
     def generate_stats(self):
         """Generate statistics."""
@@ -99,7 +98,8 @@ class EDFApp:
 
     def find_similar_time(self):
         """Find files with similar start times."""
-        self._execute_operation("similar time search process", find_edf_with_similar_start_time)
+        self._execute_operation("similar time search process",
+                                lazy_operation("edf_time", "find_edf_with_similar_start_time"))
 
     def generate_patient_table(self):
         """Generate patient table."""
@@ -118,154 +118,107 @@ class EDFApp:
         self._execute_operation("EDF file information reading process", self._read_edf_info_wrapper)
 
     def _execute_operation(self, operation_name, operation_func):
-        """Execute an operation with error handling."""
+        """Execute an operation on the worker thread."""
         if not self.directory:
             messagebox.showwarning("Error", "Directory not selected.")
             return
-
-        self.text_output.insert(tk.END, f"Started {operation_name}...\n")
-        self.text_output.update_idletasks()
-
-        try:
-            result = operation_func(self.directory)
-            self.text_output.insert(tk.END, f"{operation_name.capitalize()} completed.\n")
-            if result:
-                self.text_output.insert(tk.END, f"Result: {result}\n")
-        except Exception as e:
-            logging.error(f"Error during {operation_name}: {e}")
-            self.text_output.insert(tk.END, f"Error: {e}\n")
-            messagebox.showerror("Error", f"An error occurred: {e}")
+        self.runner.run(operation_name, operation_func, self.directory)
 
     def _find_and_delete_duplicates(self, directory):
         """Find and delete duplicate files."""
+        from edf_dubl_seek import delete_duplicates, find_duplicate_files
         duplicates = find_duplicate_files(directory)
         if duplicates:
-            self.text_output.insert(tk.END, "Duplicate files found:\n")
+            self.runner.write("Duplicate files found:\n")
             for hash_val, paths in duplicates.items():
-                self.text_output.insert(tk.END, f"Hash: {hash_val}\n")
+                self.runner.write(f"Hash: {hash_val}\n")
                 for path in paths:
-                    self.text_output.insert(tk.END, f"  {path}\n")
+                    self.runner.write(f"  {path}\n")
             delete_duplicates(duplicates)
             return "Duplicates deleted."
         return "No duplicates found."
 
     def _generate_statistics_wrapper(self, directory):
         """Generate and display statistics."""
+        from edf_columnar import export_table, load_table
+        from eeg_statistics import (CHANNEL_STATS_NAME, DISPLAY_COLUMNS, METADATA_STATS_NAME, describe_statistics,
+                                    generate_channel_statistics)
+        from main import analyze_directory, generate_statistics, visualize_statistics
         output_directory = os.path.join(directory, "output")
         os.makedirs(output_directory, exist_ok=True)
 
         try:
             metadata_list = analyze_directory(directory)
-            df, stats = generate_statistics(metadata_list)
-            self._display_statistics(stats)
-            output_csv_path = os.path.join(output_directory, 'edf_metadata_stats.csv')
-            df.to_csv(output_csv_path, index=False)
+            df, _ = generate_statistics(metadata_list)
+            base_path = os.path.join(output_directory, METADATA_STATS_NAME)
+            output_path = export_table(df, base_path)
+            self._display_statistics(describe_statistics(load_table(base_path, DISPLAY_COLUMNS)))
+            file_paths = [os.path.join(directory, metadata['file_name']) for metadata in metadata_list]
+            export_table(generate_channel_statistics(file_paths),
+                         os.path.join(output_directory, os.path.splitext(CHANNEL_STATS_NAME)[0]))
             visualize_statistics(df, output_directory)
-            return f"Statistics saved to {output_csv_path}"
+            return f"Statistics saved to {output_path}"
         except Exception as e:
             logging.error(f"Error during statistics generation: {e}")
             raise
 
     def _generate_patient_table_wrapper(self, directory):
         """Generate patient table."""
-        output_file = "patient_table.csv"
-        output_directory = os.path.join(directory, "output")
-        os.makedirs(output_directory, exist_ok=True)
-        output_path = os.path.join(output_directory, output_file)
-
-        try:
-            files = [f for f in os.listdir(directory) if f.endswith(".edf")]
-            patient_names = set()
-
-            for file in tqdm(files, desc="Processing files", unit="file"):
-                try:
-                    name = self._extract_patient_name(file)
-                    translated_name = translit(name, 'ru')
-                    patient_names.add(translated_name)
-                except Exception as e:
-                    self.text_output.insert(tk.END, f"Error processing file {file}: {e}\n")
-
-            sorted_names = sorted(patient_names)
-
-            with open(output_path, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["Patient Name"])
-                for name in sorted_names:
-                    writer.writerow([name])
-
-            return f"Patient table saved to {output_path}"
-        except Exception as e:
-            logging.error(f"Error during patient table generation: {e}")
-            raise
+        from generate_patient_table import generate_patient_table
+        output_path = generate_patient_table(directory, "patient_table.csv")
+        return f"Patient table saved to {output_path}"
 
     def _randomize_filenames_wrapper(self, directory):
         """Randomize file names."""
-        files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
-        used_codes = set()
-        name_mapping = []
-
-        for old_name in files:
-            new_name = self._generate_unique_code(used_codes) + os.path.splitext(old_name)[1]
-            os.rename(os.path.join(directory, old_name), os.path.join(directory, new_name))
-            name_mapping.append((old_name, new_name))
-
-        output_csv_path = os.path.join(directory, "name_mapping.csv")
-        with open(output_csv_path, mode='w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Old Name', 'New Name'])
-            writer.writerows(name_mapping)
-
+        from edf_rnd_name import randomize_filenames
+        output_csv_path = randomize_filenames(directory)
         return f"File names randomized. Correspondence table saved to {output_csv_path}"
 
     def _remove_patient_info_wrapper(self, directory):
         """Remove patient information from EDF files."""
-        files = [f for f in os.listdir(directory) if f.endswith(".edf")]
-        for file in tqdm(files, desc="Processing files", unit="file"):
-            try:
-                self._remove_patient_info(file)
-                self.text_output.insert(tk.END, f"Patient information removed from file {file}\n")
-            except Exception as e:
-                logging.error(f"Error removing patient information from file {file}: {e}")
-                self.text_output.insert(tk.END, f"Error processing file {file}: {e}\n")
+        from edfinfo_chg import anonymize_directory
+        results = anonymize_directory(directory)
+        return f"Patient information removed from {sum(result['changed'] for result in results)} files."
 
     def _read_edf_info_wrapper(self, directory):
         """Read and display information from EDF file."""
         files = [f for f in os.listdir(directory) if f.endswith(".edf")]
+        read = 0
         for file in files:
             try:
-                info = self._read_edf_info(file)
-                self.text_output.insert(tk.END, f"Information from file {file}:\n{info}\n")
+                info = self._read_edf_info(os.path.join(directory, file))
+                self.runner.write(f"{info}\n")
+                read += 1
             except Exception as e:
                 logging.error(f"Error reading information from file {file}: {e}")
-                self.text_output.insert(tk.END, f"Error processing file {file}: {e}\n")
-
-    def _generate_unique_code(self, used_codes):
-        """Generate a unique 6-digit numeric code."""
-        while True:
-            code = ''.join(random.choices('0123456789', k=6))
-            if code not in used_codes:
-                used_codes.add(code)
-                return code
-
-    def _extract_patient_name(self, file):
-        """Extract patient name from EDF file."""
-        # Logic to extract patient name
-        pass
-
-    def _remove_patient_info(self, file):
-        """Remove patient information from EDF file."""
-        # Logic to remove patient information
-        pass
-
-    def _read_edf_info(self, file):
+                self.runner.write(f"Error processing file {file}: {e}\n")
+        return f"Information read from {read} of {len(files)} files."
+
+    def _read_edf_info(self, file_path):
         """Read information from EDF file."""
-        # Logic to read information from EDF file
-        pass
+        from edf_info import format_edf_file_info
+        return format_edf_file_info(file_path)
 
     def _display_statistics(self, stats):
         """Display statistics."""
-        # Logic to display statistics
-        pass
+        self.runner.write("Descriptive statistics:\n")
+        if stats['sex_distribution'] is not None:
+            self.runner.write("Sex distribution:\n")
+            for sex, count in stats['sex_distribution'].items():
+                self.runner.write(f"  {sex}: {count}\n")
+        age_stats = stats['age_distribution']
+        if age_stats is not None and 'mean' in age_stats and age_stats['count'] > 0:
+            self.runner.write("\nAge distribution:\n")
+            self.runner.write(f"  Count: {int(age_stats['count'])}\n")
+            self.runner.write(f"  Mean age: {age_stats['mean']:.2f} years\n")
+            self.runner.write(f"  Minimum age: {age_stats['min']} years\n")
+            self.runner.write(f"  Maximum age: {age_stats['max']} years\n")
+        if stats['duration_stats'] is not None:
+            duration_stats = stats['duration_stats']
+            self.runner.write("\nRecording duration statistics (minutes):\n")
+            self.runner.write(f"  Mean duration: {duration_stats['mean']:.2f} min\n")
+            self.runner.write(f"  Minimum duration: {duration_stats['min']:.2f} min\n")
+            self.runner.write(f"  Maximum duration: {duration_stats['max']:.2f} min\n")
 
 if __name__ == "__main__":
     root = tk.Tk()
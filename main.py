@@ -1,13 +1,16 @@
 # main.py
 import os
 
+from edf_columnar import export_table
 from edf_reader import analyze_directory
-from eeg_statistics import generate_statistics, visualize_statistics
+from eeg_features import BAND_POWER_NAME, generate_band_power
+from eeg_statistics import CHANNEL_STATS_NAME, METADATA_STATS_NAME, generate_channel_statistics, generate_statistics, visualize_statistics
 from utils import check_directory
 
 def main():
     """Main function for analyzing and visualizing data."""
     input_directory = input("Enter the path to the folder containing EDF files: ").strip()
+    band_power = input("Also compute band power (reads all signal data)? [y/N]: ").strip().lower() == 'y'
     output_directory = os.path.join(input_directory, "output")
 
     try:
@@ -20,9 +23,18 @@ def main():
         print("Descriptive statistics:")
         print(stats)
 
-        output_csv_path = os.path.join(output_directory, 'edf_metadata_stats.csv')
-        df.to_csv(output_csv_path, index=False)
-        print(f"Statistics saved to {output_csv_path}")
+        metadata_path = export_table(df, os.path.join(output_directory, METADATA_STATS_NAME))
+        print(f"Statistics saved to {metadata_path}")
+
+        file_paths = [os.path.join(input_directory, metadata['file_name']) for metadata in metadata_list]
+        channel_path = export_table(generate_channel_statistics(file_paths),
+                                    os.path.join(output_directory, os.path.splitext(CHANNEL_STATS_NAME)[0]))
+        print(f"Channel statistics saved to {channel_path}")
+
+        if band_power:
+            band_power_path = export_table(generate_band_power(file_paths),
+                                           os.path.join(output_directory, os.path.splitext(BAND_POWER_NAME)[0]))
+            print(f"Band power saved to {band_power_path}")
 
         visualize_statistics(df, output_directory)
         print(f"Graphs saved to {output_directory}")
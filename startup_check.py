@@ -0,0 +1,63 @@
+# startup_check.py
+import os
+import sys
+import json
+import subprocess
+
+ENTRY_POINTS = ("gui", "EDFApp", "EDFProcessor")  # EDFProcessor has no window; only its import is measured
+IMPORT_BUDGET = 0.3  # Seconds to import an entry point in a fresh interpreter
+PAINT_BUDGET = 1.0  # Seconds from the start of the import to the first drawn window
+FORBIDDEN_MODULES = ("mne", "seaborn", "matplotlib", "pandas", "scipy")  # Loaded per operation, never at startup
+REPEATS = 3  # The fastest run counts, to keep disk cache noise out
+
+# Runs in a fresh interpreter: imports the entry point, draws its window once if there is a display
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter() - start
+painted = None
+try:
+    import tkinter as tk
+    root = tk.Tk()
+except Exception:
+    root = None  # No display
+if root is not None:
+    if hasattr(module, "EDFApp"):  # Modules without a window are only imported
+        module.EDFApp(root)
+        root.update()
+        painted = time.perf_counter() - start
+    root.destroy()
+print(json.dumps({"import": imported, "paint": painted, "modules": sorted(sys.modules)}))
+"""
+
+def measure_startup(entry_point):
+    """Returns the fastest of REPEATS cold starts of an entry point: import and paint seconds, loaded modules."""
+    runs = []
+    for _ in range(REPEATS):
+        output = subprocess.run([sys.executable, "-c", PROBE, entry_point], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(runs, key=lambda run: run["import"])
+
+def check_startup(entry_points=ENTRY_POINTS):
+    """Measures every entry point; returns the list of budget violations (empty if all is well)."""
+    problems = []
+    for entry_point in entry_points:
+        run = measure_startup(entry_point)
+        paint = f"{run['paint']:.3f} s" if run['paint'] is not None else "not measured (no display)"
+        print(f"{entry_point}: import {run['import']:.3f} s, first paint {paint}")
+        loaded = sorted({module.split('.')[0] for module in run["modules"]} & set(FORBIDDEN_MODULES))
+        if loaded:
+            problems.append(f"{entry_point} imports {', '.join(loaded)} at startup")
+        if run["import"] > IMPORT_BUDGET:
+            problems.append(f"{entry_point} takes {run['import']:.3f} s to import (budget {IMPORT_BUDGET} s)")
+        if run["paint"] is not None and run["paint"] > PAINT_BUDGET:
+            problems.append(f"{entry_point} takes {run['paint']:.3f} s to draw its window (budget {PAINT_BUDGET} s)")
+    return problems
+
+if __name__ == "__main__":
+    problems = check_startup()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
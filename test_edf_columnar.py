@@ -0,0 +1,24 @@
+# test_edf_columnar.py
+import pytest
+from edf_columnar import export_table, load_table
+from eeg_statistics import DISPLAY_COLUMNS, describe_statistics, generate_statistics
+
+def _metadata(file_name, duration, **subject_info):
+    return {'file_name': file_name, 'duration': duration, 'subject_info': subject_info}
+
+def test_table_without_birthdates_keeps_numeric_age(tmp_path):
+    df, stats = generate_statistics([_metadata("a.edf", 600, sex=1), _metadata("b.edf", 1200)])
+    assert df['age'].dtype == 'float64'
+
+    export_table(df, str(tmp_path / "stats"))
+    loaded = load_table(str(tmp_path / "stats"), DISPLAY_COLUMNS)
+    assert loaded['age'].dtype == 'float64'
+    assert loaded['duration_minutes'].tolist() == [10.0, 20.0]
+    age_stats = describe_statistics(loaded)['age_distribution']
+    assert age_stats['count'] == 0 and 'mean' in age_stats
+
+def test_untyped_age_is_stored_as_float(tmp_path):
+    pytest.importorskip("pyarrow")
+    df, _ = generate_statistics([_metadata("a.edf", 600)])
+    export_table(df.astype({'age': object}), str(tmp_path / "stats"), chunk_rows=1)
+    assert load_table(str(tmp_path / "stats"))['age'].dtype == 'float64'
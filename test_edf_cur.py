@@ -0,0 +1,35 @@
+# test_edf_cur.py
+from datetime import datetime
+from edf_cur import repair_truncated_edf, undo_repair
+from edf_header import read_edf_header
+from edf_synth import build_header
+
+RECORD = bytes(range(8))  # One record of a single 4-sample channel
+
+def _write_edf(path, n_records, records, tail=b""):
+    header = build_header("X X X X", "Startdate X X X X", datetime(2023, 3, 1, 9), n_records, ["EEG Fp1"], [4],
+                          edf_plus=False)
+    path.write_bytes(header + RECORD * records + tail)
+    return str(path)
+
+def test_truncated_file_is_repaired_and_restored(tmp_path):
+    path = _write_edf(tmp_path / "cut.edf", 5, 3, tail=RECORD[:3])
+    original = open(path, 'rb').read()
+    entry = repair_truncated_edf(path, str(tmp_path / "journal"))
+    assert entry is not None
+    assert read_edf_header(path).n_records == 3
+    assert len(open(path, 'rb').read()) == len(original) - 3
+
+    undo_repair(entry)
+    assert open(path, 'rb').read() == original
+
+def test_file_with_more_records_than_announced_is_left_alone(tmp_path):
+    path = _write_edf(tmp_path / "long.edf", 2, 4, tail=RECORD[:3])
+    original = open(path, 'rb').read()
+    assert repair_truncated_edf(path, str(tmp_path / "journal")) is None
+    assert open(path, 'rb').read() == original
+
+def test_recording_in_progress_gets_its_record_count(tmp_path):
+    path = _write_edf(tmp_path / "live.edf", -1, 4)
+    assert repair_truncated_edf(path, str(tmp_path / "journal")) is not None
+    assert read_edf_header(path).n_records == 4
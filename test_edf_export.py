@@ -0,0 +1,40 @@
+# test_edf_export.py
+from datetime import datetime, timezone
+from edf_export import export_anonymized, export_directory
+from edf_header import read_edf_header, read_header_bytes
+from edf_synth import build_header
+
+def _write_edf(path, patient_id, recording_id, edf_plus=False):
+    header = build_header(patient_id, recording_id, datetime(2023, 3, 1, 9), 2, ["EEG Fp1"], [4], edf_plus)
+    with open(path, 'wb') as f:
+        f.write(header + bytes(range(16)))
+    return path
+
+def _identity(path):
+    return read_header_bytes(path)[8:168].decode('latin-1')
+
+def test_export_hides_free_text_names(tmp_path):
+    source = _write_edf(tmp_path / "free.edf", "Ivanov Ivan Ivanovich 12.03.1980",
+                        "Startdate Ivanov Ivan Ivanovich clinic")
+    target = tmp_path / "export" / "free.edf"
+    export_anonymized(str(source), str(target))
+
+    identity = _identity(target)
+    for word in ("Ivanov", "Ivan", "Ivanovich", "1980", "clinic"):
+        assert word not in identity
+    assert identity.split() == ["X", "Startdate", "X", "X", "X", "X"]
+    assert open(target, 'rb').read()[-16:] == bytes(range(16))
+    assert "Ivanov" in _identity(source)  # The original is untouched
+
+def test_export_directory_keeps_valid_edf_plus_fields(tmp_path):
+    source_dir, target_dir = tmp_path / "in", tmp_path / "out"
+    source_dir.mkdir()
+    _write_edf(source_dir / "plus.edf", "MCH-0234567 F 02-MAY-1951 Haagse_Harry",
+               "Startdate 01-MAR-2023 PSG-1234/2023 NN Telemetry03", edf_plus=True)
+    _write_edf(source_dir / "free.edf", "Petrova Anna Sergeevna born 1975", "Petrova clinic")
+    export_directory(str(source_dir), str(target_dir), backend="serial")
+
+    assert _identity(target_dir / "plus.edf").split() == \
+        ["X", "F", "01-JAN-1951", "X", "Startdate", "01-MAR-2023", "X", "X", "Telemetry03"]
+    assert "Anna" not in _identity(target_dir / "free.edf")
+    assert read_edf_header(str(target_dir / "plus.edf")).meas_date == datetime(2023, 3, 1, 9, tzinfo=timezone.utc)
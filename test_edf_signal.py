@@ -0,0 +1,24 @@
+# test_edf_signal.py
+from datetime import datetime
+import numpy as np
+import pytest
+from edf_signal import EDFSignals
+from edf_synth import build_header
+
+def _write_edf(path):
+    header = build_header("X X X X", "Startdate X X X X", datetime(2023, 3, 1, 9), 2, ["EEG Fp1", "EEG Fp2"], [4, 4],
+                          False)
+    samples = np.arange(16, dtype='<i2')  # Two records of 4 + 4 samples
+    with open(path, 'wb') as f:
+        f.write(header + samples.tobytes())
+    return str(path)
+
+def test_channel_index_accepts_numpy_integers(tmp_path):
+    with EDFSignals(_write_edf(tmp_path / "a.edf")) as signals:
+        channel = np.argmax([0.0, 1.0])
+        assert signals.channel_index(channel) == 1
+        assert signals.channel_index("EEG Fp2") == 1
+        assert signals.digital(channel).tolist() == signals.digital("EEG Fp2").tolist() == [[4, 5, 6, 7],
+                                                                                            [12, 13, 14, 15]]
+        with pytest.raises(KeyError):
+            signals.channel_index("EEG Cz")
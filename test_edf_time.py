@@ -0,0 +1,15 @@
+# test_edf_time.py
+from datetime import datetime, timedelta
+from edf_time import cluster_start_times, find_overlaps
+
+def _at(hour, minute=0):
+    return datetime(2023, 1, 1, hour, minute)
+
+def test_back_to_back_recordings_do_not_overlap():
+    intervals = [(_at(10), _at(11), 'p', 'a'), (_at(11), _at(12), 'p', 'b'), (_at(11, 30), _at(13), 'p', 'c')]
+    assert find_overlaps(intervals) == [('b', 'c', timedelta(minutes=30))]
+    assert ('a', 'b', timedelta(0)) in find_overlaps(intervals, tolerance=timedelta(minutes=1))
+
+def test_clusters_chain_through_neighbours():
+    starts = [(_at(10), 'a'), (_at(10, 8), 'b'), (_at(10, 16), 'c'), (_at(11), 'd')]
+    assert cluster_start_times(starts, timedelta(minutes=10)) == [starts[:3]]
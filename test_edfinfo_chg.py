@@ -0,0 +1,35 @@
+# test_edfinfo_chg.py
+import pytest
+from edfinfo_chg import anonymize_patient_field, anonymize_recording_field
+
+@pytest.mark.parametrize("text", [
+    "Ivanov Ivan Ivanovich 12.03.1980",
+    "Petrova Anna Sergeevna born 1975",
+    "Ivanov Ivan",
+    "P001 Ivan 02-MAY-1951 Ivanov",
+    "P001 M 12.03.1980 Ivanov",
+    "P001 M 31-FEB-1980 Ivanov",
+])
+def test_free_text_patient_is_hidden(text):
+    assert anonymize_patient_field(text) == "X"
+    assert anonymize_patient_field(text, birthdate='keep') == "X"
+
+def test_edf_plus_patient_keeps_sex_and_birthdate():
+    text = "MCH-0234567 F 02-MAY-1951 Haagse_Harry"
+    assert anonymize_patient_field(text) == "X F 01-JAN-1951 X"
+    assert anonymize_patient_field(text, birthdate='keep') == "X F 02-MAY-1951 X"
+    assert anonymize_patient_field(text, birthdate='remove') == "X F X X"
+    assert anonymize_patient_field("P001 X X Ivanov_Ivan") == "X X X X"
+
+@pytest.mark.parametrize("text", [
+    "Startdate Ivanov Ivan Ivanovich clinic",
+    "Ivanov Ivan Ivanovich 12.03.1980 clinic",
+    "Startdate 12.03.2020 Ivanov Ivan clinic",
+    "Startdate",
+])
+def test_free_text_recording_is_hidden(text):
+    assert anonymize_recording_field(text) == "Startdate X X X X"
+
+def test_edf_plus_recording_keeps_date_and_equipment():
+    assert anonymize_recording_field("Startdate 02-MAR-2002 PSG-1234/2002 NN Telemetry03") == \
+        "Startdate 02-MAR-2002 X X Telemetry03"
@@ -0,0 +1,44 @@
+# test_generate_patient_table.py
+from datetime import date, timedelta
+from generate_patient_table import cluster_patients, name_tokens, patient_rows
+
+def _record(name, birthdate=None, sex=''):
+    return {'file': f"{name}.edf", 'name': name, 'tokens': name_tokens(name), 'birthdate': birthdate, 'sex': sex,
+            'start': None}
+
+def _names(clusters):
+    return sorted(sorted(record['name'] for record in records) for records in clusters)
+
+def test_initials_do_not_bridge_patients():
+    records = [_record('Ivanov Ivan', date(1980, 1, 1), 'M'), _record('Ivanov I'),
+               _record('Ivanov Igor', date(1990, 5, 5), 'M')]
+    clusters = cluster_patients(records)
+    assert _names(clusters) == [['Ivanov I'], ['Ivanov Igor'], ['Ivanov Ivan']]
+    assert sorted(row[1] for row in patient_rows(clusters)) == ['', '1980-01-01', '1990-05-05']
+
+def test_weak_identity_joins_its_only_match():
+    records = [_record('Ivanov Ivan', date(1980, 1, 1), 'M'), _record('Ivanov Ivan Petrovich', date(1980, 1, 1), 'M'),
+               _record('Ivanov I'), _record('Ivanov Igor')]
+    assert _names(cluster_patients(records)) == [['Ivanov I', 'Ivanov Ivan', 'Ivanov Ivan Petrovich'], ['Ivanov Igor']]
+
+def test_undated_names_do_not_chain():
+    records = [_record('Ivanov Ivan'), _record('Ivanov I'), _record('Ivanov Igor')]
+    clusters = cluster_patients(records)
+    assert not any({'Ivanov Ivan', 'Ivanov Igor'} <= {record['name'] for record in c} for c in clusters)
+
+def test_transliterations_of_iotated_names_match():
+    records = [_record('Ivanov Yuri', date(1980, 1, 1)), _record('Ivanov Iurii', date(1980, 1, 1)),
+               _record('Orlova Yulia', date(1985, 2, 2)), _record('Orlova Iuliia', date(1985, 2, 2))]
+    assert _names(cluster_patients(records)) == [['Ivanov Iurii', 'Ivanov Yuri'], ['Orlova Iuliia', 'Orlova Yulia']]
+
+def test_single_surname_block_is_not_compared_pairwise(monkeypatch):
+    import generate_patient_table
+    calls = []
+    same_patient = generate_patient_table.same_patient
+    monkeypatch.setattr(generate_patient_table, 'same_patient', lambda a, b: calls.append(1) or same_patient(a, b))
+    given = ['Ivan', 'Petr', 'Sergei', 'Oleg', 'Anna', 'Maria', 'Elena', 'Nina', 'Galina', 'Dmitrii']
+    records = [_record(f"Ivanov {given[k % 10]} {given[k // 10 % 10]}ovich", date(1940, 1, 1) + timedelta(days=k * 7))
+               for k in range(2000)] + [_record(f"Ivanov {name[0]}") for name in given]
+    clusters = cluster_patients(records)
+    assert len(clusters) == 2010  # Every dated patient differs; each initial fits several of them
+    assert len(calls) < 10 * len(records)  # All pairs of the block would be about two million